@@ -0,0 +1,164 @@
+__author__ = 'christina'
+
+"""
+Non-interactive, parallel renderer for bbdata trend figures.
+
+Renders one figure per filter spec for a folder of exported point-path csv files or a point store (see point_store.py),
+headlessly (Agg backend) and in a pool of processes. A filter spec is the text form of bbdata's filterListTuple: up to
+four ';'-separated, comma-separated keyword lists, in the order
+    intersection keywords; union keywords; intersection prereqs; union prereqs
+e.g. 'measure_damper_opening_real' or 'measure_mdot_real;#pdc_vav_2_6,#pdc_vav_2_7'. Each spec needs a path name
+keyword (see point_paths.PATHS), which picks the figure's units and y limits. With no specs, one figure is rendered per
+path name.
+
+Matching series are opened as bbdata.LazySeries handles, so only the rows inside the plot window (--start / --end,
+default all data) are read.
+
+Output names are deterministic: <folder name>__<spec keywords>_<hash of spec>.png, so re-runs overwrite the same files.
+A figure is only re-rendered if the files it plots (by size and mtime; for a store, the series' segments) or the
+plotting options changed since it was saved, see render_cache.py.
+
+usage:
+    python batch_render.py C:/data/test_csv_data_851 -o figures
+    python batch_render.py C:/data/test_set_851.store -o figures
+    python batch_render.py C:/data/test_set_851.store --start "2015-11-13 19:30:00" --end "2015-11-13 21:30:00"
+    python batch_render.py C:/data/test_csv_data_851 -s measure_mdot_real -s "measure_hv_real;;;HotWaterTemperature"
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import re
+
+import bbdata
+import render_cache
+from folder_manifest import get_folder_manifest
+from point_paths import PATHS
+from point_store import PointStore, is_store
+
+SPEC_SEPARATOR = ';'
+KEYWORD_SEPARATOR = ','
+
+
+def parse_spec(spec):
+    '''
+    :param spec: filter spec string, see module docstring
+    :return: filterListTuple for bbdata.filter_data
+    '''
+    parts = spec.split(SPEC_SEPARATOR)
+    if len(parts) > 4:
+        raise ValueError('Filter spec has more than 4 parts: ' + spec)
+    parts += [''] * (4 - len(parts))
+    filterListTuple = tuple([x.strip() for x in part.split(KEYWORD_SEPARATOR) if x.strip()] for part in parts)
+    if not any(p in filterListTuple[0] + filterListTuple[1] for p in PATHS):
+        raise ValueError('Filter spec needs a path name keyword: ' + spec)
+    return filterListTuple
+
+
+def get_default_specs():
+    return [x for x in PATHS if x != 'none']
+
+
+def get_figure_name(folder, spec):
+    '''
+    :return: deterministic png file name for a folder and spec
+    '''
+    folder_name = os.path.basename(os.path.normpath(folder))
+    keywords = re.sub(r'[^A-Za-z0-9_.-]+', '_', spec).strip('_')
+    digest = hashlib.sha1(spec.encode('utf-8')).hexdigest()[:8]
+    return folder_name + '__' + keywords + '_' + digest + '.png'
+
+
+def get_spec_key(folder, spec, window=None):
+    '''
+    :return: render cache key of a spec's figure: the files it plots, by size and mtime (for a store, the series and
+        the segments that hold them), and the plotting options
+    '''
+    if is_store(folder):
+        store = PointStore(folder)
+        names = bbdata.filter_data(parse_spec(spec), store.names())
+        model = [(x, store.series[x]['chunks']) for x in names]
+    else:
+        manifest = get_folder_manifest(folder, rescan=False)
+        filenames = bbdata.filter_data(parse_spec(spec), manifest.filenames())
+        model = [(x, manifest.get(os.path.basename(x))['size'], manifest.get(os.path.basename(x))['mtime'])
+                 for x in filenames]
+    options = [spec, window, bbdata.TRENDS_PER_SUBPLOT, bbdata.MAX_SUBPLOT_ROWS, bbdata.ROW_SIZE, bbdata.COL_SIZE,
+               bbdata.DOWNSAMPLE_METHOD]
+    return render_cache.get_render_key('trends', model, options)
+
+
+def render_spec(task):
+    '''
+    renders one figure. runs in a worker process.
+    :param task: tuple (folder, spec, out_dir, window)
+    :return: tuple (spec, png file name or None if no data matched)
+    '''
+    import matplotlib
+    matplotlib.use('Agg')  # headless: must happen before bbdata imports pyplot
+    (folder, spec, out_dir, window) = task
+    filterListTuple = parse_spec(spec)
+    (store, filenames) = bbdata.get_source_info(folder)
+    # handles that are only read when plotted, and only inside the window
+    dataTuple = bbdata.get_lazy_source_info(store, bbdata.filter_data(filterListTuple, filenames), window)
+    if len(dataTuple[0]) == 0:
+        return spec, None
+    figName = os.path.join(out_dir, get_figure_name(folder, spec))
+    return spec, bbdata.plot_filtered_data(dataTuple, filterListTuple, figName)
+
+
+def render_all(folder, specs=None, out_dir='.', processes=None, window=None):
+    '''
+    :param folder: folder of exported point-path csv files, or a point store folder
+    :param specs: list of filter spec strings, default is one per path name
+    :param out_dir: folder to save figures in
+    :param processes: size of the process pool, default is the number of cores
+    :param window: (start, end) tuple of naive UTC datetimes to plot, default all data
+    :return: dict of spec: png file name, or None where no data matched
+    '''
+    if specs is None:
+        specs = get_default_specs()
+    for spec in specs:
+        parse_spec(spec)  # fail early on bad specs, before starting workers
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    if not is_store(folder):
+        bbdata.get_folder_info(folder)  # scan the folder once, so workers start from an up to date manifest
+
+    figures = {}
+    keys = {}
+    cache = render_cache.get_render_cache(out_dir)
+    for spec in specs:
+        keys[spec] = get_spec_key(folder, spec, window)
+        figName = os.path.join(out_dir, get_figure_name(folder, spec))
+        if cache.is_fresh(figName, keys[spec]):
+            figures[spec] = figName
+            print 'up to date ' + figName
+    stale = [x for x in specs if x not in figures]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        for (spec, figName) in pool.imap_unordered(render_spec, [(folder, x, out_dir, window) for x in stale]):
+            figures[spec] = figName
+            if figName is None:
+                print 'no data for ' + spec
+            else:
+                cache.record(figName, keys[spec])
+                print 'saved ' + figName
+    finally:
+        pool.close()
+        pool.join()
+    return figures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render bbdata trend figures for a folder without prompting.')
+    parser.add_argument('folder', help='folder of exported point-path csv files, or a point store folder')
+    parser.add_argument('-s', '--spec', action='append', dest='specs',
+                        help='filter spec, may be repeated (default: one per path name)')
+    parser.add_argument('-o', '--out', default='.', help='folder to save figures in')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--start', default='', help='plot from this UTC time, e.g. "2015-11-13 19:30:00"')
+    parser.add_argument('--end', default='', help='plot until this UTC time')
+    args = parser.parse_args()
+    render_all(args.folder, args.specs, args.out, args.processes, bbdata.parse_window(args.start, args.end))
@@ -1,43 +1,39 @@
 __author__ = 'christina'
 
-
-import glob
-import pandas as pd
-import matplotlib.dates as dates
-import matplotlib.pyplot as plt
+# pandas and matplotlib are imported inside the functions that use them, so importing this module (e.g. from
+# batch_render workers or trend_matrix users) stays cheap and does no work.
+import calendar
+import datetime as dt
+import io
+import os
+import sys
+from multiprocessing.pool import ThreadPool
 import math as math
+import numpy as np
+import downsample
+from point_paths import PATHS, PREREQ_PATHS, PREREQ_THRESHOLDS, CSV_TIME_FORMAT, CSV_TIME_LENGTH, NameIndex
+from point_store import PointStore, parse_csv_index, is_store
+from folder_manifest import get_folder_manifest
+from compressed import open_input, is_compressed
+from trend_matrix import build_trend_matrix
 
 TRENDS_PER_SUBPLOT = 5
 MAX_SUBPLOT_ROWS = 5
 ROW_SIZE = 5  # inches
 COL_SIZE = 7  # inches
+LOAD_THREADS = 8  # files read concurrently by get_all_files_info
+DOWNSAMPLE_METHOD = 'minmax'  # or 'lttb', see downsample.py
+DEFAULT_FOLDER = "C:\Users\christina\Documents\All_BrightBox_Docs\ALPHA TEST\Test Set Analytics\/test_csv_data_851"
+EPOCH_DATENUM = None  # matplotlib date number of the unix epoch, set by get_epoch_datenum
+NS_PER_DAY = 24 * 60 * 60 * 10 ** 9
+# open ends of a plot window, inside the range of int64 ns timestamps
+WINDOW_START = dt.datetime(1970, 1, 1)
+WINDOW_END = dt.datetime(2200, 1, 1)
 setD = {
     'n': 'INTERSECTION',
     'u': 'UNION'
 }
 
-PATHS = [
-    'measure_damper_opening_real',
-    'measure_mdot_real',
-    'actuator_u_damper_opening_real',
-    'actuator_u_damper_opening_lock_real',
-    'measure_Ts_T',
-    'measure_zone_temp',
-    'actuator_u_hv_lock_real',
-    'measure_hv_real',
-    'actuator_u_static_pressure_real',
-    'measure_static_pressure_stpt_real',
-    'none'
-]
-
-PREREQ_PATHS = [
-    'ColdDuctPressure',
-    'ColdDuctTemperature',
-    'HotDuctPressure',
-    'HotWaterPressure',
-    'HotWaterTemperature'
-]
-
 TREND_UNITS = dict(zip(PATHS, [
     '%',
     'cfm',
@@ -80,13 +76,19 @@ Y_LIMS = dict(zip(PATHS, [
     [None, None]
 ]))
 
-PREREQ_THRESHOLDS = dict(zip(PREREQ_PATHS, [
-    0.25,
-    70,
-    0.25,
-    5,
-    140
-]))
+# rows of plot_test_set_data: (title, [(trend, line style)])
+CONTEXT_ROWS = [
+    ('Damper Position', [('measure_damper_opening_real', '-'), ('actuator_u_damper_opening_real', ':'),
+                         ('actuator_u_damper_opening_lock_real', 'o')]),
+    ('Zone Airflow', [('measure_mdot_real', '-')]),
+    ('Zone Temperature', [('measure_zone_temp', '-')]),
+    ('HW Valve Position', [('measure_hv_real', '-'), ('actuator_u_hv_lock_real', 'o')]),
+    ('Duct Static Pressure', [('measure_static_pressure_stpt_real', '-'), ('actuator_u_static_pressure_real', ':')]),
+    ('Supply Air Temperature', [('measure_Ts_T', '-')])
+]
+
+# the NameIndex of the most recently filtered filenames list, so repeated filter_data calls on a folder reuse it
+lastNameIndex = {}
 
 SEPARATORS = dict(zip(PATHS, [
     ['\\','_site'],
@@ -107,13 +109,31 @@ def get_folder_info(fullPath):
     '''
     user input: full path of folder directory where data files are stored
     :return: list containing filenames as strings
-            number of files in folder
+    Files are listed from the folder manifest (see folder_manifest.py), which only re-reads added or changed files.
+    '''
+    return get_folder_manifest(fullPath).filenames()
+
+def get_epoch_datenum():
+    global EPOCH_DATENUM
+    if EPOCH_DATENUM is None:
+        import matplotlib.dates as dates
+        EPOCH_DATENUM = dates.date2num(dt.datetime(1970, 1, 1))
+    return EPOCH_DATENUM
+
+def ns_to_num(ns):
+    '''
+    :param ns: numpy array of int64 ns since the epoch (UTC)
+    :return: numpy array of matplotlib date numbers
     '''
-    # get directory from user
-    file_dir = fullPath+'/*'
-    # get list of filenames
-    filenames = glob.glob(file_dir)
-    return filenames
+    return get_epoch_datenum() + ns / float(NS_PER_DAY)
+
+def datetime_index_to_num(index):
+    '''
+    vectorized replacement for dates.date2num(index.to_pydatetime())
+    :param index: pandas DatetimeIndex (naive UTC)
+    :return: numpy array of matplotlib date numbers
+    '''
+    return ns_to_num(index.asi8)
 
 def get_file_info(filename):
     '''
@@ -121,44 +141,318 @@ def get_file_info(filename):
     :param filename to read, assumes no header in file
     :return: a pandas dataframe object
     '''
+    import pandas as pd
 
-    # read a file using pandas, with first column as datetime index
-    dataFrame = pd.read_csv(filename, sep=',', header=None, index_col=0, parse_dates=True)
-    # mutate/convert pandas datetime index to python datetime
-    dataFrame.index = dates.date2num(dataFrame.index.to_pydatetime())
+    # read a file using pandas, with first column as (string) index. compressed files are decoded while read
+    with open_input(filename) as f:
+        dataFrame = pd.read_csv(f, sep=',', header=None, index_col=0)
+    return set_num_index(dataFrame)
+
+def set_num_index(dataFrame):
+    '''
+    parses the timestamp text index of a freshly read dataframe with an explicit format instead of letting pandas infer
+    it (keeping fractions of a second, see point_store.parse_csv_index), then converts it to matplotlib dates
+    '''
+    dataFrame.index = datetime_index_to_num(parse_csv_index(dataFrame.index))
     return dataFrame
 
-def get_all_files_info(filenames):
+def read_file_or_none(filename):
     '''
-    This function calls get_file_info on all files in filenames list and returns a list of pandas dataframes
+    get_file_info for one file of a batch: a file that can't be parsed (only whitespace, only a header, a bad
+    timestamp) is reported and skipped instead of stopping the whole batch
+    :return: pandas dataframe, or None
+    '''
+    try:
+        return get_file_info(filename)
+    except ValueError as e:  # includes pandas' EmptyDataError and ParserError
+        print 'skipping ' + filename + ': ' + str(e)
+        return None
+
+def get_all_files_info(filenames, threads=LOAD_THREADS):
+    '''
+    This function calls get_file_info on all files in filenames list and returns a list of pandas dataframes.
+    Files are read concurrently by a pool of threads; empty files are skipped by their size without being read, and
+    files that can't be parsed are skipped.
     :param filenames: list of files we care about, e.g. all files in folder, all files that match filter criteria
+    :param threads: number of files to read at once
     :return: all_data_list: each list element is a pandas dataframe containing the file data. It skips empty files
-               empty_list: list of filenames where file is empty
-               index_empty: index where empty file occurs
+               data_names: filename of each dataframe
     '''
     # initialize lists
     data_list = []
     data_names = []
-    empty_list = []
-    index_empty = []
 
-    for f in range(len(filenames)):
-        try:
-            data = get_file_info(filenames[f])
-        except ValueError:
-            empty_list.append(filenames[f])
-            index_empty.append(f)
+    non_empty = [f for f in filenames if os.path.getsize(f) > 0]
+    if not non_empty:
+        return data_list, data_names
+    pool = ThreadPool(min(threads, len(non_empty)))
+    try:
+        all_data = pool.map(read_file_or_none, non_empty)
+    finally:
+        pool.close()
+        pool.join()
+
+    for (name, data) in zip(non_empty, all_data):
+        if data is not None and len(data) > 0:
+            data_list.append(data)
+            data_names.append(name)
+    return data_list, data_names
+
+def get_store_info(storePath):
+    '''
+    Opens a consolidated point store (see point_store.py), the store equivalent of get_folder_info
+    :param storePath: store folder
+    :return: PointStore object
+             list of series names, named like the csv filenames so they can be passed to filter_data
+    '''
+    store = PointStore(storePath)
+    return store, store.names()
+
+def get_source_info(path):
+    '''
+    :param path: folder of exported point-path csv files, or a point store folder (see point_store.py)
+    :return: PointStore object, or None for a csv folder
+             list of filenames / series names to filter on
+    '''
+    if is_store(path):
+        return get_store_info(path)
+    return None, get_folder_info(path)
+
+def get_all_source_info(store, names):
+    '''
+    reads the named series from a store, or the named files if store is None
+    :return: tuple (data list, names), see get_all_files_info
+    '''
+    if store is None:
+        return get_all_files_info(names)
+    return get_all_store_info(store, names)
+
+def get_lazy_source_info(store, names, window=None):
+    '''
+    handles to the named series of a store, or to the named files if store is None, that are only read when plotted
+    :param window: (start, end) tuple of naive UTC datetimes to restrict loading to, or None for all data
+    :return: tuple (list of LazySeries, names), see get_lazy_files_info
+    '''
+    if store is None:
+        return get_lazy_files_info(names, window)
+    return get_lazy_store_info(store, names, window)
+
+def get_all_store_info(store, names):
+    '''
+    The store equivalent of get_all_files_info: reads only the named series, memory-mapped, into dataframes
+    :param store: PointStore object
+    :param names: list of series names we care about, e.g. all names that match filter criteria
+    :return: all_data_list: each list element is a pandas dataframe containing the series data. It skips empty series
+               data_names: name of each dataframe
+    '''
+    import pandas as pd
+    data_list = []
+    data_names = []
+    for name in names:
+        (timestamps, values) = store.get_series(name)
+        if len(timestamps) > 0:
+            data_list.append(pd.DataFrame({1: values}, index=ns_to_num(timestamps)))
+            data_names.append(name)
+    return data_list, data_names
+
+def datetime_to_ns(a_datetime):
+    return calendar.timegm(a_datetime.timetuple()) * 10 ** 9
+
+def find_line_offset(f, size, is_after):
+    '''
+    binary search of a file whose lines are sorted, for the start of the first line where is_after(line) is True.
+    :param f: file object opened in binary mode
+    :param size: size of the file in bytes
+    :param is_after: function of a line, False for all lines before some line and True from there on
+    :return: byte offset of that line, or size if there is none
+    '''
+    def line_start(position):  # start of the first line that starts at or after position
+        if position == 0:
+            return 0
+        f.seek(position - 1)
+        f.readline()
+        return f.tell()
+
+    lo = 0
+    hi = size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(line_start(mid))
+        line = f.readline()
+        if not line or is_after(line):
+            hi = mid
         else:
-            if len(data) == 0:
-                empty_list.append(filenames[f])
-                index_empty.append(f)
+            lo = mid + 1
+    return line_start(lo)
+
+class LazySeries(object):
+    '''
+    Handle to one point-path series (a csv file or a series in a PointStore) that is only read on first access, and
+    then only within an optional time window. For time-sorted csv files the window is found by seeking, so only the
+    bytes inside the window are read.
+    It stands in for the dataframes from get_all_files_info: it has index and values, len(), and converts to an array
+    for plotting.
+    '''
+    def __init__(self, name, window=None, store=None, span=None):
+        '''
+        :param name: csv filename, or series name if store is given
+        :param window: (start, end) tuple of naive UTC datetimes to restrict loading to, or None for all data
+        :param store: PointStore that holds the series, or None for a csv file
+        :param span: (start, end) int ns of the whole series if already known (e.g. from the folder manifest)
+        '''
+        self.name = name
+        self.window = window
+        self.store = store
+        self.span = span
+        self.frame = None
+
+    def load(self):
+        '''
+        :return: the series as a dataframe indexed by matplotlib dates, read on the first call
+        '''
+        if self.frame is None:
+            if self.store is not None:
+                self.frame = self.load_from_store()
             else:
-                data_list.append(data)
-                data_names.append(filenames[f])
-    # return data_list, data_names, empty_list, index_empty
+                try:
+                    self.frame = self.load_from_csv()
+                except ValueError as e:  # as read_file_or_none: a file that can't be parsed plots as no data
+                    import pandas as pd
+                    print 'skipping ' + self.name + ': ' + str(e)
+                    self.frame = pd.DataFrame({1: []}, index=np.array([], dtype=float))
+        return self.frame
+
+    def load_from_csv(self):
+        if is_compressed(self.name):
+            return self.load_from_compressed_csv()
+        with open(self.name, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if self.window is None:
+                (start, end) = (0, size)
+            else:
+                # timestamp text sorts like time, so lines can be compared without parsing them
+                start_key = self.window[0].strftime(CSV_TIME_FORMAT)
+                end_key = self.window[1].strftime(CSV_TIME_FORMAT)
+                start = find_line_offset(f, size, lambda line: line[:CSV_TIME_LENGTH] >= start_key)
+                end = find_line_offset(f, size, lambda line: line[:CSV_TIME_LENGTH] > end_key)
+            f.seek(start)
+            chunk = f.read(max(0, end - start))
+        import pandas as pd
+        if not chunk.strip():
+            return pd.DataFrame({1: []}, index=np.array([], dtype=float))
+        return set_num_index(pd.read_csv(io.BytesIO(chunk), sep=',', header=None, index_col=0))
+
+    def load_from_compressed_csv(self):
+        '''
+        a compressed file can't be seeked into, so it is decoded in one stream and cut to the window afterwards
+        '''
+        frame = get_file_info(self.name)
+        if self.window is not None:
+            (xmin, xmax) = [ns_to_num(datetime_to_ns(x)) for x in self.window]
+            frame = frame[(frame.index >= xmin) & (frame.index <= xmax)]
+        return frame
+
+    def load_from_store(self):
+        import pandas as pd
+        (timestamps, values) = self.store.get_series(self.name)
+        if self.window is not None:
+            i_start = np.searchsorted(timestamps, datetime_to_ns(self.window[0]), 'left')
+            i_end = np.searchsorted(timestamps, datetime_to_ns(self.window[1]), 'right')
+            (timestamps, values) = (timestamps[i_start:i_end], values[i_start:i_end])
+        return pd.DataFrame({1: values}, index=ns_to_num(timestamps))
+
+    def overlaps_window(self):
+        '''
+        :return: False only if the known span shows there is no data inside the window
+        '''
+        if self.window is None or self.span is None or None in self.span:
+            return True
+        return self.span[0] <= datetime_to_ns(self.window[1]) and self.span[1] >= datetime_to_ns(self.window[0])
+
+    def get_start_end(self):
+        '''
+        :return: (start, end) matplotlib dates of the data in the window, from the known span if there is one so the
+            data doesn't have to be read; None if there is no data
+        '''
+        if self.span is not None and None not in self.span:
+            (start, end) = self.span
+            if self.window is not None:
+                start = max(start, datetime_to_ns(self.window[0]))
+                end = min(end, datetime_to_ns(self.window[1]))
+            return ns_to_num(start), ns_to_num(end)
+        frame = self.load()
+        if len(frame) == 0:
+            return None
+        return frame.index[0], frame.index[-1]
+
+    @property
+    def index(self):
+        return self.load().index
+
+    @property
+    def values(self):
+        return self.load().values
+
+    def __len__(self):
+        return len(self.load())
+
+    def __array__(self, dtype=None):
+        return np.asarray(self.load().values, dtype=dtype)
+
+def get_lazy_files_info(filenames, window=None):
+    '''
+    The lazy equivalent of get_all_files_info: returns handles without reading any data. Empty files and files with no
+    data inside window are skipped using the folder manifest (see folder_manifest.py).
+    :param filenames: list of files we care about, e.g. all files that match filter criteria
+    :param window: (start, end) tuple of naive UTC datetimes to restrict loading to, or None for all data
+    :return: all_data_list: list of LazySeries
+               data_names: filename of each handle
+    '''
+    data_list = []
+    data_names = []
+    for filename in filenames:
+        manifest = get_folder_manifest(os.path.dirname(filename), rescan=False)
+        entry = manifest.files.get(os.path.basename(filename))
+        if entry is None:
+            span = None
+            if os.path.getsize(filename) == 0:
+                continue
+        elif entry['rows'] == 0:
+            continue
+        else:
+            span = (entry['start'], entry['end'])
+        handle = LazySeries(filename, window=window, span=span)
+        if handle.overlaps_window():
+            data_list.append(handle)
+            data_names.append(filename)
     return data_list, data_names
 
-def get_parsed_list(filenames, start=(), end=(), unique=False, addSep0=False, addSep1=False):
+def get_lazy_store_info(store, names, window=None):
+    '''
+    The store equivalent of get_lazy_files_info
+    :param store: PointStore object
+    :param names: list of series names we care about
+    :param window: (start, end) tuple of naive UTC datetimes to restrict loading to, or None for all data
+    :return: all_data_list: list of LazySeries
+               data_names: name of each handle
+    '''
+    data_list = []
+    data_names = []
+    for name in names:
+        chunks = [x for x in store.series[name]['chunks'] if x[2] > x[1]]
+        if not chunks:
+            continue
+        # chunks are appended in time order, so the span is the first and last timestamp of the first and last chunk
+        span = (int(store.get_segment(chunks[0][0])[0][chunks[0][1]]),
+                int(store.get_segment(chunks[-1][0])[0][chunks[-1][2] - 1]))
+        handle = LazySeries(name, window=window, store=store, span=span)
+        if handle.overlaps_window():
+            data_list.append(handle)
+            data_names.append(name)
+    return data_list, data_names
+
+def get_parsed_list(filenames, separator_list, unique=False, addSep0=False, addSep1=False):
     '''
     use this function to create a list of filenames parsed by the provided separators.
     use selector to make a unique list, default will make a full list
@@ -168,8 +462,6 @@ def get_parsed_list(filenames, start=(), end=(), unique=False, addSep0=False, ad
     file_list = []
     for f in filenames:
 
-        for s in start:
-
         # split the filename around the first separator
         # pass the btm to the next partition call, around the second separator
         # we want to keep the top of the second partition
@@ -187,11 +479,25 @@ def get_parsed_list(filenames, start=(), end=(), unique=False, addSep0=False, ad
     file_list.sort()
     return file_list
 
+def get_name_index(filenames):
+    '''
+    :param filenames: list of filenames to filter on
+    :return: NameIndex over filenames, reused while the same list is filtered again
+    '''
+    key = tuple(filenames)
+    if lastNameIndex.get('key') != key:
+        lastNameIndex['key'] = key
+        lastNameIndex['index'] = NameIndex(filenames)
+    return lastNameIndex['index']
+
 def filter_data(filterListTuple, filenames):
     '''
     This function creates a list of filenames that match all supplied filters.
     First finds intersection set of filters, then finds union set of filters.
-    This function is a wrapper for a recursive function.
+    A filter matches every filename that contains it, as the original recursive filter did. Matches are resolved as set
+    operations on cached per-keyword position sets (see point_paths.NameIndex). Unlike the recursive filter, a filename
+    matched by several union filters is listed once, and intersection filters that match nothing give no filenames
+    instead of falling back to the union filters over all filenames.
     :param
         filterListTuple: tuple of lists, defined as
             (
@@ -203,7 +509,8 @@ def filter_data(filterListTuple, filenames):
     :param filenames: list of filenames to filter on
 
     :return:
-        filtered_filenames
+        filtered_filenames: filenames matching the keyword filters, followed by filenames matching the prereq filters,
+        each in their original order
     '''
     # unpack tuple param:
     n_keywordList = filterListTuple[0]
@@ -211,79 +518,17 @@ def filter_data(filterListTuple, filenames):
     n_prereqList = filterListTuple[2]
     u_prereqList = filterListTuple[3]
 
-    # initialize:
-    n_keywordNames = []
-    u_keywordNames = []
-    n_prereqNames = []
-    u_prereqNames = []
-
-    # For keyword intersection set, iterate through filters recursively so filters build on each other
-    if n_keywordList:
-        fNames = filenames[:]
-        count = 0
-        n_keywordNames = filterRecur(count, n_keywordList, fNames)
-
-    # For keyword union set, call filter individually and then extend the list
-    if not n_keywordNames:  # no filtering has been done yet
-        fNames = filenames[:]
-    else:  # some filtering has happened, so use results to date as base for union filtering
-        fNames = n_keywordNames
-    for u in u_keywordList:
-        count = 0
-        u_keywordNames += filterRecur(count, [u], fNames)
-
-    # if there were any union filters, result is u_keywords
-    if u_keywordList:
-        keywordNames = u_keywordNames
-    else:
-        keywordNames = n_keywordNames
+    index = get_name_index(filenames)
+
+    # keyword set: intersection of n_keywords, narrowed to the union of u_keywords if there are any
+    keywordNames = index.get_names(index.match(n_keywordList, u_keywordList))
 
     # Prereqs are optional to include, so must be added to keyword filter list, not compound.
-    # For prereq name intersection set, iterate through filters recursively, but start with full set
-    fNames = filenames[:]
-    if n_prereqList:
-        count = 0
-        n_prereqNames = filterRecur(count, n_prereqList, fNames)
-
-    # For prereq name union set, call filter individually and then extend the list
-    if not n_prereqNames:  # no filtering has been done yet
-        fNames = filenames[:]
-    else:  # some filtering has happened, so use results to date as base for union filtering
-        fNames = n_prereqNames
-    for u in u_prereqList:
-        count = 0
-        u_prereqNames += filterRecur(count, [u], fNames)
-
-    # if there were any union filters, result is u_keywords
-    if u_prereqList:
-        prereqNames = u_prereqNames
-    else:
-        prereqNames = n_prereqNames
+    prereqNames = index.get_names(index.match(n_prereqList, u_prereqList))
 
     resultNames = keywordNames + prereqNames
     return resultNames
 
-def filterRecur(count, filterList, filtered_filenames):
-    # initialize local variables:
-    new_filenames = []
-
-    # base case: when there is nothing (left) to filter
-    if count >= len(filterList):
-        return filtered_filenames
-    # warning case: list of filenames is empty and there is nothing to filter on
-    elif len(filtered_filenames) == 0:
-        print 'nothing to filter. review target filenames and filters.'
-        return filtered_filenames
-    # recursion case:
-    else:
-        for f in range(len(filtered_filenames)):
-            if filterList[count] in filtered_filenames[f]:
-                new_filenames.append(filtered_filenames[f])
-        # update
-        count += 1
-        filtered_filenames = new_filenames
-        return filterRecur(count, filterList, filtered_filenames)
-
 def get_filter_list(setType):
 
     #initialize:
@@ -304,15 +549,40 @@ def get_filter_list(setType):
 
     return newList
 
-def plot_filtered_data(dataTuple, filtersTuple):
+def parse_window(startText, endText):
+    '''
+    :param startText: UTC time like 2015-11-13 19:30:00, or blank for the start of the data
+    :param endText: UTC time, or blank for the end of the data
+    :return: (start, end) tuple of naive UTC datetimes, or None if both are blank
+    '''
+    if not startText.strip() and not endText.strip():
+        return None
+    start = dt.datetime.strptime(startText.strip(), CSV_TIME_FORMAT) if startText.strip() else WINDOW_START
+    end = dt.datetime.strptime(endText.strip(), CSV_TIME_FORMAT) if endText.strip() else WINDOW_END
+    return start, end
+
+def get_window():
+    '''
+    asks the user for the time window to plot
+    :return: (start, end) tuple of naive UTC datetimes, or None for all data
+    '''
+    while True:
+        startText = raw_input('Plot from (UTC, ' + CSV_TIME_FORMAT + '), blank for the start of the data: ')
+        endText = raw_input('Plot until (UTC, ' + CSV_TIME_FORMAT + '), blank for the end of the data: ')
+        try:
+            return parse_window(startText, endText)
+        except ValueError as e:
+            print e
+
+def plot_filtered_data(dataTuple, filtersTuple, figName=None):
 
     if len(dataTuple[0]) > 0:
-        make_subplot(dataTuple, filtersTuple)
+        return make_subplot(dataTuple, filtersTuple, figName)
     else:
         print 'No data available to plot. Check filter spelling, mutually exclusive filters, etc.'
 
 
-def make_subplot(dataTuple, filtersTuple):
+def make_subplot(dataTuple, filtersTuple, figName=None):
     '''
     This function will dynamically create many subplots.
     ** If names are all of one pathName, then they are all the same unit and have the same y axis. Can make any m x n
@@ -322,8 +592,12 @@ def make_subplot(dataTuple, filtersTuple):
 
     :param dataTuple:
     :param filtersTuple:
-    :return: a figure containing subplots
+    :param figName: png file to save to without showing the figure (batch mode). default asks the user for a name and
+        shows the figure
+    :return: name of the saved png
     '''
+    import matplotlib.dates as dates
+    import matplotlib.pyplot as plt
 
     # unpack tuples
     dataDFList = dataTuple[0]
@@ -343,9 +617,9 @@ def make_subplot(dataTuple, filtersTuple):
     numPrereqs = 0
     prereqList = []
     for q in PREREQ_PATHS:
-        if q in n_prereqList + u_prereqList:
+        if q in n_prereqsList + u_prereqsList:
             numPrereqs += 1
-            prereqList.append(0)
+            prereqList.append(q)
 
     if (numPaths + numPrereqs) > 1:
         isContextPlot = True
@@ -362,13 +636,18 @@ def make_subplot(dataTuple, filtersTuple):
         numSubplots = int(math.ceil(len(dataDFList)/float(TRENDS_PER_SUBPLOT)))
         numRows = min(MAX_SUBPLOT_ROWS, numSubplots)
         numCols = int(math.ceil(numSubplots/float(numRows)))
-        (xmin, xmax) = get_start_end(dataDFList)
+        span = get_start_end(dataDFList)
+        if span is None:
+            print 'No data available to plot in the window.'
+            return None
+        (xmin, xmax) = span
         # get y limit, only if filtering on pathName:
         ymin = Y_LIMS[pathList[0]][0]
         ymax = Y_LIMS[pathList[0]][1]
         parsedNames = get_parsed_list(dataNames, SEPARATORS[pathList[0]],unique=False)  # used for legend labels
 
         fig = plt.figure(figsize=(COL_SIZE*numCols, ROW_SIZE*numRows))  # figsize = w,h tuple in inches
+        pixels = int(COL_SIZE * fig.dpi)  # width of one subplot, to downsample each trend to
         # loop over columns, then rows (prioritizing subplot stacking)
         i_end = 0
         for nc in range(numCols):
@@ -378,7 +657,8 @@ def make_subplot(dataTuple, filtersTuple):
                 i_start = i_end
                 i_end = min(i_start + TRENDS_PER_SUBPLOT, len(dataDFList))
                 for df in range(i_start, i_end):
-                    plt.plot(dates.num2date(dataDFList[df].index), dataDFList[df])
+                    (x, y) = get_plot_data(dataNames[df], dataDFList[df], xmin, xmax, pixels)
+                    plt.plot(dates.num2date(x), y)
                     plt.hold(True)
                     labels.append(parsedNames[df])
                 ax.set_xlim([xmin,xmax])
@@ -393,130 +673,152 @@ def make_subplot(dataTuple, filtersTuple):
         fig.suptitle(TREND_TITLES[pathList[0]], horizontalalignment='center',verticalalignment='top')
         # fig.text(0.5, 0.95, 'Test set started: '+str(dates.num2date(xmin)), horizontalalignment='center',verticalalignment='bottom')
 
-    figName = raw_input('save fig as: __.png ')+'.png'  # get name to save plot as
-    plt.savefig(figName)
-    plt.show()
-    plt.clf()
+    if figName is None:
+        figName = raw_input('save fig as: __.png ')+'.png'  # get name to save plot as
+        plt.savefig(figName)
+        plt.show()
+        plt.clf()
+    else:
+        plt.savefig(figName)
+        plt.close()
+    return figName
+
+def get_plot_data(name, data, xmin, xmax, pixels):
+    '''
+    reduces one series to about pixels points across [xmin, xmax] before plotting, keeping peaks (see downsample.py)
+    :param name: series filename, used to cache the series' downsampling pyramid
+    :param data: dataframe or LazySeries
+    :return: tuple (x, y) of numpy arrays, x in matplotlib dates
+    '''
+    values = np.asarray(data.values)
+    if values.ndim > 1:
+        values = values[:, 0]
+    return downsample.reduce_series(name, np.asarray(data.index, dtype=float), values, xmin, xmax, pixels,
+                                    DOWNSAMPLE_METHOD)
 
 def get_start_end(DFList):
+    '''
+    :param DFList: list of dataframes or LazySeries
+    :return: (start, end) matplotlib dates spanning all of the data, or None if none of them has any data
+    '''
     startlist = []
     endlist = []
     for df in DFList:
-        startlist.append(df.index[0])
-        endlist.append(df.index[-1])
+        if isinstance(df, LazySeries):
+            span = df.get_start_end()
+            if span is not None:
+                startlist.append(span[0])
+                endlist.append(span[1])
+        elif len(df) > 0:
+            startlist.append(df.index[0])
+            endlist.append(df.index[-1])
+    if not startlist:
+        return None
     startTime = min(startlist)
     endTime = max(endlist)
     return startTime, endTime
 
-def plot_test_set_data(names):
+def plot_test_set_data(names, figName=None):
     '''
     Creates a multi-subplot that spans all trends.
     Useful to understanding the test set environment.
     Can operate on entire test set, or on some boxes
+    All trends are first aligned on one time grid (see trend_matrix.py), so each row plots slices of the same matrix.
     :param names: filenames
-    :return: one figure with subplots
-    '''
-    NUM_TRENDS = 6
-
-    # damper position
-    measureDamperFiles = filter_data(['measure_damper_opening_real'], names)
-    measureDamperTuple = get_all_files_info(measureDamperFiles)
-    measureDamperDFList = measureDamperTuple[0]
-    measureDamperNames = get_parsed_list(measureDamperTuple[1],['\\','_site'], unique=False)  # get legend labels
-
-    actuatorDamperFiles = filter_data(['actuator_u_damper_opening_real'], names)
-    actuatorDamperTuple = get_all_files_info(actuatorDamperFiles)
-    actuatorDamperDFList = actuatorDamperTuple[0]
-    actuatorDamperNames = get_parsed_list(actuatorDamperTuple[1],['\\','_site'], unique=False)  # get legend labels
-
-    actuatorDamper_lockFiles = filter_data(['actuator_u_damper_opening_lock_real'], names)
-    actuatorDamper_lockTuple = get_all_files_info(actuatorDamper_lockFiles)
-    actuatorDamper_lockDFList = actuatorDamper_lockTuple[0]
-    actuatorDamper_lockNames = get_parsed_list(actuatorDamper_lockTuple[1],['\\','_site'], unique=False)  # get legend labels
-
-    plt.figure(1)
-    plt.subplot(NUM_TRENDS,1,1)
-    labels = []
-    for df in range(0,len(measureDamperDFList)):
-        plt.plot(measureDamperDFList[df].index, measureDamperDFList[df],'-',
-                 actuatorDamperDFList[df].index, actuatorDamperDFList[df],':',
-                 actuatorDamper_lockDFList[df].index, actuatorDamper_lockDFList[df],'o',)
-        plt.hold(True)
-        labels.extend([measureDamperNames[df], actuatorDamperNames[df], actuatorDamper_lockNames[df]])
-    plt.legend(labels, fontsize='10')  # apply legend labels
-    plt.ylabel(TREND_UNITS['measure_damper_opening_real'])  # apply y axis label
-    plt.title('Damper Position')
-
-    # box airflow
-    plt.subplot(NUM_TRENDS,1,2)
-    cfm = filter_data(['measure_mdot_real'], names)
-
-    # discharge air temp
-
-
-    # zone temp
-    plt.subplot(NUM_TRENDS,1,3)
-    'measure_zone_temp'
-
-    # hot water valve
-    plt.subplot(NUM_TRENDS,1,4)
-    'actuator_u_hv_lock_real'
-    'measure_hv_real'
-
-    # ColdDuctPressure
-    plt.subplot(NUM_TRENDS,1,5)
-    'actuator_u_static_pressure_real'
-    'measure_static_pressure_stpt_real'
-
-    # ColdDuctTemperature
-    plt.subplot(NUM_TRENDS,1,6)
-    'measure_Ts_T'
-
-    # HotWaterTemperature
-    # HotWaterPressure
-
-
-# 1) Read folder contents and then file contents and understand what trends are available
-filenames = get_folder_info("C:\Users\christina\Documents\All_BrightBox_Docs\ALPHA TEST\Test Set Analytics\/test_csv_data_851")
-# siteIDs = get_parsed_list(filenames, ['site_', '_'], unique=True)
-# testIDs = get_parsed_list(filenames, ['\\','__'], unique=True)
-refNames = get_parsed_list(filenames, start=['__'],end=['_V'], unique=True)
-pathNames = get_parsed_list(filenames, ['VAVR_','_path'], unique=True)  # need a unique separator to make this more general!!
-prereqNames = filter_data(([],[],[],PREREQ_PATHS),testIDs)
-
-# show available filter keywords:
-print 'Available filter keywords are: '
-# print '*****Site ID:*****'
-# for s in siteIDs: print s
-# print '*****Test ID:*****'
-# for t in testIDs: print t
-print '*****Equipment reference name:*****'
-for r in refNames: print r
-print '*****Path name:*****'
-for p in pathNames: print p
-print 10*'**'
-
-# ask user to provide filter(s)
-print 'Filter on keywords. '
-n_filterList = get_filter_list('n')
-u_filterList = get_filter_list('u')
-print 'Available prerequisites are: '
-print '*****Prereq ID:*****'
-for q in prereqNames: print q
-print 'Add prerequisites to plot. '
-n_prereqList = get_filter_list('n')
-u_prereqList = get_filter_list('u')
-
-# use filters to select relevant filenames from folder
-filterListTuple = (n_filterList, u_filterList, n_prereqList, u_prereqList)
-filteredFiles = filter_data(filterListTuple, filenames)
-
-# open relevant files and import data to pandas dataframe
-# Note: filteredFiles are ALL filenames that match the filters; filteredNames are only filenames that also contain data (are not empty).
-filteredDataTuple = get_all_files_info(filteredFiles)  # tuple = (DFList, namesList)
-
-# plotting:
-plot_filtered_data(filteredDataTuple, filterListTuple)
+    :param figName: png file to save to without showing the figure. default shows the figure
+    :return: TrendMatrix of the plotted trends, or None if there was no data
+    '''
+    matrix = build_trend_matrix(names, trends=[t for row in CONTEXT_ROWS for (t, style) in row[1]])
+    if matrix is None:
+        return None
+    import matplotlib.dates as dates
+    import matplotlib.pyplot as plt
+    x = ns_to_num(matrix.times)
+    (xmin, xmax) = (x[0], x[-1])
+
+    fig = plt.figure(1, figsize=(COL_SIZE * 2, ROW_SIZE * len(CONTEXT_ROWS)))
+    pixels = int(fig.get_figwidth() * fig.dpi)  # to downsample each trend to
+    for row in range(len(CONTEXT_ROWS)):
+        (title, trendStyles) = CONTEXT_ROWS[row]
+        ax = plt.subplot(len(CONTEXT_ROWS), 1, row + 1)
+        labels = []
+        for (trend, style) in trendStyles:
+            if trend not in matrix.trend_index:
+                continue
+            values = matrix.get(trend)
+            for box in matrix.get_boxes_with(trend):
+                y = values[matrix.box_index[box]]
+                (x_plot, y_plot) = downsample.reduce_series((box, trend), x, y, xmin, xmax, pixels, DOWNSAMPLE_METHOD)
+                plt.plot(dates.num2date(x_plot), y_plot, style)
+                plt.hold(True)
+                labels.append(box + ' ' + trend)
+        ax.set_xlim([xmin, xmax])
+        if labels:
+            plt.legend(labels, fontsize='8')  # apply legend labels
+        plt.ylabel(TREND_UNITS[trendStyles[0][0]])  # apply y axis label
+        plt.title(title)
+
+    if figName is None:
+        plt.show()
+        plt.clf()
+    else:
+        plt.savefig(figName)
+        plt.close()
+    return matrix
+
+
+def main(folder=DEFAULT_FOLDER):
+    '''
+    interactive session: shows the available filter keywords, asks for filters, then plots the matching trends
+    :param folder: folder of exported point-path csv files, or a point store folder (see point_store.py)
+    '''
+    # 1) Read folder contents and then file contents and understand what trends are available
+    (store, filenames) = get_source_info(folder)
+    # siteIDs = get_parsed_list(filenames, ['site_', '_'], unique=True)
+    # testIDs = get_parsed_list(filenames, ['\\','__'], unique=True)
+    refNames = get_parsed_list(filenames, ['__', '_V'], unique=True)
+    pathNames = get_parsed_list(filenames, ['VAVR_','_path'], unique=True)  # need a unique separator to make this more general!!
+    prereqNames = filter_data(([],[],[],PREREQ_PATHS),filenames)
+
+    # show available filter keywords:
+    print 'Available filter keywords are: '
+    # print '*****Site ID:*****'
+    # for s in siteIDs: print s
+    # print '*****Test ID:*****'
+    # for t in testIDs: print t
+    print '*****Equipment reference name:*****'
+    for r in refNames: print r
+    print '*****Path name:*****'
+    for p in pathNames: print p
+    print 10*'**'
+
+    # ask user to provide filter(s)
+    print 'Filter on keywords. '
+    n_filterList = get_filter_list('n')
+    u_filterList = get_filter_list('u')
+    print 'Available prerequisites are: '
+    print '*****Prereq ID:*****'
+    for q in prereqNames: print q
+    print 'Add prerequisites to plot. '
+    n_prereqList = get_filter_list('n')
+    u_prereqList = get_filter_list('u')
+
+    # use filters to select relevant filenames from folder
+    filterListTuple = (n_filterList, u_filterList, n_prereqList, u_prereqList)
+    filteredFiles = filter_data(filterListTuple, filenames)
+
+    # handles to the relevant series, read only when plotted and only inside the window (see LazySeries)
+    # Note: filteredFiles are ALL filenames that match the filters; filteredNames are only filenames that also contain data (are not empty).
+    window = get_window()
+    filteredDataTuple = get_lazy_source_info(store, filteredFiles, window)  # tuple = (handle list, namesList)
+
+    # plotting:
+    plot_filtered_data(filteredDataTuple, filterListTuple)
+
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
 
 
 # to do:
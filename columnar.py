@@ -0,0 +1,117 @@
+__author__ = 'christina'
+
+"""
+Helpers for storing parsed test set data as typed columnar tables.
+
+A table folder holds one .npy file per column (named <table>.<column>.npy) and a manifest.json that lists the tables,
+their columns and the dictionaries used to encode string columns (box, test, prereq, ...). String columns are stored
+as int32 codes into a dictionary; timestamps are stored as int64 nanoseconds since the unix epoch (UTC), so downstream
+code can memory-map the columns and view them as datetime64[ns] without touching the raw text.
+
+Example (pandas):
+    tables, dicts = load_columns('valencia-1751_columns')
+    running = tables['running']
+    box = pd.Categorical.from_codes(running['box'], dicts['box'])
+    start = running['start'].view('datetime64[ns]')
+"""
+import calendar
+import json
+import os
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+TIME_UNIT = 'ns'
+NS_PER_SECOND = 10 ** 9
+
+
+def datetime_to_ns(a_datetime):
+    '''
+    converts a naive UTC datetime (as produced by TestSet.convert_datetime) to int nanoseconds since the epoch
+    '''
+    return (calendar.timegm(a_datetime.timetuple()) * NS_PER_SECOND) + a_datetime.microsecond * 1000
+
+
+def datetimes_to_ns(datetime_list):
+    return np.array([datetime_to_ns(x) for x in datetime_list], dtype=np.int64)
+
+
+class Dictionary(object):
+    '''
+    Builds a dictionary encoding for a string column: each unique value gets an int code in order of first appearance.
+    '''
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.encode(name)
+
+    def encode(self, name):
+        try:
+            return self.codes[name]
+        except KeyError:
+            self.codes[name] = len(self.names)
+            self.names.append(name)
+            return self.codes[name]
+
+    def encode_list(self, name_list):
+        return np.array([self.encode(x) for x in name_list], dtype=np.int32)
+
+
+def write_columns(dirname, tables, dictionaries):
+    '''
+    writes tables to a folder of .npy columns plus a manifest
+    :param dirname: folder to write to, created if it does not exist
+    :param tables: dict of table name: list of (column name, numpy array) tuples. all columns of a table must have
+        the same length
+    :param dictionaries: dict of dictionary name: list of names. codes in string columns index into these lists
+    :return: path of the manifest
+    '''
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+
+    manifest = {
+        'time_unit': TIME_UNIT,
+        'dictionaries': dictionaries,
+        'tables': {}
+    }
+    for table_name, columns in tables.items():
+        lengths = set(len(array) for (column, array) in columns)
+        if len(lengths) > 1:
+            raise ValueError('Columns of table ' + table_name + ' have different lengths')
+        manifest['tables'][table_name] = {
+            'rows': lengths.pop() if lengths else 0,
+            'columns': []
+        }
+        for (column, array) in columns:
+            np.save(os.path.join(dirname, table_name + '.' + column + '.npy'), np.ascontiguousarray(array))
+            manifest['tables'][table_name]['columns'].append({
+                'name': column,
+                'dtype': str(array.dtype)
+            })
+
+    manifest_path = os.path.join(dirname, MANIFEST)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest_path
+
+
+def load_columns(dirname, mmap_mode='r'):
+    '''
+    reads a folder written by write_columns.
+    :param dirname: folder containing manifest.json
+    :param mmap_mode: passed to numpy.load. default 'r' memory-maps columns read-only (zero-copy); None reads to memory
+    :return: tuple:
+        dict of table name: dict of column name: numpy array
+        dict of dictionary name: list of names
+    '''
+    with open(os.path.join(dirname, MANIFEST), 'r') as f:
+        manifest = json.load(f)
+
+    tables = {}
+    for table_name, table_info in manifest['tables'].items():
+        tables[table_name] = {}
+        for column in table_info['columns']:
+            tables[table_name][column['name']] = np.load(
+                os.path.join(dirname, table_name + '.' + column['name'] + '.npy'), mmap_mode=mmap_mode)
+    return tables, manifest['dictionaries']
@@ -0,0 +1,97 @@
+__author__ = 'christina'
+
+"""
+Transparent reading of compressed test set logs and point-path csv files.
+
+open_input opens a file for binary reading and, if it starts with the magic bytes of gzip, bz2, xz or zstd, returns a
+stream that decompresses it while it is read, so a compressed file can be passed anywhere a plain one is read,
+without a temporary file. The file name does not matter.
+gzip and bz2 are in the standard library. xz needs lzma (python 3, or backports.lzma on python 2) and zstd needs
+zstandard; they are only imported when a file of that kind is opened.
+"""
+import bz2
+import gzip
+import io
+
+# (name, magic bytes at the start of the file)
+MAGIC = [
+    ('gzip', b'\x1f\x8b'),
+    ('bz2', b'BZh'),
+    ('xz', b'\xfd7zXZ\x00'),
+    ('zstd', b'\x28\xb5\x2f\xfd')
+]
+MAGIC_LENGTH = max(len(x[1]) for x in MAGIC)
+EXTENSIONS = ['.gz', '.bz2', '.xz', '.zst']
+READ_BUFFER = 1 << 16
+
+
+def detect_compression(filename):
+    '''
+    :return: 'gzip', 'bz2', 'xz' or 'zstd' by the file's magic bytes, or None for an uncompressed file
+    '''
+    with open(filename, 'rb') as f:
+        head = f.read(MAGIC_LENGTH)
+    for (name, magic) in MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def is_compressed(filename):
+    return detect_compression(filename) is not None
+
+
+def open_input(filename):
+    '''
+    :return: binary file object that reads the (decompressed) contents of filename, for use in a with statement
+    '''
+    compression = detect_compression(filename)
+    if compression is None:
+        return open(filename, 'rb')
+    if compression == 'gzip':
+        return gzip.GzipFile(filename, 'rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(filename, 'rb')
+    if compression == 'xz':
+        try:
+            import lzma
+        except ImportError:
+            try:
+                from backports import lzma
+            except ImportError:
+                raise IOError('Reading xz files needs the lzma module (backports.lzma on python 2): ' + filename)
+        return lzma.LZMAFile(filename, 'rb')
+    try:
+        import zstandard
+    except ImportError:
+        raise IOError('Reading zstd files needs the zstandard module: ' + filename)
+    reader = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'))
+    return io.BufferedReader(reader, READ_BUFFER)
+
+
+def strip_extension(filename):
+    '''
+    :return: filename without a compression extension, e.g. valencia-153.txt.gz -> valencia-153.txt
+    '''
+    for extension in EXTENSIONS:
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+
+def strip_log_extension(filename):
+    '''
+    :return: filename without a compression extension or .txt, e.g. valencia-153.txt.gz -> valencia-153
+    '''
+    name = strip_extension(filename)
+    if name.endswith('.txt'):
+        name = name[:-len('.txt')]
+    return name
+
+
+def read_lines(filename):
+    '''
+    :return: list of the lines of the (decompressed) file, without line endings
+    '''
+    with open_input(filename) as f:
+        return f.read().splitlines()
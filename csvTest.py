@@ -1,19 +1,16 @@
 __author__ = 'christina'
 
-import glob, csv
+import csv
+from compressed import open_input
+from folder_manifest import get_folder_manifest, get_row_counts
 
 def get_files():
     # get directory from user
-    file_dir = raw_input('what folder? use \ instead of /: ')+'/*'
+    file_dir = raw_input('what folder? use \ instead of /: ')
 
-    # get list of filenames
-    filenames = glob.glob(file_dir)
-    filenames_clean = []
-    for i in range(len(filenames)):
-        front, sep, end = filenames[i].rpartition('\\')
-        filenames_clean.append(end)
-    return filenames, filenames_clean
-    # parse filenames
+    # get list of filenames from the folder manifest, which only re-reads files added or changed since the last run
+    manifest = get_folder_manifest(file_dir)
+    return manifest.filenames(), manifest.names()
 
 def count_lines(filehandle):
     count = 0
@@ -36,7 +33,7 @@ def get_file_info(filename):
         length of list (number of lines/rows in the file)
         width of list (number of columns in the file)
     '''
-    with open(filename, 'rb') as f:
+    with open_input(filename) as f:  # plain or compressed, see compressed.py
         reader_obj = csv.reader(f)
         file_list = unpack_file(reader_obj)
         num_rows = len(file_list)
@@ -57,14 +54,11 @@ def get_col_list(file_list,i_col):
     return col_list
 
 def get_file_lengths(filenames):
-    lengths = []
-    count = 0
-    for f in filenames:
-        print count
-        a, length, c = get_file_info(f)
-        lengths.append(length)
-        count += 1
-    return lengths
+    '''
+    :param filenames: list of full file names
+    :return: list of row counts, read from the folder manifest instead of opening and parsing every file
+    '''
+    return get_row_counts(filenames)
 
 def find_empty(lengths, filenames):
     '''
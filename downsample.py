@@ -0,0 +1,155 @@
+__author__ = 'christina'
+
+"""
+Downsampling of trend data for plotting.
+
+A week of 1-minute data is ~10000 points per series, far more than the few hundred pixels a subplot is wide. Plotting
+every sample makes rendering slow and the pngs huge. reduce_series cuts a series down to about the subplot's pixel width
+before it is plotted, while keeping peaks:
+    'minmax': keep the min and max sample in each pixel column (exact envelope, up to 2 points per pixel)
+    'lttb': Largest-Triangle-Three-Buckets, one point per pixel that best preserves the visual shape
+
+Each series gets a cached multi-resolution pyramid (each level a min/max reduction of the one below it, about half the
+size), so zoomed re-renders start from the coarsest level that still has enough points in view instead of the raw data.
+A pyramid is reused only while its series' data (x and y) is unchanged, and only the MAX_PYRAMIDS most recently used
+pyramids are kept.
+"""
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+METHODS = ['minmax', 'lttb']
+LEVEL_FACTOR = 4  # each pyramid level has len(previous level) / LEVEL_FACTOR buckets, i.e. about half the points
+MIN_LEVEL_POINTS = 512  # stop building pyramid levels below this many points
+MAX_PYRAMIDS = 64  # least recently used pyramids past this many are dropped
+
+# series key: Pyramid, least recently used first
+pyramids = OrderedDict()
+
+
+def minmax_indices(x, n_buckets, y, bucket_by_x=True):
+    '''
+    :param x: sorted numpy array
+    :param n_buckets: number of buckets
+    :param y: numpy array of values, no NaNs
+    :param bucket_by_x: True for equal-width buckets in x (pixel columns), False for equal-count buckets
+    :return: sorted numpy array of the indices of the min and max of y in each bucket
+    '''
+    n = len(x)
+    if n == 0:
+        return np.array([], dtype=int)
+    if bucket_by_x and x[-1] > x[0]:
+        bucket = ((x - x[0]) * (n_buckets / float(x[-1] - x[0]))).astype(int)
+        bucket = np.minimum(bucket, n_buckets - 1)
+    else:
+        bucket = (np.arange(n) * n_buckets) // n
+    # sort by bucket, then by y: the first index of each bucket is its min, the last its max
+    order = np.lexsort((y, bucket))
+    sorted_bucket = bucket[order]
+    is_first = np.concatenate(([True], sorted_bucket[1:] != sorted_bucket[:-1]))
+    is_last = np.concatenate((sorted_bucket[1:] != sorted_bucket[:-1], [True]))
+    return np.unique(np.concatenate((order[is_first], order[is_last])))
+
+
+def lttb_indices(x, y, n_out):
+    '''
+    Largest-Triangle-Three-Buckets: keeps the first and last point, and from each of n_out - 2 equal-count buckets the
+    point that makes the largest triangle with the point kept from the previous bucket and the mean of the next bucket.
+    :return: numpy array of n_out sorted indices (or all indices if there are fewer points)
+    '''
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        (start, end) = (edges[i], edges[i + 1])
+        if i + 2 < len(edges):
+            (next_start, next_end) = (edges[i + 1], edges[i + 2])
+        else:
+            (next_start, next_end) = (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+class Pyramid(object):
+    '''
+    Multi-resolution min/max levels of one series. levels[0] is the raw (finite) data.
+    '''
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.signature = get_signature(x, y)
+        finite = np.isfinite(y)
+        self.levels = [(x[finite], y[finite])]
+        while len(self.levels[-1][0]) > MIN_LEVEL_POINTS:
+            (level_x, level_y) = self.levels[-1]
+            kept = minmax_indices(level_x, len(level_x) // LEVEL_FACTOR, level_y, bucket_by_x=False)
+            self.levels.append((level_x[kept], level_y[kept]))
+
+    def get_view(self, xmin, xmax, min_points):
+        '''
+        :return: (x, y) of the coarsest level that still has at least min_points inside [xmin, xmax], clipped to that
+            range plus one point on either side so lines run to the edges
+        '''
+        for (level_x, level_y) in reversed(self.levels):
+            i_start = max(0, np.searchsorted(level_x, xmin, 'left') - 1)
+            i_end = min(len(level_x), np.searchsorted(level_x, xmax, 'right') + 1)
+            if i_end - i_start >= min_points or level_x is self.levels[0][0]:
+                return level_x[i_start:i_end], level_y[i_start:i_end]
+
+
+def get_signature(x, y):
+    '''
+    :return: (number of points, md5 of x and y), changes if any sample of the series changes
+    '''
+    digest = hashlib.md5()
+    digest.update(np.ascontiguousarray(x, dtype=float).tostring())
+    digest.update(np.ascontiguousarray(y, dtype=float).tostring())
+    return len(x), digest.hexdigest()
+
+
+def get_pyramid(key, x, y):
+    '''
+    :param key: identifies the series, e.g. its filename
+    :return: cached Pyramid for the series, rebuilt if the data changed
+    '''
+    pyramid = pyramids.pop(key, None)
+    if pyramid is None or pyramid.signature != get_signature(x, y):
+        pyramid = Pyramid(x, y)
+    pyramids[key] = pyramid  # most recently used
+    while len(pyramids) > MAX_PYRAMIDS:
+        pyramids.popitem(last=False)
+    return pyramid
+
+
+def reduce_series(key, x, y, xmin, xmax, pixels, method='minmax'):
+    '''
+    reduces a series to about pixels points across [xmin, xmax], keeping peaks
+    :param key: identifies the series for the pyramid cache, e.g. its filename
+    :param x: sorted numpy array (e.g. matplotlib dates)
+    :param y: numpy array of values
+    :param xmin: left edge of the plot
+    :param xmax: right edge of the plot
+    :param pixels: width of the plot in pixels
+    :param method: 'minmax' or 'lttb'
+    :return: tuple of numpy arrays (x, y)
+    '''
+    if method not in METHODS:
+        raise ValueError('Downsampling method not recognized')
+    (view_x, view_y) = get_pyramid(key, x, y).get_view(xmin, xmax, 2 * pixels)
+    if len(view_x) <= 2 * pixels:
+        return view_x, view_y
+    if method == 'minmax':
+        kept = minmax_indices(view_x, pixels, view_y)
+    else:
+        kept = lttb_indices(view_x, view_y, pixels)
+    return view_x[kept], view_y[kept]
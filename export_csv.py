@@ -1,61 +1,335 @@
 __author__ = 'colin'
+"""
+Exports the point-path series of a test set's passed and failed tests, and of their prereqs, for bbdata.
+
+Run with the django settings of the bbdata / auto_cx_I apps configured, e.g.
+    python export_csv.py 749 751            -> test_csv_data_749/<name>, test_csv_data_751/<name> csv files
+    python export_csv.py 749 --gzip         -> test_csv_data_749/<name>.gz
+    python export_csv.py 749 --store        -> test_set_749.store (see point_store.py)
+
+Series are named '<test id>__<point path>' and '<prereq>__<point path>'. Related objects (prereqs, dcr point paths,
+lock psr point paths, equipment) are prefetched for all tests in a few queries instead of a few per test, each series
+is fetched once even if several tests or prereqs share it, and rows are streamed to disk through a buffered writer.
+Each (point path, time window) is still one PointPath.get_series call: the bbdata models have no query for the series
+of several point paths at once.
+
+tests/test_export_csv.py runs the exporter end to end against a SQLite stand-in of the two apps (tests/standin).
+
+Fetches run in a bounded pool of threads; fetched series go through a bounded queue to a writer thread, so database
+round trips overlap with compression and disk writes. A failed fetch is retried FETCH_RETRIES times before the series
+is reported as failed.
+
+Exports are incremental: each output keeps a watermark per series (the time of its last exported sample) in
+.export_watermarks.json, re-runs only fetch data newer than it and append it, to the store as a new segment or to the
+end of the csv file. To re-export from scratch, delete the output.
+"""
+import argparse
+import datetime as dt
+import gzip
+import io
+import json
 import os
+import Queue
+import sys
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 from bbdata.models import *
 from auto_cx_I.models import *
 from django.db.models import Q
-test_set = CXTestSetRunner.objects.get(id=749)
-print test_set.run_at
-test_types = "VVC_DPC", "VVC_AFS", "VVC_ZSA", "VVR_DPC", "VVR_AFS", "VVR_ZSA", "DDV_DPC", "DDV_AFS", "DDV_ZSA"
-test_statuses = [TEST_FAILED, TEST_PASSED]
-tests = test_set.tests.filter(result__in=test_statuses, test_type__in=test_types)
-print tests
-print len(tests)
-prereqs = []
-for test in tests:
-    print 'new test'
-    for prereq in test.prerequisites.all():
-        if prereq not in prereqs:
-            prereqs.append(prereq)
-    dcr = test.dcr
-    point_paths = list(test.dcr.point_paths.all())
-    print 'point paths'
-    print point_paths
-    for lock_psr in test.lock_psrs.all():
-        point_paths.append(lock_psr.point_path)
-    for point_path in point_paths:
-        if test.equipment.equipment.reference_name in point_path.name:
-            print 'new point path'
-            fname = str(test.id) + "__" + point_path.name
-            print fname
-            fstring = ""
-            pp_data = point_path.get_series(test.run_at, test.ended_at)
-            for timestamp in pp_data.index:
-                fstring += str(timestamp) + "," + str(pp_data[timestamp]) + '\n'
-                # ASK ABOUT HOW TO FORMAT THE TIMESTAMP!!
-            fpath = os.path.join(os.path.join(os.getcwd(), 'test_csv_data'), fname)
-            f = open(fpath, 'w')
-            f.write(fstring)
-            f.flush()
-            f.close()
-            print 'wrote to file ' + fpath
-print prereqs
-for prereq in prereqs:
-    print 'new prereq'
-    print prereq
-    for point_path in prereq.dcr.point_paths.all():
-        print 'new point path'
-        fname = str(prereq) + "__" + point_path.name
-        print fname
-        fstring = ""
-        pp_data = point_path.get_series(prereq.dcr.start, prereq.dcr.end)
-        for timestamp in pp_data.index:
-            fstring += str(timestamp) + "," + str(pp_data[timestamp]) + '\n'
-            # ASK ABOUT HOW TO FORMAT THE TIMESTAMP!!
-        fpath = os.path.join(os.path.join(os.getcwd(), 'test_csv_data'), fname)
-        f = open(fpath, 'w')
-        f.write(fstring)
-        f.flush()
-        f.close()
-        print 'wrote to file ' + fpath
+from django.utils import timezone
+from point_store import PointStore
+
+TEST_TYPES = ("VVC_DPC", "VVC_AFS", "VVC_ZSA", "VVR_DPC", "VVR_AFS", "VVR_ZSA", "DDV_DPC", "DDV_AFS", "DDV_ZSA")
+BATCH_SIZE = 200  # series written per batch
+WRITE_BUFFER = 1 << 20  # bytes
+FETCH_THREADS = 8  # concurrent get_series calls
+QUEUE_SIZE = 2 * BATCH_SIZE  # fetched series waiting to be written, bounds memory use
+FETCH_RETRIES = 3
+RETRY_WAIT = 2  # seconds, doubled after each failed attempt
+PROGRESS_EVERY = 50  # series
+WATERMARK_FILENAME = '.export_watermarks.json'
+NS_PER_SECOND = 10 ** 9
+
+
+def get_tests(test_set, test_types=TEST_TYPES):
+    '''
+    :return: queryset of the passed and failed tests of test_set, with everything the export needs prefetched
+    '''
+    return test_set.tests.filter(result__in=[TEST_FAILED, TEST_PASSED], test_type__in=test_types) \
+        .select_related('dcr', 'equipment__equipment') \
+        .prefetch_related('prerequisites__dcr__point_paths', 'dcr__point_paths', 'lock_psrs__point_path')
+
+
+def get_export_plan(tests):
+    '''
+    :param tests: tests from get_tests
+    :return: list of (series name, point path, start, end) tuples, one per series to export
+    '''
+    plan = []
+    names = set()
+    prereqs = []
+    for test in tests:
+        for prereq in test.prerequisites.all():
+            if prereq not in prereqs:
+                prereqs.append(prereq)
+        point_paths = list(test.dcr.point_paths.all()) + [x.point_path for x in test.lock_psrs.all()]
+        for point_path in point_paths:
+            if test.equipment.equipment.reference_name in point_path.name:
+                fname = str(test.id) + "__" + point_path.name
+                if fname not in names:
+                    names.add(fname)
+                    plan.append((fname, point_path, test.run_at, test.ended_at))
+    for prereq in prereqs:
+        for point_path in prereq.dcr.point_paths.all():
+            fname = str(prereq) + "__" + point_path.name
+            if fname not in names:
+                names.add(fname)
+                plan.append((fname, point_path, prereq.dcr.start, prereq.dcr.end))
+    return plan
+
+
+class Watermarks(object):
+    '''
+    series name: int ns of the last exported sample, saved as json next to the exported data
+    '''
+    def __init__(self, dirname):
+        self.path = os.path.join(dirname, WATERMARK_FILENAME)
+        try:
+            with open(self.path, 'r') as f:
+                self.marks = json.load(f)
+        except (IOError, ValueError):
+            self.marks = {}
+
+    def get(self, fname):
+        return self.marks.get(fname)
+
+    def update(self, fname, last_ns):
+        if last_ns > self.marks.get(fname, -1):
+            self.marks[fname] = last_ns
+
+    def save(self):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.marks, f)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(self.path + '.tmp', self.path)
+
+
+def get_watermark_datetime(last_ns, like):
+    '''
+    :param like: datetime to match the time zone awareness of, e.g. test.run_at
+    :return: the watermark as a UTC datetime, rounded down to the second
+    '''
+    watermark = dt.datetime.utcfromtimestamp(last_ns // NS_PER_SECOND)
+    if like is not None and timezone.is_aware(like):
+        watermark = watermark.replace(tzinfo=timezone.utc)
+    return watermark
+
+
+def apply_watermarks(plan, watermarks):
+    '''
+    moves the start of each series with a watermark up to it, and drops series that are exported through their end
+    :return: plan
+    '''
+    result = []
+    for (fname, point_path, start, end) in plan:
+        last_ns = watermarks.get(fname)
+        if last_ns is not None:
+            start = max(start, get_watermark_datetime(last_ns, start))
+            if end is not None and start >= end:
+                continue
+        result.append((fname, point_path, start, end))
+    return result
+
+
+def get_new_rows(series_list, watermarks):
+    '''
+    :return: series_list with the rows at or before each series' watermark dropped, and empty series left out
+    '''
+    result = []
+    for (fname, data) in series_list:
+        last_ns = watermarks.get(fname)
+        if last_ns is not None:
+            data = data[data.index.asi8 > last_ns]
+        if len(data) > 0:
+            result.append((fname, data))
+    return result
+
+
+def group_plan(plan):
+    '''
+    :return: list of (point path, start, end, list of series names) tuples, one per point path and time window, so a
+        series that several tests or prereqs share is fetched once
+    '''
+    tasks = {}  # (point path id, start, end): task
+    order = []
+    for (fname, point_path, start, end) in plan:
+        key = (point_path.pk, start, end)
+        if key not in tasks:
+            tasks[key] = (point_path, start, end, [])
+            order.append(key)
+        tasks[key][3].append(fname)
+    return [tasks[x] for x in order]
+
+
+def fetch_with_retry(task):
+    '''
+    runs in a fetch thread
+    :param task: from group_plan
+    :return: tuple of (series names, pandas series or None if every attempt failed)
+    '''
+    (point_path, start, end, fnames) = task
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            return fnames, point_path.get_series(start, end)
+        except Exception as e:
+            print 'fetch of ' + fnames[0] + ' failed (' + str(e) + ')'
+            if attempt < FETCH_RETRIES:
+                time.sleep(RETRY_WAIT * 2 ** attempt)
+    return fnames, None
+
+
+def write_from_queue(queue, writer, batch_size, errors):
+    '''
+    runs in the writer thread: writes series from queue in batches until it gets None
+    :param errors: list to append a write exception to, so the main thread can raise it
+    '''
+    batch = []
+    try:
+        while True:
+            item = queue.get()
+            if item is not None:
+                batch.extend(item)
+            if batch and (item is None or len(batch) >= batch_size):
+                writer.write(batch)
+                batch = []
+            if item is None:
+                break
+    except Exception as e:
+        errors.append(e)
+        while queue.get() is not None:  # keep draining so the fetch side does not block
+            pass
+
+
+class StoreWriter(object):
+    '''
+    appends each batch to a PointStore as one segment
+    '''
+    def __init__(self, dirname):
+        self.store = PointStore(dirname)
+        self.path = dirname
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.watermarks = Watermarks(dirname)
+
+    def write(self, series_list):
+        series_list = get_new_rows(series_list, self.watermarks)
+        self.store.add_series([(fname, data.index.asi8, data.values) for (fname, data) in series_list])
+        for (fname, data) in series_list:
+            self.watermarks.update(fname, int(data.index.asi8[-1]))
+        self.watermarks.save()
+
+    def close(self):
+        pass
+
+
+class CsvWriter(object):
+    '''
+    writes one '<timestamp>,<value>' csv per series, as bbdata reads them, optionally gzip compressed. new rows are
+    appended (a gzip file gets one more gzip member)
+    '''
+    def __init__(self, dirname, compress=False):
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.path = dirname
+        self.compress = compress
+        self.watermarks = Watermarks(dirname)
+
+    def write(self, series_list):
+        series_list = get_new_rows(series_list, self.watermarks)
+        for (fname, data) in series_list:
+            filename = os.path.join(self.path, fname) + ('.gz' if self.compress else '')
+            with io.open(filename, 'ab', buffering=WRITE_BUFFER) as raw:
+                f = gzip.GzipFile(filename, 'wb', fileobj=raw) if self.compress else raw
+                try:
+                    f.writelines('%s,%s\n' % (timestamp, value) for (timestamp, value) in data.iteritems())
+                finally:
+                    if self.compress:
+                        f.close()
+            self.watermarks.update(fname, int(data.index.asi8[-1]))
+        self.watermarks.save()
+
+    def close(self):
+        pass
+
+
+def export_test_set(test_set, writer, threads=FETCH_THREADS, batch_size=BATCH_SIZE):
+    '''
+    :param test_set: CXTestSetRunner
+    :param writer: StoreWriter or CsvWriter
+    :param threads: concurrent fetches
+    :param batch_size: series written per batch
+    :return: tuple of (number of series fetched, list of names of series that could not be fetched)
+    '''
+    tasks = group_plan(apply_watermarks(get_export_plan(get_tests(test_set)), writer.watermarks))
+    total = sum(len(x[3]) for x in tasks)
+    queue = Queue.Queue(QUEUE_SIZE)
+    errors = []
+    writer_thread = threading.Thread(target=write_from_queue, args=(queue, writer, batch_size, errors))
+    writer_thread.start()
+
+    written = 0
+    failed = []
+    pool = ThreadPool(threads)
+    try:
+        for (fnames, data) in pool.imap_unordered(fetch_with_retry, tasks):
+            if data is None:
+                failed.extend(fnames)
+            else:
+                queue.put([(x, data) for x in fnames])  # blocks while the writer is QUEUE_SIZE behind
+                written += len(fnames)
+            done = written + len(failed)
+            if done % PROGRESS_EVERY < len(fnames) or done == total:
+                sys.stdout.write('test set %s: %d/%d series\n' % (test_set.id, done, total))
+    finally:
+        pool.close()
+        pool.join()
+        queue.put(None)
+        writer_thread.join()
+    writer.close()
+    if errors:
+        raise errors[0]
+    return written, failed
+
+
+def export_test_sets(test_set_ids, out_dir, store=False, compress=False, threads=FETCH_THREADS):
+    '''
+    exports several test sets, one after the other, each with its own fetch pool
+    :param store: write a PointStore per test set instead of a folder of csv files
+    :return: dict of test set id: (number of series fetched, list of names of series that could not be fetched)
+    '''
+    results = {}
+    for test_set_id in test_set_ids:
+        test_set = CXTestSetRunner.objects.get(id=test_set_id)
+        print 'test set ' + str(test_set_id) + ' run at ' + str(test_set.run_at)
+        if store:
+            writer = StoreWriter(os.path.join(out_dir, 'test_set_' + str(test_set_id) + '.store'))
+        else:
+            writer = CsvWriter(os.path.join(out_dir, 'test_csv_data_' + str(test_set_id)), compress)
+        results[test_set_id] = export_test_set(test_set, writer, threads)
+        print 'exported ' + str(results[test_set_id][0]) + ' series to ' + writer.path
+        if results[test_set_id][1]:
+            print 'could not fetch: ' + ', '.join(results[test_set_id][1])
+    return results
 
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the point-path series of test sets.')
+    parser.add_argument('test_set_ids', type=int, nargs='*', default=[749])
+    parser.add_argument('-o', '--out', default=os.getcwd(), help='folder to export to')
+    parser.add_argument('--store', action='store_true', help='write a point store per test set instead of csv files')
+    parser.add_argument('--gzip', action='store_true', help='gzip the csv files')
+    parser.add_argument('-t', '--threads', type=int, default=FETCH_THREADS, help='concurrent fetches')
+    args = parser.parse_args()
+    export_test_sets(args.test_set_ids, args.out, args.store, args.gzip, args.threads)
@@ -0,0 +1,350 @@
+__author__ = 'christina'
+
+"""
+Fleet-wide summary of many test set logs.
+
+Each test set log is mapped (in a process pool) to a small per-site summary: tests per hour, scheduled/ran/could not
+run/passed/failed counts by test type, and hours when tests were blocked waiting on prereqs. Passed/failed come from the
+per-box result logs next to the log, which are attached by site_bundle.load_site_bundle. The summaries are then
+reduced into two fleet tables that are written as csv files:
+    fleet_sites.csv: one row per site
+    fleet_tests.csv: one row per test type, summed over all sites
+
+Summaries are cached in fleet_cache.json in the output folder, keyed by log path. A log's entry is only written once it
+has been mapped, so on a re-run only logs that are new, changed (the log itself or its set of result and validity
+files), or were not mapped before an interrupted run stopped are re-mapped, and the job can be restarted or re-run as new logs arrive. A log that fails to parse is recorded with
+its error instead of stopping the run, and is retried once its contents change.
+
+usage:
+    python fleet_summary.py linkedin-* valencia-* vsp_hq* terra_bella-* google_* -o fleet
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+
+import test_set_viz_2 as tsv
+from compressed import open_input, strip_log_extension
+
+CACHE_FILENAME = 'fleet_cache.json'
+SITES_FILENAME = 'fleet_sites.csv'
+TESTS_FILENAME = 'fleet_tests.csv'
+OUTCOMES = ['scheduled', 'ran', 'could_not_run', 'passed', 'failed']
+RESULT_OUTCOMES = {
+    "Result: passed": 'passed',
+    "Result: failed": 'failed'
+}
+VERSION_FLAGS = [
+    ('v1.1', "2SCXTest running "),
+    ('v1.0', "2set CXTest state machine running ")
+]
+SCHEDULE_FLAG = "to run = "
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def detect_version(filename):
+    '''
+    :param filename: any text file
+    :return: TestSet version string if the file is a test set log (has a "to run = " entry), else None
+    '''
+    with open_input(filename) as f:
+        for line in f:
+            if SCHEDULE_FLAG in line:
+                for (version, flag) in VERSION_FLAGS:
+                    if flag in line:
+                        return version
+    return None
+
+
+def hash_file(filename):
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def merge_intervals(intervals):
+    '''
+    :param intervals: list of (start, end) tuples
+    :return: sorted list of non-overlapping (start, end) tuples covering the same time
+    '''
+    merged = []
+    for (start, end) in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def overlap_seconds(intervals_a, intervals_b):
+    '''
+    :param intervals_a: merged list of (start, end) datetime tuples, see merge_intervals
+    :param intervals_b: merged list of (start, end) datetime tuples
+    :return: total seconds covered by both lists
+    '''
+    total = 0.0
+    i = 0
+    j = 0
+    while i < len(intervals_a) and j < len(intervals_b):
+        start = max(intervals_a[i][0], intervals_b[j][0])
+        end = min(intervals_a[i][1], intervals_b[j][1])
+        if end > start:
+            total += (end - start).total_seconds()
+        if intervals_a[i][1] < intervals_b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def get_idle_intervals(test_set):
+    '''
+    :return: merged list of (start, end) tuples when tests were scheduled but none were running
+    '''
+    try:
+        count = test_set.test_count_dict['all']
+    except KeyError:  # no tests were scheduled
+        return []
+    idle = []
+    for i in range(len(count[tsv.VALUE])):
+        if count[tsv.VALUE][i] == 0:
+            if i + 1 < len(count[tsv.TIME]):
+                idle.append((count[tsv.TIME][i], count[tsv.TIME][i + 1]))
+            else:
+                idle.append((count[tsv.TIME][i], test_set.TEST_END))
+    return merge_intervals(idle)
+
+
+def summarize_test_set(test_set, site):
+    '''
+    Reduces a parsed TestSet to a small, json-friendly summary.
+    Passed/failed counts are only non-zero if test results were attached with set_test_result.
+    :param test_set: TestSet object
+    :param site: site name used as the row key in the fleet tables
+    :return: summary dict
+    '''
+    hours = (test_set.TEST_END - test_set.TEST_START).total_seconds() / 3600.0
+
+    tests = {}
+    for box in test_set.test_set_dict.keys():
+        for test in test_set.test_set_dict[box].keys():
+            test_data = test_set.test_set_dict[box][test]
+            if test not in tests:
+                tests[test] = dict(zip(OUTCOMES, [0] * len(OUTCOMES)))
+            tests[test]['scheduled'] += 1
+            if len(test_data[tsv.TIME]) > 0:
+                tests[test]['ran'] += 1
+            else:
+                tests[test]['could_not_run'] += 1
+            if tsv.RESULT_VALUE in test_data and test_data[tsv.RESULT_VALUE] in RESULT_OUTCOMES:
+                tests[test][RESULT_OUTCOMES[test_data[tsv.RESULT_VALUE]]] += 1
+
+    # a prereq blocks testing when its safety set is active but no tests are running
+    idle = get_idle_intervals(test_set)
+    prereq_intervals = {}
+    for (box, prereq, start, end) in test_set.get_safety_intervals():
+        prereq_intervals.setdefault(prereq, []).append((start, end))
+    blocked_hours = {}
+    for prereq in prereq_intervals.keys():
+        blocked_hours[prereq] = overlap_seconds(merge_intervals(prereq_intervals[prereq]), idle) / 3600.0
+    all_prereqs = merge_intervals([x for y in prereq_intervals.values() for x in y])
+
+    return {
+        'site': site,
+        'version': test_set.VERSION,
+        'start': test_set.TEST_START.isoformat(),
+        'end': test_set.TEST_END.isoformat(),
+        'hours': hours,
+        'tests': tests,
+        'blocked_hours': blocked_hours,
+        'blocked_hours_total': overlap_seconds(all_prereqs, idle) / 3600.0
+    }
+
+
+def get_site_name(filename):
+    '''
+    :return: site name of a log file, e.g. valencia-153.txt.gz -> valencia-153
+    '''
+    return strip_log_extension(os.path.basename(filename))
+
+
+def get_aux_files(filename):
+    '''
+    :return: sorted list of [filename, size, mtime] of the log's result and validity files, see
+        site_bundle.find_aux_files
+    '''
+    import site_bundle  # imported here because site_bundle imports this module
+    return [[x, os.path.getsize(x), os.path.getmtime(x)] for x in site_bundle.find_aux_files(filename)]
+
+
+def map_log(filename):
+    '''
+    map step: parse one log file, with its result and validity files, into a site summary. runs in a worker process.
+    :return: tuple (filename, summary, error):
+        summary is None if the file is not a test set log or could not be parsed
+        error is the parse error as text, or None
+    '''
+    try:
+        version = detect_version(filename)
+        if version is None:
+            return filename, None, None
+        import site_bundle  # imported here because site_bundle imports this module
+        test_set = site_bundle.load_site_bundle(filename, version)['test_set']
+        return filename, summarize_test_set(test_set, get_site_name(filename)), None
+    except Exception as e:  # one malformed log must not stop the fleet run
+        return filename, None, '%s: %s' % (type(e).__name__, e)
+
+
+def reduce_summaries(summaries):
+    '''
+    reduce step: combine site summaries into fleet tables
+    :param summaries: list of summary dicts from map_log
+    :return: tuple:
+        site_rows: list of dicts, one per site
+        test_rows: list of dicts, one per test type
+    '''
+    site_rows = []
+    test_totals = {}
+    for summary in sorted(summaries, key=lambda x: x['site']):
+        ran = sum(x['ran'] for x in summary['tests'].values())
+        site_rows.append({
+            'site': summary['site'],
+            'start': summary['start'],
+            'end': summary['end'],
+            'hours': summary['hours'],
+            'scheduled': sum(x['scheduled'] for x in summary['tests'].values()),
+            'ran': ran,
+            'tests_per_hour': ran / summary['hours'] if summary['hours'] > 0 else 0.0,
+            'blocked_hours': summary['blocked_hours_total']
+        })
+        for test in summary['tests'].keys():
+            if test not in test_totals:
+                test_totals[test] = dict(zip(OUTCOMES, [0] * len(OUTCOMES)))
+            for outcome in OUTCOMES:
+                test_totals[test][outcome] += summary['tests'][test][outcome]
+
+    test_rows = []
+    for test in sorted(test_totals.keys()):
+        row = {'test': test}
+        row.update(test_totals[test])
+        scheduled = float(row['scheduled'])
+        for outcome in ['could_not_run', 'passed', 'failed']:
+            row[outcome + '_rate'] = row[outcome] / scheduled if scheduled > 0 else 0.0
+        test_rows.append(row)
+    return site_rows, test_rows
+
+
+def write_rows(filename, rows, fieldnames):
+    with open(filename, 'wb') as f:
+        writer = csv.DictWriter(f, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_cache(out_dir):
+    try:
+        with open(os.path.join(out_dir, CACHE_FILENAME), 'r') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_cache(out_dir, cache):
+    path = os.path.join(out_dir, CACHE_FILENAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(cache, f)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
+
+
+def find_changed(filenames, cache):
+    '''
+    :return: tuple:
+        changed: dict of filename: new cache entry (size, mtime, sha1, aux, no summary yet) for files that are not in
+            the cache, were not mapped, or whose contents or result and validity files changed. the cache itself is not
+            changed for these files, so an entry is only written once its log has been mapped.
+        refreshed: list of unchanged files that were only touched. their cache entry's mtime is refreshed, so the
+            cache should be saved to skip hashing them next time.
+    '''
+    changed = {}
+    refreshed = []
+    for filename in filenames:
+        stat = os.stat(filename)
+        aux = get_aux_files(filename)
+        entry = cache.get(filename)
+        if entry is not None and (not entry.get('mapped') or entry.get('aux') != aux):
+            entry = None  # interrupted run of an older version, or result files were added or changed: map it again
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            continue
+        digest = hash_file(filename)
+        if entry is not None and entry['sha1'] == digest:
+            entry['mtime'] = stat.st_mtime
+            refreshed.append(filename)
+            continue
+        changed[filename] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha1': digest,
+            'aux': aux
+        }
+    return changed, refreshed
+
+
+def run_fleet(filenames, out_dir, processes=None):
+    '''
+    maps every new or changed log in a process pool, then reduces all cached summaries into fleet tables
+    :param filenames: list of log files
+    :param out_dir: folder for the cache and the fleet csv tables
+    :param processes: size of the process pool, default is the number of cores
+    :return: tuple of site_rows, test_rows (see reduce_summaries)
+    '''
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    filenames = sorted(set(os.path.abspath(x) for x in filenames if os.path.isfile(x)))
+    cache = load_cache(out_dir)
+    (changed, refreshed) = find_changed(filenames, cache)
+    if refreshed:
+        save_cache(out_dir, cache)
+    print 'mapping ' + str(len(changed)) + ' of ' + str(len(filenames)) + ' logs'
+
+    if changed:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for (filename, summary, error) in pool.imap_unordered(map_log, sorted(changed.keys())):
+                entry = changed[filename]
+                entry['summary'] = summary
+                entry['error'] = error
+                entry['mapped'] = True
+                cache[filename] = entry
+                save_cache(out_dir, cache)  # save as we go so an interrupted run can be restarted
+                if error is None:
+                    print 'mapped ' + filename
+                else:
+                    print 'could not parse ' + filename + ': ' + error
+        finally:
+            pool.close()
+            pool.join()
+
+    summaries = [cache[x]['summary'] for x in filenames if x in cache and cache[x]['summary'] is not None]
+    site_rows, test_rows = reduce_summaries(summaries)
+    write_rows(os.path.join(out_dir, SITES_FILENAME), site_rows,
+               ['site', 'start', 'end', 'hours', 'scheduled', 'ran', 'tests_per_hour', 'blocked_hours'])
+    write_rows(os.path.join(out_dir, TESTS_FILENAME), test_rows,
+               ['test'] + OUTCOMES + ['could_not_run_rate', 'passed_rate', 'failed_rate'])
+    return site_rows, test_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize many test set logs into fleet tables.')
+    parser.add_argument('logs', nargs='+', help='log files or glob patterns')
+    parser.add_argument('-o', '--out', default='fleet', help='output folder for the cache and csv tables')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+    log_files = [x for pattern in args.logs for x in (glob.glob(pattern) or [pattern])]
+    run_fleet(log_files, args.out, args.processes)
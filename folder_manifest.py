@@ -0,0 +1,181 @@
+__author__ = 'christina'
+
+"""
+Persistent manifest of a folder of exported point-path csv files.
+
+The manifest is stored in the data folder as .folder_manifest.json and records, for each file: size, mtime, row count,
+first/last timestamp (int ns since the epoch, UTC) and the parsed name tokens (see point_paths.parse_point_name).
+rescan() only stats the folder and re-reads files that were added or changed since the last scan, so bbdata and
+csvTest don't have to glob and open every file on every run.
+"""
+import calendar
+import datetime as dt
+import json
+import os
+
+import point_paths
+from compressed import open_input, is_compressed
+
+MANIFEST_FILENAME = '.folder_manifest.json'
+BLOCK_SIZE = 1 << 16
+TAIL_SIZE = 4096
+NS_PER_SECOND = 10 ** 9
+
+
+def parse_timestamp(field):
+    '''
+    :return: int ns since the epoch, or None if field is not a timestamp
+    '''
+    try:
+        a_datetime = dt.datetime.strptime(field.strip().strip('"')[:point_paths.CSV_TIME_LENGTH],
+                                          point_paths.CSV_TIME_FORMAT)
+    except ValueError:
+        return None
+    return calendar.timegm(a_datetime.timetuple()) * NS_PER_SECOND
+
+
+def read_file_stats(filename, size):
+    '''
+    counts rows and finds the first and last timestamp without parsing the whole file
+    :return: tuple of (rows, start, end), start and end are int ns or None
+    '''
+    if size == 0:
+        return 0, None, None
+    if is_compressed(filename):
+        return read_compressed_file_stats(filename)
+    rows = 0
+    last_char = ''
+    with open(filename, 'rb') as f:
+        first_line = f.readline()
+        f.seek(0)
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            rows += block.count(b'\n')
+            last_char = block[-1:]
+        if last_char != b'\n':
+            rows += 1  # last line has no newline
+        f.seek(max(0, size - TAIL_SIZE))
+        tail_lines = [x for x in f.read().splitlines() if x.strip()]
+    start = parse_timestamp(first_line.split(b',')[0])
+    end = parse_timestamp(tail_lines[-1].split(b',')[0]) if tail_lines else None
+    return rows, start, end
+
+
+def read_compressed_file_stats(filename):
+    '''
+    read_file_stats for a compressed file, which has to be decoded from the start: one streaming pass
+    '''
+    rows = 0
+    first_line = None
+    last_line = None
+    with open_input(filename) as f:
+        for line in f:
+            rows += 1
+            if first_line is None:
+                first_line = line
+            if line.strip():
+                last_line = line
+    if first_line is None:
+        return 0, None, None
+    return rows, parse_timestamp(first_line.split(b',')[0]), parse_timestamp(last_line.split(b',')[0])
+
+
+class FolderManifest(object):
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_FILENAME)
+        self.files = {}  # file name (without folder): entry dict
+        try:
+            with open(self.path, 'r') as f:
+                self.files = json.load(f)['files']
+        except (IOError, ValueError):  # no manifest yet, or a damaged one: rebuild
+            self.files = {}
+
+    def rescan(self):
+        '''
+        stats every file in the folder and re-reads only added or changed files; drops removed files.
+        saves the manifest if anything changed.
+        :return: tuple of lists of file names: (added or changed, removed)
+        '''
+        changed = []
+        present = set()
+        for name in os.listdir(self.folder):
+            if name.startswith('.'):
+                continue
+            filename = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            if not os.path.isfile(filename):
+                continue
+            present.add(name)
+            entry = self.files.get(name)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+            (rows, start, end) = read_file_stats(filename, stat.st_size)
+            entry = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'rows': rows,
+                'start': start,
+                'end': end,
+                'tokens': point_paths.parse_point_name(name)
+            }
+            self.files[name] = entry
+            changed.append(name)
+
+        removed = [x for x in self.files.keys() if x not in present]
+        for name in removed:
+            del self.files[name]
+        if changed or removed:
+            self.save()
+        return changed, removed
+
+    def save(self):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump({'files': self.files}, f)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(self.path + '.tmp', self.path)
+
+    def names(self):
+        return sorted(self.files.keys())
+
+    def filenames(self):
+        return [os.path.join(self.folder, x) for x in self.names()]
+
+    def get(self, name):
+        return self.files[name]
+
+
+# manifests already scanned in this process, by folder
+scanned = {}
+
+
+def get_folder_manifest(folder, rescan=True):
+    '''
+    :param folder: data folder
+    :param rescan: rescan the folder, or reuse a manifest already scanned in this process
+    :return: up to date FolderManifest for folder
+    '''
+    folder = os.path.abspath(folder)
+    if folder not in scanned:
+        scanned[folder] = FolderManifest(folder)
+        rescan = True
+    if rescan:
+        scanned[folder].rescan()
+    return scanned[folder]
+
+
+def get_row_counts(filenames):
+    '''
+    :param filenames: list of full file names, possibly from several folders
+    :return: list of row counts, in the same order
+    '''
+    rows = []
+    for filename in filenames:
+        manifest = get_folder_manifest(os.path.dirname(filename), rescan=False)
+        if os.path.basename(filename) not in manifest.files:  # added since the last scan
+            manifest.rescan()
+        rows.append(manifest.get(os.path.basename(filename))['rows'])
+    return rows
@@ -0,0 +1,214 @@
+__author__ = 'christina'
+
+"""
+Packed box x time occupancy bitmaps of a test set.
+
+build_occupancy puts every box of a parsed TestSet on one fixed time grid and makes one bitmap per test type (when each
+box was running that test) and one per prereq (when each box was in that prereq's safety set):
+    bits[box, step // 8]: uint8 array, np.packbits of a bool box x time matrix, 1 bit per box per grid step
+    boxes: sorted ref names, shared by all bitmaps of a test set
+    times: int64 ns since the epoch (UTC) of the start of each grid step
+
+A box occupies a step if any of its intervals overlaps the step. Because all bitmaps share the box list and grid,
+cross-category questions are bitwise math on the packed bytes, e.g. boxes that were testing while in a safety set:
+    occ = test_set.get_occupancy()
+    overlap = occ.get_any_test().both(occ.get_any_prereq())
+    overlap.count_seconds()  # per box
+and a 500 box x 1 week bitmap (~630 kB) renders directly as a heatmap with plot_occupancy.
+"""
+import datetime as dt
+
+import numpy as np
+
+from columnar import datetime_to_ns, NS_PER_SECOND
+from prereq_validity import ns_to_datetime
+from trend_matrix import make_grid
+
+STEP_SECONDS = 60
+# number of 1 bits in each byte value
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class Occupancy(object):
+    def __init__(self, boxes, times, bits, step_seconds=STEP_SECONDS):
+        self.boxes = boxes
+        self.times = times
+        self.bits = bits
+        self.step_seconds = step_seconds
+        self.box_index = dict((boxes[i], i) for i in range(len(boxes)))
+
+    def __len__(self):
+        return len(self.times)
+
+    def copy_with(self, bits):
+        return Occupancy(self.boxes, self.times, bits, self.step_seconds)
+
+    def both(self, other):
+        '''
+        :return: Occupancy of steps occupied in self and other
+        '''
+        return self.copy_with(self.bits & other.bits)
+
+    def either(self, other):
+        '''
+        :return: Occupancy of steps occupied in self or other
+        '''
+        return self.copy_with(self.bits | other.bits)
+
+    def without(self, other):
+        '''
+        :return: Occupancy of steps occupied in self but not in other
+        '''
+        return self.copy_with(self.bits & ~other.bits)
+
+    def get_box(self, box):
+        '''
+        :return: bool array of one box's steps
+        '''
+        return np.unpackbits(self.bits[self.box_index[box]])[:len(self.times)].astype(bool)
+
+    def unpack(self):
+        '''
+        :return: bool box x time array
+        '''
+        return np.unpackbits(self.bits, axis=1)[:, :len(self.times)].astype(bool)
+
+    def count(self):
+        '''
+        :return: int array of occupied steps per box (popcount of each row)
+        '''
+        return POPCOUNT[self.bits].sum(axis=1, dtype=np.int64)
+
+    def count_seconds(self):
+        '''
+        :return: dict of box: seconds occupied, on the grid's resolution
+        '''
+        counts = self.count()
+        return dict((self.boxes[i], int(counts[i]) * self.step_seconds) for i in range(len(self.boxes)))
+
+    def count_boxes(self):
+        '''
+        :return: int array of boxes occupied at each step
+        '''
+        return self.unpack().sum(axis=0)
+
+    def get_occupied_boxes(self):
+        '''
+        :return: list of ref names occupied at any step
+        '''
+        return [self.boxes[i] for i in np.flatnonzero(self.bits.any(axis=1))]
+
+
+class OccupancySet(object):
+    def __init__(self, boxes, times, tests, prereqs, step_seconds=STEP_SECONDS):
+        '''
+        :param tests: dict of test type: Occupancy
+        :param prereqs: dict of prereq ID: Occupancy
+        '''
+        self.boxes = boxes
+        self.times = times
+        self.tests = tests
+        self.prereqs = prereqs
+        self.step_seconds = step_seconds
+
+    def empty(self):
+        return Occupancy(self.boxes, self.times, np.zeros((len(self.boxes), (len(self.times) + 7) // 8), np.uint8),
+                         self.step_seconds)
+
+    def get_any(self, occupancy_list):
+        result = self.empty()
+        for occupancy in occupancy_list:
+            result = result.either(occupancy)
+        return result
+
+    def get_any_test(self):
+        '''
+        :return: Occupancy of steps when a box was running any test
+        '''
+        return self.get_any(self.tests.values())
+
+    def get_any_prereq(self):
+        '''
+        :return: Occupancy of steps when a box was in any safety set
+        '''
+        return self.get_any(self.prereqs.values())
+
+
+def mark_intervals(matrix, row, intervals, first, step):
+    '''
+    sets matrix[row] True on every step that overlaps one of intervals
+    :param intervals: list of (start, end) int ns tuples
+    :param first: int ns start of the grid
+    :param step: int ns grid spacing
+    '''
+    for (start, end) in intervals:
+        i = (start - first) // step
+        j = max(i + 1, -(-(end - first) // step))  # ceil, at least one step
+        matrix[row, max(i, 0):j] = True
+
+
+def pack_rows(boxes, times, rows, step_seconds):
+    '''
+    :param rows: dict of box: list of (start, end) int ns tuples
+    :return: Occupancy
+    '''
+    step = step_seconds * NS_PER_SECOND
+    matrix = np.zeros((len(boxes), len(times)), dtype=bool)
+    box_index = dict((boxes[i], i) for i in range(len(boxes)))
+    for box in rows.keys():
+        mark_intervals(matrix, box_index[box], rows[box], int(times[0]), step)
+    return Occupancy(boxes, times, np.packbits(matrix, axis=1), step_seconds)
+
+
+def build_occupancy(test_set, step_seconds=STEP_SECONDS):
+    '''
+    :param test_set: TestSet object
+    :param step_seconds: grid spacing
+    :return: OccupancySet with one Occupancy per test type and per prereq
+    '''
+    boxes = sorted(set(test_set.test_set_dict.keys()) | set(test_set.safety_set_dict.keys()))
+    times = make_grid(datetime_to_ns(test_set.TEST_START), datetime_to_ns(test_set.TEST_END), step_seconds)
+
+    def group(interval_rows):
+        # (box, name, start, end) rows -> name: box: [(start ns, end ns)]
+        groups = {}
+        for (box, name, start, end) in interval_rows:
+            groups.setdefault(name, {}).setdefault(box, []).append((datetime_to_ns(start), datetime_to_ns(end)))
+        return groups
+
+    tests = group(test_set.get_running_intervals())
+    prereqs = group(test_set.get_safety_intervals())
+    return OccupancySet(
+        boxes, times,
+        dict((x, pack_rows(boxes, times, tests[x], step_seconds)) for x in tests.keys()),
+        dict((x, pack_rows(boxes, times, prereqs[x], step_seconds)) for x in prereqs.keys()),
+        step_seconds)
+
+
+def plot_occupancy(occupancy, title='', figName=None, boxes=None):
+    '''
+    plots a box x time heatmap of an Occupancy
+    :param boxes: list of ref names to plot (rows in this order), default all boxes
+    :param figName: save the figure to this file instead of showing it
+    '''
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    matrix = occupancy.unpack()
+    labels = occupancy.boxes
+    if boxes is not None:
+        matrix = matrix[[occupancy.box_index[x] for x in boxes]]
+        labels = boxes
+    start = mdates.date2num(ns_to_datetime(occupancy.times[0]))
+    end = mdates.date2num(ns_to_datetime(occupancy.times[-1]) + dt.timedelta(seconds=occupancy.step_seconds))
+    plt.imshow(matrix, aspect='auto', interpolation='nearest', cmap='Greys',
+               extent=[start, end, len(labels) - 0.5, -0.5])
+    ax = plt.gca()
+    ax.xaxis_date()
+    plt.yticks(range(len(labels)), labels, fontsize=6 if len(labels) > 50 else 10)
+    plt.title(title)
+    if figName is not None:
+        plt.savefig(figName)
+    else:
+        plt.show()
+    plt.clf()
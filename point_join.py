@@ -0,0 +1,153 @@
+__author__ = 'christina'
+
+"""
+Join between a TestSet's boxes and tests and the exported point-path series of the same equipment.
+
+The scheduler log calls a box e.g. '#pdc_vav_2_6' or '#pdc_vav_2_6_VAVR_site_97', export_csv names its series e.g.
+'1234__#pdc_vav_2_6_VAVR_site_97_measure_damper_opening_real'. normalize_ref_name reduces both to the same key, and
+PointJoinIndex hashes every series under (normalized ref name, test type) for each test type that uses its path name
+(TEST_PATHS). join_test_set then looks up every (box, test) running interval of a TestSet, reads all matched series in
+one batch and returns each series cut to the interval it belongs to.
+
+    test_set = TestSet('vsp_hq2.txt', 'v1.1')
+    joined = join_test_set(test_set, bbdata.get_folder_info(folder))
+    for ((box, test, start, end), series) in sorted(joined.items()):
+        ...
+"""
+import os
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+import columnar
+import point_paths
+from point_store import read_csv_series_or_none
+
+LOAD_THREADS = 8
+DAMPER_PATHS = ['measure_damper_opening_real', 'actuator_u_damper_opening_real', 'actuator_u_damper_opening_lock_real']
+
+# test type code (see test_set_viz_2.TEST_TYPE and get_test_type): path names of the trends it exercises. tests not
+# listed get all path names
+TEST_PATHS = {
+    'AFC': ['measure_mdot_real'] + DAMPER_PATHS,
+    'AFH': ['measure_mdot_real'] + DAMPER_PATHS,
+    'AFS': ['measure_mdot_real'] + DAMPER_PATHS,
+    'DPC': DAMPER_PATHS,
+    'DPH': DAMPER_PATHS,
+    'HWV': ['measure_hv_real', 'actuator_u_hv_lock_real'],
+    'DAT': ['measure_Ts_T'],
+    'ZAT': ['measure_zone_temp'],
+    'ZSA': ['measure_zone_temp', 'measure_Ts_T'],
+    'COOL': ['measure_zone_temp', 'measure_Ts_T'],  # v1.1 name of the zone cooling test
+    'ELS-1': ['measure_Ts_T'],
+    'ELS-2': ['measure_Ts_T'],
+    'ELS-3': ['measure_Ts_T'],
+    'EL-M': ['measure_Ts_T'],
+    'CST': [],
+    'CO2': [],
+    'OCC': [],
+    'RH': [],
+    'NET': []  # v1.1 network check, exercises no trends
+}
+ANY_TEST = None  # index key for tests that are not in TEST_PATHS
+
+
+def normalize_ref_name(ref_name):
+    '''
+    :param ref_name: box name from the scheduler log, or ref name / point path of a series
+    :return: lower case ref name without the site suffix and without a trailing equipment class (e.g. _VAVR)
+    '''
+    ref_name = ref_name.strip().partition(point_paths.SITE_SEPARATOR)[0]
+    (head, sep, tail) = ref_name.rpartition('_')
+    if sep and tail.isalpha() and tail.isupper():
+        ref_name = head
+    return ref_name.lower()
+
+
+def get_test_type(test):
+    '''
+    :param test: test name from the scheduler log, e.g. 'VVR_DPC' (v1.0) or 'DPC', 'COOL' (v1.1)
+    :return: test type code, e.g. 'DPC'
+    '''
+    return test.strip().rpartition('_')[2].upper()
+
+
+def get_test_types(path_name):
+    '''
+    :return: list of test types whose trends include path_name, plus ANY_TEST
+    '''
+    return [x for x in TEST_PATHS if path_name in TEST_PATHS[x]] + [ANY_TEST]
+
+
+class PointJoinIndex(object):
+    def __init__(self, names):
+        '''
+        :param names: series names or csv filenames
+        '''
+        self.index = {}  # (normalized ref name, test type): list of names
+        for name in names:
+            tokens = point_paths.parse_point_name(name)
+            if tokens['path_name'] is None or tokens['prereq_path'] is not None:
+                continue
+            ref_name = normalize_ref_name(tokens['ref_name'])
+            for test_type in get_test_types(tokens['path_name']):
+                self.index.setdefault((ref_name, test_type), []).append(name)
+
+    def match(self, box, test):
+        '''
+        :return: list of names of the series of box that belong to test
+        '''
+        test_type = get_test_type(test)
+        key = test_type if test_type in TEST_PATHS else ANY_TEST
+        return self.index.get((normalize_ref_name(box), key), [])
+
+
+def read_all(names, store=None, threads=LOAD_THREADS):
+    '''
+    reads a batch of series at once
+    :param names: csv filenames, or series names if store is given
+    :param store: PointStore to read from, default read csv files
+    :return: dict of name: (timestamps in int64 ns, values). empty csv files and files that can't be parsed are left
+        out
+    '''
+    if store is not None:
+        return dict((x, store.get_series(x)) for x in names)
+    non_empty = [x for x in names if os.path.getsize(x) > 0]
+    if not non_empty:
+        return {}
+    pool = ThreadPool(min(threads, len(non_empty)))
+    try:
+        all_data = pool.map(read_csv_series_or_none, non_empty)
+    finally:
+        pool.close()
+        pool.join()
+    return dict((name, data) for (name, data) in zip(non_empty, all_data) if data is not None)
+
+
+def join_test_set(test_set, names, store=None):
+    '''
+    :param test_set: TestSet
+    :param names: csv filenames (e.g. from bbdata.get_folder_info), or series names if store is given
+    :param store: PointStore holding the series, default read csv files
+    :return: dict of (box, test, start, end) running interval: list of (name, timestamps, values) tuples, the series
+        of that box and test restricted to the interval. timestamps in int64 ns since the epoch (UTC). a test whose
+        type is not in TEST_PATHS gets all of its box's series. series that can't be read are left out
+    '''
+    index = PointJoinIndex(names)
+    matches = {}
+    for (box, test, start, end) in test_set.get_running_intervals():
+        matches[(box, test, start, end)] = index.match(box, test)
+
+    all_data = read_all(sorted(set(x for y in matches.values() for x in y)), store)
+    joined = {}
+    for (interval, matched) in matches.items():
+        (start_ns, end_ns) = (columnar.datetime_to_ns(interval[2]), columnar.datetime_to_ns(interval[3]))
+        joined[interval] = []
+        for name in matched:
+            if name not in all_data:
+                continue
+            (timestamps, values) = all_data[name]
+            i_start = np.searchsorted(timestamps, start_ns, 'left')
+            i_end = np.searchsorted(timestamps, end_ns, 'right')
+            joined[interval].append((name, timestamps[i_start:i_end], values[i_start:i_end]))
+    return joined
@@ -0,0 +1,165 @@
+__author__ = 'christina'
+
+"""
+Vocabulary and name parsing for exported point-path data.
+
+export_csv names each series '<test id>__<point path>' for test data and '<prereq>__<point path>' for prereq data,
+e.g. '1234__#pdc_vav_2_6_VAVR_site_97_measure_damper_opening_real' or
+'ColdDuctPressure 3678__#ahu_1_site_97_static_pressure'. parse_point_name splits such a name into the tokens that
+bbdata filters on.
+"""
+import os
+
+PATHS = [
+    'measure_damper_opening_real',
+    'measure_mdot_real',
+    'actuator_u_damper_opening_real',
+    'actuator_u_damper_opening_lock_real',
+    'measure_Ts_T',
+    'measure_zone_temp',
+    'actuator_u_hv_lock_real',
+    'measure_hv_real',
+    'actuator_u_static_pressure_real',
+    'measure_static_pressure_stpt_real',
+    'none'
+]
+
+PREREQ_PATHS = [
+    'ColdDuctPressure',
+    'ColdDuctTemperature',
+    'HotDuctPressure',
+    'HotWaterPressure',
+    'HotWaterTemperature'
+]
+
+# limit of each prereq's point data, in its trend units
+PREREQ_THRESHOLDS = dict(zip(PREREQ_PATHS, [
+    0.25,
+    70,
+    0.25,
+    5,
+    140
+]))
+
+# which side of the threshold is valid: a duct or water loop must be at least at pressure / hot water temperature,
+# cold duct air must be no warmer than the limit
+PREREQ_DIRECTIONS = dict(zip(PREREQ_PATHS, [
+    'above',
+    'below',
+    'above',
+    'above',
+    'above'
+]))
+
+CSV_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'  # export_csv writes str(timestamp), e.g. 2015-11-12 23:06:07+00:00
+CSV_TIME_LENGTH = 19  # chars of CSV_TIME_FORMAT, i.e. the timestamp without the utc offset
+NAME_SEPARATOR = '__'
+SITE_SEPARATOR = '_site'
+
+# longest first, so e.g. actuator_u_damper_opening_lock_real is not mistaken for a shorter path
+PATHS_BY_LENGTH = sorted([x for x in PATHS if x != 'none'], key=len, reverse=True)
+
+
+def parse_point_name(name):
+    '''
+    :param name: series name or csv filename (a leading folder is ignored)
+    :return: dict with keys:
+        name: the name without its folder
+        test_id: text before '__' for test data, else None
+        prereq: text before '__' if it starts with a PREREQ_PATHS entry, else None
+        prereq_path: the PREREQ_PATHS entry, else None
+        point_path: text after '__'
+        ref_name: equipment ref name, the point path up to '_site' (or up to the path name if there is no '_site')
+        path_name: the PATHS entry found in the point path, else None
+    '''
+    name = os.path.basename(name.replace('\\', '/'))
+    (prefix, sep, point_path) = name.partition(NAME_SEPARATOR)
+    if not sep:
+        (prefix, point_path) = ('', name)
+
+    prereq_path = None
+    for p in PREREQ_PATHS:
+        if prefix.startswith(p):
+            prereq_path = p
+            break
+
+    path_name = None
+    for p in PATHS_BY_LENGTH:
+        if p in point_path:
+            path_name = p
+            break
+
+    if SITE_SEPARATOR in point_path:
+        ref_name = point_path.partition(SITE_SEPARATOR)[0]
+    elif path_name is not None:
+        ref_name = point_path.partition(path_name)[0].rstrip('_')
+    else:
+        ref_name = point_path
+
+    return {
+        'name': name,
+        'test_id': prefix if (prefix and prereq_path is None) else None,
+        'prereq': prefix if prereq_path is not None else None,
+        'prereq_path': prereq_path,
+        'point_path': point_path,
+        'ref_name': ref_name,
+        'path_name': path_name
+    }
+
+
+TOKEN_KEYS = ['test_id', 'prereq', 'prereq_path', 'ref_name', 'path_name']
+
+
+class NameIndex(object):
+    '''
+    Index over a list of series names / filenames, for keyword filtering with set operations.
+    A keyword matches every name that contains it, as bbdata's original recursive filter did: '#pdc_vav_2_1' also
+    matches '#pdc_vav_2_10'. The matches of each keyword are found once and kept, so AND / OR filters are set
+    operations on cached position sets. Each name is also tokenized once (test id, prereq id, prereq path, equipment
+    ref name, path name); a token's names are known matches of that keyword without a scan.
+    '''
+    def __init__(self, names):
+        self.names = list(names)
+        self.postings = {}  # token: set of positions in names
+        self.substrings = {}  # keyword: set of positions of names containing it
+        for i in range(len(self.names)):
+            tokens = parse_point_name(self.names[i])
+            for key in TOKEN_KEYS:
+                if tokens[key] is not None:
+                    self.postings.setdefault(tokens[key], set()).add(i)
+
+    def lookup(self, keyword):
+        '''
+        :return: set of positions of names containing keyword
+        '''
+        try:
+            return self.substrings[keyword]
+        except KeyError:
+            pass
+        # a token is part of its name, so its names match; the other names still need a substring check
+        found = set(self.postings.get(keyword, ()))
+        found.update(i for i in range(len(self.names)) if i not in found and keyword in self.names[i])
+        self.substrings[keyword] = found
+        return found
+
+    def match(self, n_keywords, u_keywords):
+        '''
+        :param n_keywords: keywords that must all match (intersection)
+        :param u_keywords: keywords of which at least one must match (union)
+        :return: set of positions matching all of n_keywords and any of u_keywords. empty if there are no keywords
+        '''
+        result = None
+        for keyword in n_keywords:
+            result = self.lookup(keyword) if result is None else result & self.lookup(keyword)
+        if u_keywords:
+            union = set()
+            for keyword in u_keywords:
+                union |= self.lookup(keyword)
+            result = union if result is None else result & union
+        return result if result is not None else set()
+
+    def get_names(self, positions):
+        '''
+        :return: names at positions, in their original order
+        '''
+        return [self.names[i] for i in sorted(positions)]
@@ -0,0 +1,227 @@
+__author__ = 'christina'
+
+"""
+Consolidated store for the point-path time series of one test set, replacing a folder of one csv per series.
+
+A store is a folder (by convention named <something>.store) holding:
+    timestamps_<segment>.npy: int64 ns since the unix epoch (UTC) of every series in the segment, back to back
+    values_<segment>.npy: float32 values, aligned with the timestamps
+    manifest.json: one entry per series with its name, parsed name tokens (see point_paths.parse_point_name) and the
+        [segment, start, stop] row ranges ("chunks") that hold its data
+
+Series are read by slicing memory-mapped segment arrays, so reading a few series out of thousands only touches their
+bytes. find() looks series up by test id, prereq, equipment ref name and path name.
+
+To convert an existing csv folder:
+    python point_store.py C:/data/test_csv_data_851 test_set_851.store
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+import point_paths
+from compressed import open_input
+
+MANIFEST = 'manifest.json'
+INDEX_KEYS = point_paths.TOKEN_KEYS
+TIMESTAMP_DTYPE = np.int64
+VALUE_DTYPE = np.float32
+
+
+def is_store(dirname):
+    '''
+    :return: True if dirname is a store folder (it has a store manifest), False e.g. for a csv folder
+    '''
+    return os.path.isfile(os.path.join(dirname, MANIFEST))
+
+
+class PointStore(object):
+    def __init__(self, dirname):
+        '''
+        opens the store in dirname, or an empty store if dirname does not exist yet (it is created on first write)
+        '''
+        self.dirname = dirname
+        self.segments = []
+        self.series = {}  # series name: manifest entry
+        self.index = dict((key, {}) for key in INDEX_KEYS)  # key: token: set of series names
+        self.mapped = {}  # segment: (timestamps, values) memory-mapped arrays
+
+        manifest_path = os.path.join(dirname, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            self.segments = manifest['segments']
+            for entry in manifest['series']:
+                self.add_to_index(entry)
+
+    def __len__(self):
+        return len(self.series)
+
+    def __contains__(self, name):
+        return name in self.series
+
+    def add_to_index(self, entry):
+        self.series[entry['name']] = entry
+        for key in INDEX_KEYS:
+            if entry[key] is not None:
+                self.index[key].setdefault(entry[key], set()).add(entry['name'])
+
+    def names(self):
+        return sorted(self.series.keys())
+
+    def find(self, test_id=None, prereq=None, prereq_path=None, ref_name=None, path_name=None):
+        '''
+        :return: sorted list of series names matching all of the given tokens (exact match)
+        '''
+        found = None
+        for (key, token) in zip(INDEX_KEYS, [test_id, prereq, prereq_path, ref_name, path_name]):
+            if token is not None:
+                names = self.index[key].get(token, set())
+                found = names if found is None else found & names
+        if found is None:
+            return self.names()
+        return sorted(found)
+
+    def get_segment(self, segment):
+        try:
+            return self.mapped[segment]
+        except KeyError:
+            self.mapped[segment] = (
+                np.load(os.path.join(self.dirname, 'timestamps_' + segment + '.npy'), mmap_mode='r'),
+                np.load(os.path.join(self.dirname, 'values_' + segment + '.npy'), mmap_mode='r'))
+            return self.mapped[segment]
+
+    def get_series(self, name):
+        '''
+        :return: tuple of (timestamps, values) arrays. for single-chunk series these are memory-mapped views of the
+            store (read-only, zero-copy)
+        '''
+        chunks = self.series[name]['chunks']
+        parts = []
+        for (segment, start, stop) in chunks:
+            (timestamps, values) = self.get_segment(segment)
+            parts.append((timestamps[start:stop], values[start:stop]))
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return np.array([], dtype=TIMESTAMP_DTYPE), np.array([], dtype=VALUE_DTYPE)
+        return np.concatenate([x[0] for x in parts]), np.concatenate([x[1] for x in parts])
+
+    def add_series(self, series_list):
+        '''
+        writes a batch of series as one new segment and updates the manifest. data for a name that is already in the
+        store is appended to that series.
+        :param series_list: list of (name, timestamps, values) tuples; timestamps in int64 ns since the epoch (UTC)
+        '''
+        if not series_list:
+            return
+        if not os.path.isdir(self.dirname):
+            os.makedirs(self.dirname)
+        segment = '%06d' % len(self.segments)
+
+        timestamps = np.concatenate([np.asarray(x[1], dtype=TIMESTAMP_DTYPE) for x in series_list])
+        values = np.concatenate([np.asarray(x[2], dtype=VALUE_DTYPE) for x in series_list])
+        np.save(os.path.join(self.dirname, 'timestamps_' + segment + '.npy'), timestamps)
+        np.save(os.path.join(self.dirname, 'values_' + segment + '.npy'), values)
+        self.segments.append(segment)
+
+        start = 0
+        for (name, series_timestamps, series_values) in series_list:
+            stop = start + len(series_timestamps)
+            if name not in self.series:
+                entry = point_paths.parse_point_name(name)
+                entry['chunks'] = []
+                self.add_to_index(entry)
+            self.series[name]['chunks'].append([segment, start, stop])
+            start = stop
+        self.save()
+
+    def save(self):
+        manifest = {
+            'segments': self.segments,
+            'series': [self.series[x] for x in self.names()]
+        }
+        path = os.path.join(self.dirname, MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(path + '.tmp', path)
+
+
+def parse_csv_index(index):
+    '''
+    parses the timestamp column of an exported csv with an explicit format. export_csv writes str(timestamp), e.g.
+    2015-11-12 23:06:07+00:00 or 2015-11-12 23:06:07.250000+00:00: the first CSV_TIME_LENGTH chars are parsed with
+    CSV_TIME_FORMAT and a fraction of a second after them is added back, so sub-second samples keep their precision
+    :param index: pandas index of timestamp text
+    :return: pandas DatetimeIndex (naive UTC)
+    '''
+    import pandas as pd
+    text = index.astype(str)
+    times = pd.to_datetime(text.str[:point_paths.CSV_TIME_LENGTH], format=point_paths.CSV_TIME_FORMAT)
+    fraction = text.str[point_paths.CSV_TIME_LENGTH:].str.extract(r'^\.(\d+)', expand=False)
+    if fraction.notnull().any():
+        ns = fraction.fillna('0').str[:9].str.ljust(9, '0').astype(np.int64).values
+        times = times + pd.to_timedelta(ns, unit='ns')
+    return times
+
+
+def read_csv_series(filename):
+    '''
+    reads one exported point-path csv
+    :return: tuple of (timestamps, values): int64 ns since the epoch and float32 values
+    '''
+    import pandas as pd
+    if os.path.getsize(filename) == 0:
+        return np.array([], dtype=TIMESTAMP_DTYPE), np.array([], dtype=VALUE_DTYPE)
+    with open_input(filename) as f:  # plain or compressed, see compressed.py
+        data = pd.read_csv(f, sep=',', header=None, index_col=0)
+    index = parse_csv_index(data.index)
+    return index.asi8.astype(TIMESTAMP_DTYPE), data.iloc[:, 0].values.astype(VALUE_DTYPE)
+
+
+def read_csv_series_or_none(filename):
+    '''
+    read_csv_series for one file of a batch: a file that can't be parsed (only whitespace, only a header, a bad
+    timestamp) is reported and skipped instead of stopping the whole batch, as bbdata.read_file_or_none does
+    :return: tuple of (timestamps, values), or None
+    '''
+    try:
+        return read_csv_series(filename)
+    except ValueError as e:  # includes pandas' EmptyDataError and ParserError
+        print 'skipping ' + filename + ': ' + str(e)
+        return None
+
+
+def build_store_from_csv(folder, dirname, batch_size=1000):
+    '''
+    converts a folder of exported point-path csv files into a store
+    :param folder: folder of '<test id>__<point path>' csv files
+    :param dirname: store folder to write
+    :param batch_size: number of series per segment
+    :return: PointStore. files that can't be parsed are reported and left out
+    '''
+    store = PointStore(dirname)
+    # skip dotfiles, e.g. the .folder_manifest.json bbdata writes into every folder it scans
+    filenames = sorted(os.path.join(folder, x) for x in os.listdir(folder) if not x.startswith('.'))
+    batch = []
+    for filename in filenames:
+        name = os.path.basename(filename)
+        if name in store or not os.path.isfile(filename):
+            continue
+        series = read_csv_series_or_none(filename)
+        if series is None:
+            continue
+        batch.append((name, series[0], series[1]))
+        if len(batch) >= batch_size:
+            store.add_series(batch)
+            batch = []
+    store.add_series(batch)
+    return store
+
+
+if __name__ == '__main__':
+    build_store_from_csv(sys.argv[1], sys.argv[2])
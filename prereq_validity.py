@@ -0,0 +1,383 @@
+__author__ = 'christina'
+
+"""
+Prereq validity evaluated from raw point data.
+
+Instead of exporting a validity file per prereq by hand (e.g. pamf-1472_cdp_fl1.txt), evaluate the prereq point series
+that export_csv writes ('<prereq id>__<point path>', e.g. 'ColdDuctPressure 137__#ahu_1_site_97_static_pressure')
+against point_paths.PREREQ_THRESHOLDS:
+    - a sample is valid on the PREREQ_DIRECTIONS side of the threshold
+    - hysteresis: once valid, a prereq only turns invalid after passing the threshold by more than the hysteresis
+    - min_dwell: a change of validity that does not last min_dwell seconds is ignored
+    - a prereq with several point series is valid while all of them are
+The result is a list of change-of-value times and 0/1 validity per prereq id, which is what
+TestSet.set_prereq_validity takes (apply_to_test_set), or what write_validity_file writes in the exported file format.
+
+Exported validity files (e.g. pamf-1472_cdp_fl1.txt: a quoted ISO timestamp line and a 0/1 line per change) are
+parsed by parse_validity_file into the same arrays. map_validity_files matches a folder of them to the prereq ids of a
+TestSet by the prereq abbreviation in the file name (PREREQ_ABBREVIATIONS, e.g. cdp -> ColdDuctPressure), then by a
+prereq number, floor (fl1, floor2) or order in the name, and attach_validity_files sets them all at once.
+
+usage:
+    python prereq_validity.py C:/data/test_csv_data_851 -o validity --hysteresis 0.05 --min-dwell 300
+"""
+import argparse
+import datetime as dt
+import os
+import re
+
+import numpy as np
+
+import point_paths
+from compressed import open_input
+from folder_manifest import get_folder_manifest
+from point_join import normalize_ref_name
+from point_store import read_csv_series
+
+NS_PER_SECOND = 10 ** 9
+EPOCH = dt.datetime(1970, 1, 1)
+VALIDITY_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+PREREQ_ABBREVIATIONS = dict(zip(['cdp', 'cdt', 'hdp', 'hwp', 'hwt'], point_paths.PREREQ_PATHS))
+NAME_TOKENS = re.compile(r'[ _\-.]+')
+FLOOR_TOKEN = re.compile(r'^(?:fl|floor)(\d+)$')
+NUMBERS = re.compile(r'\d+')
+
+
+def evaluate_threshold(timestamps, values, threshold, direction, hysteresis=0.0, min_dwell=0):
+    '''
+    :param timestamps: sorted int64 ns
+    :param values: values aligned with timestamps, NaN samples keep the previous validity
+    :param threshold: limit
+    :param direction: 'above' or 'below', the valid side of the threshold
+    :param hysteresis: how far past the threshold the value must go to turn invalid again
+    :param min_dwell: seconds a change of validity must last to count
+    :return: tuple of arrays (change times in int64 ns, 0/1 validity from each change time on). the first entry is the
+        validity at the first sample
+    '''
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    if len(timestamps) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int8)
+    if direction == 'above':
+        turn_on = values >= threshold
+        turn_off = values < threshold - hysteresis
+    elif direction == 'below':
+        turn_on = values <= threshold
+        turn_off = values > threshold + hysteresis
+    else:
+        raise ValueError('Threshold direction not recognized')
+
+    # state of each sample is that of the last sample that turned it on or off (invalid before any such sample)
+    is_event = turn_on | turn_off
+    last_event = np.maximum.accumulate(np.where(is_event, np.arange(len(values)), -1))
+    state = np.where(last_event >= 0, turn_on[np.maximum(last_event, 0)], False).astype(np.int8)
+
+    (times, validity) = get_changes(timestamps, state)
+    if min_dwell > 0:
+        (times, validity) = apply_min_dwell(times, validity, min_dwell * NS_PER_SECOND)
+    return times, validity
+
+
+def get_changes(timestamps, state):
+    '''
+    :return: tuple of arrays (times where state changes, including the first sample; state from then on)
+    '''
+    changes = np.concatenate(([0], np.flatnonzero(state[1:] != state[:-1]) + 1))
+    return timestamps[changes], state[changes]
+
+
+def apply_min_dwell(times, validity, min_dwell):
+    '''
+    drops runs that are shorter than min_dwell: they keep the validity of the last run long enough to count
+    :param min_dwell: ns
+    '''
+    if len(times) < 2:
+        return times, validity
+    durations = np.append(np.diff(times), min_dwell)  # the last run is still going
+    long_enough = durations >= min_dwell
+    long_enough[0] = True
+    last_long = np.maximum.accumulate(np.where(long_enough, np.arange(len(times)), 0))
+    return get_changes(times, validity[last_long])
+
+
+def combine_validity(changes_list):
+    '''
+    :param changes_list: list of (times, validity) tuples of the point series of one prereq
+    :return: (times, validity) of all of them being valid
+    '''
+    if len(changes_list) == 1:
+        return changes_list[0]
+    times = np.unique(np.concatenate([x[0] for x in changes_list]))
+    valid = np.ones(len(times), dtype=np.int8)
+    for (series_times, series_validity) in changes_list:
+        previous = np.searchsorted(series_times, times, 'right') - 1
+        valid &= np.where(previous >= 0, series_validity[np.maximum(previous, 0)], 0).astype(np.int8)
+    return get_changes(times, valid)
+
+
+def get_hysteresis(hysteresis, prereq_path):
+    '''
+    :param hysteresis: number for all prereqs, or dict of prereq path: number
+    '''
+    if isinstance(hysteresis, dict):
+        return hysteresis.get(prereq_path, 0.0)
+    return hysteresis
+
+
+def evaluate_prereqs(series_list, hysteresis=0.0, min_dwell=0):
+    '''
+    :param series_list: list of (prereq id, prereq path, timestamps in int64 ns, values) tuples
+    :param hysteresis: number for all prereqs, or dict of prereq path: number
+    :param min_dwell: seconds a change of validity must last to count
+    :return: dict of prereq id: (change times in int64 ns, 0/1 validity)
+    '''
+    changes = {}  # prereq id: list of (times, validity) of its point series
+    for (prereq_ID, prereq_path, timestamps, values) in series_list:
+        changes.setdefault(prereq_ID, []).append(evaluate_threshold(
+            timestamps, values, point_paths.PREREQ_THRESHOLDS[prereq_path],
+            point_paths.PREREQ_DIRECTIONS[prereq_path], get_hysteresis(hysteresis, prereq_path), min_dwell))
+    return dict((x, combine_validity(changes[x])) for x in changes)
+
+
+def load_prereq_series(filenames):
+    '''
+    :param filenames: exported point-path csv filenames; those that are not prereq data are skipped
+    :return: series_list for evaluate_prereqs
+    '''
+    series_list = []
+    for filename in filenames:
+        manifest = get_folder_manifest(os.path.dirname(filename), rescan=False)
+        name = os.path.basename(filename)
+        if name not in manifest.files:
+            manifest.rescan()
+        entry = manifest.get(name)
+        if entry['tokens']['prereq_path'] is None or entry['rows'] == 0:
+            continue
+        (timestamps, values) = read_csv_series(filename)
+        series_list.append((entry['tokens']['prereq'], entry['tokens']['prereq_path'], timestamps, values))
+    return series_list
+
+
+def load_store_prereq_series(store):
+    '''
+    :param store: PointStore (see point_store.py)
+    :return: series_list for evaluate_prereqs
+    '''
+    series_list = []
+    for path in point_paths.PREREQ_PATHS:
+        for name in store.find(prereq_path=path):
+            (timestamps, values) = store.get_series(name)
+            series_list.append((store.series[name]['prereq'], path, timestamps, values))
+    return series_list
+
+
+def evaluate_folders(folders, hysteresis=0.0, min_dwell=0):
+    '''
+    evaluates the prereqs of several sites in one batch
+    :param folders: list of exported point-path csv folders, one per site / test set
+    :return: dict of folder: dict of prereq id: (change times in int64 ns, 0/1 validity)
+    '''
+    results = {}
+    for folder in folders:
+        filenames = get_folder_manifest(folder).filenames()
+        results[folder] = evaluate_prereqs(load_prereq_series(filenames), hysteresis, min_dwell)
+    return results
+
+
+def ns_to_datetime(ns):
+    return EPOCH + dt.timedelta(microseconds=int(ns) // 1000)
+
+
+def to_validity_lists(times, validity):
+    '''
+    :return: tuple of lists (COV_datetime, validity), as TestSet.set_prereq_validity takes them
+    '''
+    return [ns_to_datetime(x) for x in times], [int(x) for x in validity]
+
+
+def get_valid_intervals(times, validity, end_ns):
+    '''
+    :param end_ns: end of the last interval if the prereq is still valid at the last change
+    :return: list of (start, end) int64 ns tuples during which the prereq was valid
+    '''
+    ends = np.append(times[1:], end_ns)
+    return [(times[i], ends[i]) for i in np.flatnonzero(validity == 1)]
+
+
+def apply_to_test_set(test_set, results):
+    '''
+    sets the validity of every prereq of the test set that was evaluated
+    :param test_set: TestSet
+    :param results: dict of prereq id: (change times, validity), from evaluate_prereqs
+    :return: list of prereq ids that were set
+    '''
+    prereq_IDs = test_set.get_prereq_IDs()
+    applied = []
+    for prereq_ID in sorted(results):
+        if prereq_ID in prereq_IDs:
+            (COV_datetime, validity) = to_validity_lists(*results[prereq_ID])
+            test_set.set_prereq_validity(prereq_ID, COV_datetime, validity)
+            applied.append(prereq_ID)
+    return applied
+
+
+def parse_validity_file(filename):
+    '''
+    reads an exported validity file in one pass
+    :return: tuple of arrays (change times in int64 ns, 0/1 validity). times are truncated to the second, like the log
+        times they are compared to
+    '''
+    with open_input(filename) as f:
+        return parse_validity_text(f.read())
+
+
+def parse_validity_text(text):
+    '''
+    :param text: contents of a validity file
+    :return: see parse_validity_file
+    '''
+    tokens = text.split()
+    stamps = []
+    values = []
+    pending = None
+    for token in tokens:
+        if token.startswith('"'):
+            pending = token
+        elif pending is not None and (token == '0' or token == '1'):
+            stamps.append(pending.strip('"').rstrip('Z'))
+            values.append(token == '1')
+            pending = None
+    times = np.array(stamps, dtype='datetime64[ms]').astype('datetime64[s]').astype(np.int64) * NS_PER_SECOND
+    return times, np.array(values, dtype=np.int8)
+
+
+def get_name_tokens(filename):
+    '''
+    :return: tuple of (prereq path or None, lower case tokens of the file name after the prereq abbreviation)
+    '''
+    tokens = NAME_TOKENS.split(os.path.splitext(os.path.basename(filename))[0].lower())
+    for i in range(len(tokens)):
+        if tokens[i] in PREREQ_ABBREVIATIONS:
+            return PREREQ_ABBREVIATIONS[tokens[i]], [x for x in tokens[i + 1:] if x]
+    return None, []
+
+
+def get_box_floor(box):
+    '''
+    :return: floor of a box named like '#pdc_vav_2_6', '#pdc_vav_2_6_VAVR_site_97' or '#hq2_mix_3-12' (the second to
+        last number of the ref name without its site suffix), or None
+    '''
+    numbers = NUMBERS.findall(normalize_ref_name(box))
+    return int(numbers[-2]) if len(numbers) >= 2 else None
+
+
+def get_prereq_floors(test_set, prereq_ID):
+    '''
+    :return: dict of floor: number of boxes on that floor in the prereq's safety sets
+    '''
+    floors = {}
+    for box in test_set.safety_set_dict.keys():
+        if prereq_ID in test_set.safety_set_dict[box]:
+            floor = get_box_floor(box)
+            floors[floor] = floors.get(floor, 0) + 1
+    return floors
+
+
+def match_suffix(test_set, suffix, candidates):
+    '''
+    :param suffix: file name tokens after the prereq abbreviation
+    :param candidates: prereq ids of the same prereq path
+    :return: tuple of (prereq id or None, how it matched)
+    '''
+    numbers = dict((x.split()[-1], x) for x in candidates)
+    for token in suffix:
+        if token in numbers:
+            return numbers[token], 'prereq number'
+    for token in suffix:
+        floor = FLOOR_TOKEN.match(token)
+        if floor is not None:
+            floor = int(floor.group(1))
+            counts = [(get_prereq_floors(test_set, x).get(floor, 0), x) for x in candidates]
+            (count, best) = max(counts)
+            if count > 0:
+                return best, 'floor'
+    if len(candidates) == 1:
+        return candidates[0], 'only prereq'
+    return None, None
+
+
+def map_validity_files(test_set, filenames):
+    '''
+    :param test_set: TestSet
+    :param filenames: candidate validity files; files without a prereq abbreviation in their name are skipped
+    :return: list of (filename, prereq id, how it matched) tuples, one per mapped file
+    '''
+    prereq_IDs = sorted(test_set.get_prereq_IDs())
+    by_path = {}  # prereq path: list of (suffix, filename)
+    for filename in filenames:
+        (prereq_path, suffix) = get_name_tokens(filename)
+        if prereq_path is not None:
+            by_path.setdefault(prereq_path, []).append((suffix, filename))
+
+    mapping = []
+    for (prereq_path, files) in sorted(by_path.items()):
+        candidates = [x for x in prereq_IDs if x.startswith(prereq_path)]
+        unmatched = []
+        for (suffix, filename) in sorted(files):
+            (prereq_ID, how) = match_suffix(test_set, suffix, candidates)
+            if prereq_ID is None:
+                unmatched.append(filename)
+            else:
+                mapping.append((filename, prereq_ID, how))
+        # what is left is paired in order, e.g. cdp_ahu3, cdp_ahu4 -> lowest, next lowest prereq number
+        left = sorted([x for x in candidates if x not in [y[1] for y in mapping]], key=lambda x: int(x.split()[-1]))
+        for (filename, prereq_ID) in zip(unmatched, left):
+            mapping.append((filename, prereq_ID, 'order'))
+    return mapping
+
+
+def attach_validity_files(test_set, folder, site=None):
+    '''
+    maps the validity files in folder to the test set's prereq ids and sets their validity
+    :param folder: folder of validity files
+    :param site: only use files whose name starts with site, e.g. 'pamf-1472'
+    :return: list of (filename, prereq id, how it matched) tuples
+    '''
+    filenames = sorted(os.path.join(folder, x) for x in os.listdir(folder)
+                       if not x.startswith('~$') and (site is None or x.startswith(site)))
+    mapping = map_validity_files(test_set, [x for x in filenames if os.path.isfile(x)])
+    for (filename, prereq_ID, how) in mapping:
+        (COV_datetime, validity) = to_validity_lists(*parse_validity_file(filename))
+        test_set.set_prereq_validity(prereq_ID, COV_datetime, validity)
+    return mapping
+
+
+def write_validity_file(filename, times, validity):
+    '''
+    writes validity in the exported validity file format: a quoted ISO timestamp line, a 0/1 line and a blank line per
+    change
+    '''
+    with open(filename, 'wb') as f:
+        for (ns, valid) in zip(times, validity):
+            a_datetime = ns_to_datetime(ns)
+            f.write('"%s.%03dZ"\r\n%d\r\n\r\n' % (a_datetime.strftime(VALIDITY_TIME_FORMAT),
+                                                  a_datetime.microsecond // 1000, valid))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate prereq validity files from exported prereq point data.')
+    parser.add_argument('folders', nargs='+', help='exported point-path csv folders')
+    parser.add_argument('-o', '--out', default='.', help='folder to write validity files to')
+    parser.add_argument('--hysteresis', type=float, default=0.0, help='in the units of each prereq')
+    parser.add_argument('--min-dwell', type=float, default=0, help='seconds a change must last to count')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.out):
+        os.makedirs(args.out)
+    all_results = evaluate_folders(args.folders, args.hysteresis, args.min_dwell)
+    for folder in args.folders:
+        site = os.path.basename(os.path.normpath(folder))
+        for (prereq_ID, (change_times, change_validity)) in sorted(all_results[folder].items()):
+            out_name = os.path.join(args.out, site + '_' + prereq_ID.replace(' ', '_') + '.txt')
+            write_validity_file(out_name, change_times, change_validity)
+            print 'wrote ' + out_name
@@ -0,0 +1,73 @@
+__author__ = 'christina'
+
+"""
+Content-addressed cache of rendered figures.
+
+Each saved figure is recorded in .render_cache.json in its folder with a key: the sha1 of its figure type, that type's
+STYLE_VERSIONS entry, the data it plots and its plotting options. A batch re-render skips a figure whose file exists
+and whose key is unchanged. After a styling change to one figure type, bump its STYLE_VERSIONS entry so only figures
+of that type are re-rendered.
+"""
+import hashlib
+import json
+import os
+
+CACHE_FILENAME = '.render_cache.json'
+# bump a figure type's version when its styling changes
+STYLE_VERSIONS = {
+    'timeline': 1,
+    'test count': 1,
+    'trends': 1
+}
+
+# caches already loaded in this process, by folder
+caches = {}
+
+
+def get_render_key(figure_type, model, options=None):
+    '''
+    :param figure_type: key of STYLE_VERSIONS
+    :param model: json-able data the figure plots; datetimes and other objects are hashed by their str()
+    :param options: json-able plotting options
+    :return: hex sha1 key
+    '''
+    text = json.dumps([figure_type, STYLE_VERSIONS[figure_type], model, options], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class RenderCache(object):
+    def __init__(self, dirname):
+        self.path = os.path.join(dirname, CACHE_FILENAME)
+        try:
+            with open(self.path, 'r') as f:
+                self.keys = json.load(f)
+        except (IOError, ValueError):
+            self.keys = {}  # figure file name: key
+
+    def is_fresh(self, figName, key):
+        '''
+        :return: True if figName exists and was rendered with key
+        '''
+        return self.keys.get(os.path.basename(figName)) == key and os.path.exists(figName)
+
+    def record(self, figName, key):
+        self.keys[os.path.basename(figName)] = key
+        self.save()
+
+    def save(self):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.keys, f)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(self.path + '.tmp', self.path)
+
+
+def get_render_cache(dirname):
+    '''
+    :param dirname: folder figures are saved in
+    :return: RenderCache of the folder
+    '''
+    dirname = os.path.abspath(dirname)
+    if dirname not in caches:
+        caches[dirname] = RenderCache(dirname)
+    return caches[dirname]
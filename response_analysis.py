@@ -0,0 +1,194 @@
+__author__ = 'christina'
+
+"""
+Batch command-to-response analysis of all boxes of a test set.
+
+Instead of comparing e.g. actuator_u_damper_opening_real with measure_damper_opening_real box by box in make_subplot
+grids, analyze_pair computes for every box at once, on the aligned trend matrix (see trend_matrix.py):
+    lag: shift of the response behind the command that best correlates their changes (FFT cross-correlation)
+    settling time: after each command step, time until the response stays within tolerance of the command
+    steady-state error: mean |response - command| once settle_seconds have passed since the last step
+rank_outliers scores each box by its largest robust z-score (median / MAD across boxes) over these metrics, so the boxes
+worth looking at come first.
+
+The pairs to compare are in PAIRS. Only the damper pair can be analyzed today: the airflow setpoint is not one of the
+exported point paths (point_paths.PATHS), so there is no command trend to compare measure_mdot_real with. Once it is
+exported, add its path to PATHS and an 'airflow' entry to PAIRS.
+
+usage:
+    python response_analysis.py C:/data/test_csv_data_851 -o damper_outliers.csv
+"""
+import argparse
+import csv
+
+import numpy as np
+
+from folder_manifest import get_folder_manifest
+from trend_matrix import build_trend_matrix, STEP_SECONDS
+
+# pair name: (command trend, response trend, tolerance, command step size), tolerance and step in the trends' units
+PAIRS = {
+    'damper': ('actuator_u_damper_opening_real', 'measure_damper_opening_real', 5.0, 5.0)
+}
+MAX_LAG_SECONDS = 15 * 60
+SETTLE_SECONDS = 10 * 60
+METRICS = ['lag_seconds', 'settling_seconds_mean', 'settling_seconds_max', 'unsettled_steps', 'steady_state_error']
+MAD_SCALE = 1.4826  # makes the MAD of normally distributed data equal its standard deviation
+FIELDNAMES = ['box', 'score', 'worst_metric', 'steps', 'correlation'] + METRICS
+
+
+def get_lags(command, response, max_lag):
+    '''
+    :param command: box x time array
+    :param response: box x time array
+    :param max_lag: in grid steps
+    :return: tuple of arrays per box (lag in grid steps, normalized correlation at that lag). NaN where the command or
+        response never changes
+    '''
+    x = np.nan_to_num(np.diff(command, axis=1))
+    y = np.nan_to_num(np.diff(response, axis=1))
+    n = 1
+    while n < 2 * x.shape[1]:
+        n *= 2
+    # c[k] = sum over t of x[t] * y[t + k]: the response k steps after the command
+    c = np.fft.irfft(np.fft.rfft(y, n, axis=1) * np.conj(np.fft.rfft(x, n, axis=1)), n, axis=1)[:, :max_lag + 1]
+    lag = np.argmax(c, axis=1)
+    norm = np.sqrt((x ** 2).sum(axis=1) * (y ** 2).sum(axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = np.where(norm > 0, c[np.arange(len(lag)), lag] / norm, np.nan)
+    return np.where(norm > 0, lag, np.nan), correlation
+
+
+def get_settling(command, response, tolerance, step_size, settle_steps):
+    '''
+    :return: dict of arrays per box: steps, unsettled_steps, settling_steps_mean, settling_steps_max,
+        steady_state_error
+    '''
+    (n_boxes, n_times) = command.shape
+    t = np.arange(n_times)
+    valid = ~np.isnan(command) & ~np.isnan(response)
+    error = np.abs(response - command)
+
+    step = np.zeros(command.shape, dtype=bool)
+    step[:, 1:] = np.nan_to_num(np.abs(np.diff(command, axis=1))) >= step_size
+    is_step = step.copy()  # commanded steps, not counting the start of the window
+    step[:, 0] = True
+
+    # segment: from one step up to the next. segment ids are unique across boxes
+    segment = np.cumsum(step, axis=1) + (np.arange(n_boxes) * (n_times + 1))[:, np.newaxis]
+    n_segments = n_boxes * (n_times + 1)
+    start = np.zeros(n_segments, dtype=int)
+    start[segment[step]] = np.broadcast_to(t, command.shape)[step]
+    end = np.full(n_segments, -1, dtype=int)
+    np.maximum.at(end, segment.ravel(), np.broadcast_to(t, command.shape).ravel())
+    bad = valid & (error > tolerance)
+    last_bad = np.full(n_segments, -1, dtype=int)
+    np.maximum.at(last_bad, segment[bad], np.broadcast_to(t, command.shape)[bad])
+
+    step_segments = segment[is_step]
+    step_boxes = step_segments // (n_times + 1)
+    settled = last_bad[step_segments] < end[step_segments]
+    settling = np.where(last_bad[step_segments] < start[step_segments], 0,
+                        last_bad[step_segments] - start[step_segments] + 1).astype(float)
+    settling[~settled] = np.nan
+
+    steps = np.bincount(step_boxes, minlength=n_boxes)
+    n_settled = np.bincount(step_boxes[settled], minlength=n_boxes)
+    settling_sum = np.bincount(step_boxes[settled], weights=settling[settled], minlength=n_boxes)
+    settling_max = np.full(n_boxes, np.nan)
+    np.fmax.at(settling_max, step_boxes, settling)
+
+    # steady state: settle_steps after the last step
+    since_step = t[np.newaxis, :] - start[segment]
+    steady = valid & (since_step >= settle_steps)
+    n_steady = steady.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'steps': steps,
+            'unsettled_steps': steps - n_settled,
+            'settling_steps_mean': np.where(n_settled > 0, settling_sum / n_settled, np.nan),
+            'settling_steps_max': settling_max,
+            'steady_state_error': np.where(n_steady > 0, np.where(steady, error, 0).sum(axis=1) / n_steady, np.nan)
+        }
+
+
+def analyze_pair(matrix, pair='damper', max_lag_seconds=MAX_LAG_SECONDS, settle_seconds=SETTLE_SECONDS):
+    '''
+    :param matrix: TrendMatrix with both trends of the pair
+    :param pair: key of PAIRS
+    :return: list of row dicts, one per box that has both trends
+    '''
+    (command_trend, response_trend, tolerance, step_size) = PAIRS[pair]
+    boxes = sorted(set(matrix.get_boxes_with(command_trend)) & set(matrix.get_boxes_with(response_trend)))
+    if not boxes:
+        return []
+    step_seconds = (matrix.times[1] - matrix.times[0]) / 10 ** 9 if len(matrix.times) > 1 else STEP_SECONDS
+    command = matrix.get(command_trend, boxes)
+    response = matrix.get(response_trend, boxes)
+
+    (lag, correlation) = get_lags(command, response, int(max_lag_seconds // step_seconds))
+    settling = get_settling(command, response, tolerance, step_size, int(settle_seconds // step_seconds))
+    rows = []
+    for i in range(len(boxes)):
+        rows.append({
+            'box': boxes[i],
+            'steps': int(settling['steps'][i]),
+            'correlation': correlation[i],
+            'lag_seconds': lag[i] * step_seconds,
+            'settling_seconds_mean': settling['settling_steps_mean'][i] * step_seconds,
+            'settling_seconds_max': settling['settling_steps_max'][i] * step_seconds,
+            'unsettled_steps': int(settling['unsettled_steps'][i]),
+            'steady_state_error': settling['steady_state_error'][i]
+        })
+    return rows
+
+
+def rank_outliers(rows, metrics=METRICS):
+    '''
+    scores each row by its largest robust z-score over metrics and sorts by it, worst first
+    :return: rows with 'score' and 'worst_metric' set
+    '''
+    if not rows:
+        return rows
+    values = np.array([[row[m] for m in metrics] for row in rows], dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        median = np.nanmedian(values, axis=0)
+        spread = MAD_SCALE * np.nanmedian(np.abs(values - median), axis=0)
+        spread = np.where(spread > 0, spread, np.nanstd(values, axis=0))
+        z = np.where(spread > 0, np.abs(values - median) / spread, 0.0)
+    z = np.nan_to_num(z)
+    for i in range(len(rows)):
+        rows[i]['score'] = z[i].max()
+        rows[i]['worst_metric'] = metrics[int(np.argmax(z[i]))]
+    return sorted(rows, key=lambda x: x['score'], reverse=True)
+
+
+def analyze_folder(folder, pair='damper'):
+    '''
+    :param folder: exported point-path csv folder of a test set
+    :return: ranked list of row dicts, worst box first
+    '''
+    (command_trend, response_trend) = PAIRS[pair][:2]
+    matrix = build_trend_matrix(get_folder_manifest(folder).filenames(), trends=[command_trend, response_trend])
+    if matrix is None:
+        return []
+    return rank_outliers(analyze_pair(matrix, pair))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rank boxes by command-to-response lag, settling and error.')
+    parser.add_argument('folder', help='exported point-path csv folder')
+    parser.add_argument('--pair', default='damper', choices=sorted(PAIRS.keys()))
+    parser.add_argument('-o', '--out', default=None, help='csv file to write the ranked table to')
+    parser.add_argument('-n', '--top', type=int, default=20, help='number of boxes to print')
+    args = parser.parse_args()
+
+    ranked = analyze_folder(args.folder, args.pair)
+    for row in ranked[:args.top]:
+        print '%-30s score %6.1f  worst: %s = %s' % (row['box'], row['score'], row['worst_metric'],
+                                                      row[row['worst_metric']])
+    if args.out is not None:
+        with open(args.out, 'wb') as f:
+            writer = csv.DictWriter(f, FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(ranked)
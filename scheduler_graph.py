@@ -32,10 +32,14 @@ getTestList
 getSafetySetMembers
 getBoxList
 getTestTimeline
+
+usage (importing the module does no work; matplotlib is only imported by plotTimeline):
+    python scheduler_graph.py vsp_hq2.txt
 """
+import argparse
 import datetime as dt
-import matplotlib.pyplot as plt
 import numpy as np
+from compressed import read_lines, strip_log_extension
 
 TEST_LOG_FILENAME = "vsp_hq2.txt"
 UNLOCKED = "Found unlocked zone: "  # note final whitespace
@@ -57,22 +61,86 @@ MODELED_EQ = "<Equipment: "
 
 
 def loadTestLog(filename):
-    with open(filename,'r',0) as f:
-        test_log_list = f.read().splitlines()
-    return test_log_list
+    # plain or compressed (gzip, bz2, xz, zstd) logs, see compressed.py
+    return read_lines(filename)
 
 
-def getPrereqIDs(test_log_list):
+# the most recent scan and a copy of the log list it was made from, so the get* views below share one pass over
+# the same log
+lastScan = {}
+
+
+def scanTestLog(test_log_list):
     """
-    finds all the unique prereq ids in the test set and returns them as a list
+    Single pass over the log that fills every structure the graph needs:
+    prereqDict: box name -> prereq ID -> list of datevalues when the box was in that prereq's safety set
+    testDict: box name -> test name -> list of datevalues when the box was running that test
+    prereqIDs: unique prereq ids, in order of first appearance
+    instances: box name -> count of prereqs + tests the box appears in
+
+    The result for the most recent log is cached, so getSafetySet, getTestSet and getPrereqIDs on the same log only
+    scan it once. The cache is keyed on a copy of the lines, not on the list object, so a list that was changed in
+    place or a new list with other lines is scanned again. Comparing the lines is much cheaper than the scan: the
+    copy holds the same string objects, so each line compares by identity.
     """
+    if lastScan.get('log') == test_log_list:
+        return lastScan['scan']
+
+    prereqDict = {}
+    testDict = {}
     prereqIDs = []
+    seenPrereqIDs = set()
+    instances = {}
+    datetimes = {}  # many entries share a timestamp, so only parse each one once
+
     for entry in test_log_list:
-        if entry.find(PREREQ_ID) >= 0:
-            prereq = entry[(entry.find(PREREQ_ID) + len(PREREQ_ID)):]
-            if prereq not in prereqIDs:
+        i = entry.find(PREREQ_ID)
+        if i >= 0:
+            prereq = entry[i + len(PREREQ_ID):]
+            if prereq not in seenPrereqIDs:
+                seenPrereqIDs.add(prereq)
                 prereqIDs.append(prereq)
-    return prereqIDs
+
+        if PREREQ_MACH_LIST in entry:
+            # remove curly braces and parse line into prereq machine segments
+            segments = entry.lstrip('{').rstrip('}').split(PREREQ_MACH)
+            this_datetime = getCachedDateTime(segments[0], datetimes)  # first segment has datetime value that we want
+            for seg in segments[1:]:
+                (prereqID, box_names) = getRefNames(seg)  # parse segments into equipment refnames
+                for box in box_names:
+                    boxPrereqs = prereqDict.setdefault(box, {})
+                    if prereqID not in boxPrereqs:
+                        boxPrereqs[prereqID] = []
+                        instances[box] = instances.get(box, 0) + 1
+                    boxPrereqs[prereqID].append(this_datetime)
+
+        if CURRENT in entry:
+            segments = entry.lstrip('[').rstrip(']').replace(', ', '').split(STATE_MACHINE)  # remove square brackets and parse line into test segments
+            this_datetime = getCachedDateTime(segments[0], datetimes)  # first segment has datetime value that we want
+            for seg in segments[1:]:
+                (test, sep, box) = seg.partition(' on ')  # parse segments into equipment refnames
+                boxTests = testDict.setdefault(box, {})
+                if test not in boxTests:
+                    boxTests[test] = []
+                    instances[box] = instances.get(box, 0) + 1
+                boxTests[test].append(this_datetime)
+
+    scan = {
+        'prereqDict': prereqDict,
+        'testDict': testDict,
+        'prereqIDs': prereqIDs,
+        'instances': instances
+    }
+    lastScan['log'] = list(test_log_list)
+    lastScan['scan'] = scan
+    return scan
+
+
+def getPrereqIDs(test_log_list):
+    """
+    finds all the unique prereq ids in the test set and returns them as a list
+    """
+    return scanTestLog(test_log_list)['prereqIDs']
 
 def getBoxList(pDict, tDict):
     """
@@ -104,53 +172,24 @@ def getSafetySet(test_log_list):
     dict key = box name
     dict value = list of datevalues
     """
-    prereqDict = {}
-    for entry in test_log_list:
-        if entry.find(PREREQ_MACH_LIST) >= 0:
-            # remove curly braces and parse line into prereq machine segments
-            segments = entry.lstrip('{').rstrip('}').split(PREREQ_MACH)
-            this_datetime = getDateTime(segments[0])  # first segment has datetime value that we want
-            for seg in segments[1:]:
-                (prereqID, box_names) = getRefNames(seg)  # parse segments into equipment refnames
-
-                for box in box_names:
-                    try:
-                        prereqDict[box]
-                    except KeyError:  # need to initialize a dict for the new prereqID
-                        prereqDict[box] = {}
-
-                    try:
-                        prereqDict[box][prereqID]
-                    except KeyError:  # need to initialize a list for the new box
-                        prereqDict[box][prereqID] = []
-                    prereqDict[box][prereqID].append(this_datetime)
-    return prereqDict
+    return scanTestLog(test_log_list)['prereqDict']
 
 def getTestSet(test_log_list):
-    testsetDict = {}
-    for entry in test_log_list:
-        if entry.find(CURRENT) >= 0:
-            segments = entry.lstrip('[').rstrip(']').replace(', ', '').split(STATE_MACHINE)  # remove square brackets and parse line into test segments
-            this_datetime = getDateTime(segments[0])  # first segment has datetime value that we want
-            for seg in segments[1:]:
-                (test, sep, box) = seg.partition(' on ')  # parse segments into equipment refnames
-                try:
-                    testsetDict[box]
-                except KeyError:  # need to initialize a dict for the new box
-                    testsetDict[box] = {}
-
-                try:
-                    testsetDict[box][test]
-                except KeyError:  # need to initialize a list for the new test
-                    testsetDict[box][test] = []
-                testsetDict[box][test].append(this_datetime)
-    return testsetDict
+    return scanTestLog(test_log_list)['testDict']
 
 def getDateTime(aStr):
     dt_string = aStr.split(' - ')[1][:-6]  # clip off the last 6 chars to drop the java time zone format
     dt_value = dt.datetime.strptime(dt_string,'%Y-%m-%d %H:%M:%S')
     return dt_value
 
+def getCachedDateTime(aStr, datetimes):
+    dt_string = aStr.split(' - ', 2)[1]
+    try:
+        return datetimes[dt_string]
+    except KeyError:
+        datetimes[dt_string] = dt.datetime.strptime(dt_string[:-6], '%Y-%m-%d %H:%M:%S')
+        return datetimes[dt_string]
+
 def getStartStopTime(test_log_list):
     start_time = getDateTime(test_log_list[0])
     stop_time = getDateTime(test_log_list[-10])
@@ -165,7 +204,12 @@ def getRefNames(seg):
         refnames_list = equipments.replace(MODELED_EQ, '').replace('>', '').replace(' ', '').split(',')
     return prereqID, refnames_list
 
-def countBoxInstances(ref_names, pDict, tDict):
+def countBoxInstances(ref_names, pDict, tDict, instances=None):
+    """
+    instances: optional box -> count dict from scanTestLog, used instead of recounting the dicts
+    """
+    if instances is not None:
+        return dict((name, instances.get(name, 0)) for name in ref_names)
     instancesDict = dict(zip(ref_names, [0] * len(ref_names)))
     for box_p in pDict.keys():
         instancesDict[box_p] += len(pDict[box_p])
@@ -173,21 +217,16 @@ def countBoxInstances(ref_names, pDict, tDict):
         instancesDict[box_t] += len(tDict[box_t])
     return instancesDict
 
-def mapBoxesToAxis(sorted_ref_names, pDict, tDict):
+def mapBoxesToAxis(sorted_ref_names, pDict, tDict, instances=None):
     """
     yticks_num[name] = count of instances that the box appears in the test set, type int
     yticks_vals[name] = linspace array converted to a list that assigns each instance to a unique ytick value
+    instances: optional box -> count dict from scanTestLog
     """
 
-    # initiate a dict to hold the count of instances and ytick values:
+    # initiate a dict to hold the ytick values, and get the count of instances that the box appears in the test set:
     yticks_vals = {}
-    yticks_num = dict(zip(sorted_ref_names, [0] * len(sorted_ref_names)))
-
-    # update the dict values with the count of instances that the box appears in the test set:
-    for box_p in pDict.keys():
-        yticks_num[box_p] += len(pDict[box_p])
-    for box_t in tDict.keys():
-        yticks_num[box_t] += len(tDict[box_t])
+    yticks_num = countBoxInstances(sorted_ref_names, pDict, tDict, instances)
 
     max_ticks = max(yticks_num.values())
 
@@ -209,8 +248,11 @@ def mapPrereqsToPlotColor(prereqIDs):
     color_map = dict(zip(prereqIDs, color_list))
     return color_map
 
-def plotTimeline(sorted_ref_names, prereqIDs, prereqDict, testDict, time_range):
-    yticks_vals = mapBoxesToAxis(sorted_ref_names, prereqDict, testDict)
+def plotTimeline(sorted_ref_names, prereqIDs, prereqDict, testDict, time_range, instances=None,
+                 filename=TEST_LOG_FILENAME):
+    import matplotlib.pyplot as plt
+
+    yticks_vals = mapBoxesToAxis(sorted_ref_names, prereqDict, testDict, instances)
     color_map = mapPrereqsToPlotColor(prereqIDs)
 
     # format plot
@@ -219,7 +261,7 @@ def plotTimeline(sorted_ref_names, prereqIDs, prereqDict, testDict, time_range):
 
     plt.xlabel('Timezone = UTC')
     plt.grid(b=True, which='major', axis='both', color='#CCCCCC', linestyle='-', zorder=0)
-    plt.title(TEST_LOG_FILENAME.rstrip('.txt'))
+    plt.title(strip_log_extension(filename))
 
     for box in sorted_ref_names:
         y_tick_index = 0
@@ -236,18 +278,25 @@ def plotTimeline(sorted_ref_names, prereqIDs, prereqDict, testDict, time_range):
                 y_tick_index += 1
 
     print color_map
-    plt.savefig(TEST_LOG_FILENAME[0:-4]+'.png')
+    plt.savefig(strip_log_extension(filename) + '.png')
     plt.show()
 
-watch = loadTestLog(TEST_LOG_FILENAME)
-pDict = getSafetySet(watch)
-tDict = getTestSet(watch)
-sorted_names = getBoxList(pDict, tDict)
-prereqIDs = getPrereqIDs(watch)
-time_tuple = getStartStopTime(watch)
-print "Elapsed time: (hh:mm:ss)"
-print (time_tuple[1] - time_tuple[0])
-plotTimeline(sorted_names, prereqIDs, pDict, tDict, time_tuple)
+def main(filename=TEST_LOG_FILENAME):
+    watch = loadTestLog(filename)
+    scan = scanTestLog(watch)
+    pDict = scan['prereqDict']
+    tDict = scan['testDict']
+    sorted_names = getBoxList(pDict, tDict)
+    prereqIDs = scan['prereqIDs']
+    time_tuple = getStartStopTime(watch)
+    print "Elapsed time: (hh:mm:ss)"
+    print (time_tuple[1] - time_tuple[0])
+    plotTimeline(sorted_names, prereqIDs, pDict, tDict, time_tuple, scan['instances'], filename)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plot a timeline of what the scheduler did in a test set log.')
+    parser.add_argument('log', nargs='?', default=TEST_LOG_FILENAME, help='test set log (plain or compressed)')
+    main(parser.parse_args().log)
 """
 
 TODO:
@@ -325,4 +374,4 @@ def updateTestDict(test_dict, running_test_index, datetimes, log):
         test_dict = new_test_dict
 
     return test_dict
-'''
\ No newline at end of file
+'''
\ No newline at end of file
@@ -0,0 +1,163 @@
+__author__ = 'christina'
+
+"""
+Hands a parsed test set to worker processes without pickling it.
+
+publish writes the test set's columnar tables (TestSet.export_columns) plus a small info file to a folder in shared
+memory (/dev/shm where it exists, else the temp folder). Workers are passed only the folder name. attach memory-maps
+the columns read-only, so every worker reads the same pages instead of unpickling its own copy of the parsed dicts.
+String columns are int codes into the name tables (box, test, prereq, result) in the manifest.
+
+(python 2 has no multiprocessing.shared_memory; .npy files on tmpfs opened with mmap_mode='r' give the same zero-copy
+attach, and also work from processes that were not forked from the publisher.)
+
+    with Published(test_set) as dirname:
+        map_shared(render_page, dirname, floors, processes=4)
+
+where render_page(shared, floor) is a module level function that takes a SharedTestSet and one job.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import columnar
+
+SHARED_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+INFO_FILENAME = 'test_set.json'
+
+# test sets attached in this process, by folder
+attached = {}
+
+
+class SharedTestSet(object):
+    def __init__(self, dirname):
+        self.dirname = dirname
+        (self.tables, self.dictionaries) = columnar.load_columns(dirname, mmap_mode='r')
+        with open(os.path.join(dirname, INFO_FILENAME), 'r') as f:
+            self.info = json.load(f)
+        self.TEST_LOG_FILENAME = self.info['filename']
+        self.VERSION = self.info['version']
+        self.TEST_START = self.info['start']  # int ns
+        self.TEST_END = self.info['end']  # int ns
+
+    def get_names(self, dictionary, codes):
+        '''
+        :param dictionary: name table, e.g. 'box'
+        :param codes: int codes of a string column
+        :return: list of names
+        '''
+        names = self.dictionaries[dictionary]
+        return [names[x] for x in codes]
+
+    def get_code(self, dictionary, name):
+        '''
+        :return: int code of name, or -1 if the name is not in the table
+        '''
+        try:
+            return self.dictionaries[dictionary].index(name)
+        except ValueError:
+            return -1
+
+    def get_intervals(self, table, box=None):
+        '''
+        :param table: 'running' or 'safety'
+        :param box: only this box's intervals, default all boxes
+        :return: list of (box, test or prereq, start ns, end ns) tuples
+        '''
+        columns = self.tables[table]
+        name_column = 'test' if table == 'running' else 'prereq'
+        rows = np.arange(len(columns['box']))
+        if box is not None:
+            rows = np.flatnonzero(columns['box'] == self.get_code('box', box))
+        return zip(self.get_names('box', columns['box'][rows]),
+                   self.get_names(name_column, columns[name_column][rows]),
+                   [int(x) for x in columns['start'][rows]],
+                   [int(x) for x in columns['end'][rows]])
+
+    def get_test_count(self, test='all'):
+        '''
+        :return: tuple of arrays (time ns, count) of tests running at each log entry, see TestSet.test_count_dict
+        '''
+        columns = self.tables['counts']
+        rows = columns['test'] == self.get_code('test', test)
+        return columns['time'][rows], columns['count'][rows]
+
+
+def publish(test_set, root=SHARED_ROOT):
+    '''
+    :param test_set: TestSet object
+    :param root: folder to make the shared folder in
+    :return: name of a new folder holding the test set's tables; remove it with release
+    '''
+    dirname = tempfile.mkdtemp(prefix='test_set_', dir=root)
+    try:
+        test_set.export_columns(dirname)
+        with open(os.path.join(dirname, INFO_FILENAME), 'w') as f:
+            json.dump({
+                'filename': test_set.TEST_LOG_FILENAME,
+                'version': test_set.VERSION,
+                'start': columnar.datetime_to_ns(test_set.TEST_START),
+                'end': columnar.datetime_to_ns(test_set.TEST_END)
+            }, f)
+    except:
+        shutil.rmtree(dirname, ignore_errors=True)
+        raise
+    return dirname
+
+
+def attach(dirname):
+    '''
+    :return: SharedTestSet of a folder made by publish, opened once per process
+    '''
+    if dirname not in attached:
+        attached[dirname] = SharedTestSet(dirname)
+    return attached[dirname]
+
+
+def release(dirname):
+    attached.pop(dirname, None)
+    shutil.rmtree(dirname, ignore_errors=True)
+
+
+class Published(object):
+    '''
+    publishes a test set for the duration of a with statement, then removes it
+    '''
+    def __init__(self, test_set, root=SHARED_ROOT):
+        self.test_set = test_set
+        self.root = root
+        self.dirname = None
+
+    def __enter__(self):
+        self.dirname = publish(self.test_set, self.root)
+        return self.dirname
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        release(self.dirname)
+        return False
+
+
+def call_shared(args):
+    (func, dirname, job) = args
+    return func(attach(dirname), job)
+
+
+def map_shared(func, dirname, jobs, processes=None):
+    '''
+    runs func(SharedTestSet, job) for each job in a process pool. only the folder name and the job are pickled.
+    :param func: module level function
+    :param dirname: folder made by publish
+    :param jobs: list of picklable jobs, e.g. floors or figure types
+    :param processes: size of the process pool, default is the number of cores
+    :return: list of results in the order of jobs
+    '''
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(call_shared, [(func, dirname, x) for x in jobs])
+    finally:
+        pool.close()
+        pool.join()
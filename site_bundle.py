@@ -0,0 +1,141 @@
+__author__ = 'christina'
+
+"""
+Loads everything we have for one site in one call: the main test set log, its prereq validity files and its per-box
+test result logs.
+
+The auxiliary files are read by a small pool of threads while the main log is parsed in the calling thread, so the
+wall time is about that of the main log rather than the sum of all files. (This is the python 2 equivalent of an
+asyncio loader with a file-reading executor: file reads and decompression release the GIL.) The files are then
+attached in one go:
+    validity files (e.g. pamf-1472_cdp_fl1.txt) are mapped to prereq ids by prereq_validity.map_validity_files
+    result logs (e.g. pamf-1472_vav2-6_dpc.txt) are mapped to a box and test by match_result_log
+
+    bundle = load_site_bundle('pamf3.txt', site='pamf-1472')
+    bundle['test_set'].plot_test_timeline()
+"""
+import os
+import re
+from multiprocessing.pool import ThreadPool
+
+import prereq_validity
+import test_set_viz_2 as tsv
+from compressed import open_input
+from fleet_summary import detect_version, get_site_name
+from point_join import normalize_ref_name
+
+READ_THREADS = 4
+NAME_TOKENS = re.compile(r'[ _\-.]+')
+NUMBERS = re.compile(r'\d+')
+# TestSet version: result log name token: test type code, for names that don't use the code itself
+TEST_ALIASES = {
+    'v1.0': {'cool': 'ZSA'},
+    'v1.1': {}  # v1.1 calls the test COOL itself
+}
+
+
+def read_text(filename):
+    with open_input(filename) as f:
+        return f.read()
+
+
+def find_aux_files(log_filename, site=None):
+    '''
+    :param site: file name prefix of the site's auxiliary files, default the log's site name (see
+        fleet_summary.get_site_name)
+    :return: sorted list of files next to the log that start with '<site>_'
+    '''
+    folder = os.path.dirname(os.path.abspath(log_filename))
+    if site is None:
+        site = get_site_name(log_filename)
+    return sorted(os.path.join(folder, x) for x in os.listdir(folder)
+                  if x.startswith(site + '_') and os.path.isfile(os.path.join(folder, x)))
+
+
+def match_result_log(test_set, filename, site=None):
+    '''
+    matches a result log named '<site>_<box>_<test>', e.g. pamf-1472_vav2-6_dpc.txt, to a scheduled box and test:
+    the box whose ref name ends in the same numbers (#pdc_vav_2_6_VAVR_site_97) and its test of that type (VVR_DPC)
+    :param site: the file name prefix, which may itself contain '_' (e.g. vsp_hq2). default: up to the first '_'
+    :return: tuple (box, test), or (None, None) if there is no single match
+    '''
+    name = get_site_name(filename)
+    if site is not None and name.startswith(site + '_'):
+        name = name[len(site) + 1:]
+    else:
+        name = name.partition('_')[2]
+    tokens = [x for x in NAME_TOKENS.split(name.lower()) if x]
+    if not tokens:
+        return None, None
+    code = TEST_ALIASES.get(test_set.VERSION, {}).get(tokens[-1], tokens[-1].upper())
+    numbers = NUMBERS.findall(' '.join(tokens[:-1]))
+    if not numbers:
+        return None, None
+
+    matches = []
+    for box in test_set.get_scheduled_box_list():
+        box_numbers = NUMBERS.findall(normalize_ref_name(box))
+        if box_numbers[-len(numbers):] != numbers:
+            continue
+        for test in test_set.test_set_dict[box].keys():
+            if test.upper() == code or test.upper().split('_')[-1] == code:
+                matches.append((box, test))
+    if len(matches) != 1:
+        return None, None
+    return matches[0]
+
+
+def load_site_bundle(log_filename, version=None, site=None, aux_files=None, threads=READ_THREADS):
+    '''
+    :param log_filename: main test set log (plain or compressed)
+    :param version: TestSet version, detected from the log by default
+    :param site: file name prefix of the auxiliary files, default the log's site name, see find_aux_files
+    :param aux_files: list of validity and result log files, default find_aux_files
+    :param threads: auxiliary files read at once
+    :return: dict with keys:
+        test_set: TestSet with validity and results attached
+        validity: list of (filename, prereq id, how it matched)
+        results: list of (filename, box, test)
+        skipped: auxiliary files that could not be matched
+    '''
+    if version is None:
+        version = detect_version(log_filename)
+        if version is None:
+            raise ValueError('Not a test set log (no "to run = " entry of a known version): ' + log_filename)
+    if site is None:
+        site = get_site_name(log_filename)
+    if aux_files is None:
+        aux_files = find_aux_files(log_filename, site)
+    pool = ThreadPool(max(1, min(threads, len(aux_files))))
+    pending = [(x, pool.apply_async(read_text, (x,))) for x in aux_files]
+    pool.close()
+    try:
+        # parse the main log while the auxiliary files are being read
+        test_set = tsv.TestSet(log_filename, version)
+        texts = dict((x, result.get()) for (x, result) in pending)
+    finally:
+        pool.join()
+
+    validity_files = [x for x in aux_files if prereq_validity.get_name_tokens(x)[0] is not None]
+    validity = prereq_validity.map_validity_files(test_set, validity_files)
+    for (filename, prereq_ID, how) in validity:
+        (COV_datetime, values) = prereq_validity.to_validity_lists(*prereq_validity.parse_validity_text(texts[filename]))
+        test_set.set_prereq_validity(prereq_ID, COV_datetime, values)
+
+    results = []
+    mapped = set(x[0] for x in validity)
+    for filename in aux_files:
+        if filename in mapped or not any(x in texts[filename] for x in test_set.TEST_MESSAGE):
+            continue
+        (box, test) = match_result_log(test_set, filename, site)
+        if box is not None:
+            test_set.set_test_result_log(texts[filename].splitlines(), box, test)
+            results.append((filename, box, test))
+            mapped.add(filename)
+
+    return {
+        'test_set': test_set,
+        'validity': validity,
+        'results': results,
+        'skipped': [x for x in aux_files if x not in mapped]
+    }
@@ -24,7 +24,6 @@ User has to define the text file type so that the class can tell which methods a
 
 """
 import datetime as dt
-import matplotlib.pyplot as plt
 import numpy as np
 
 RESULT = 'result'
@@ -329,6 +328,7 @@ class TestSet(object):
         sorted_ref_names = self.get_box_list(safety_set_dict, testDict)
         yticks_vals = self.map_boxes_to_y_axis(sorted_ref_names, safety_set_dict, testDict)
         color_map = self.map_items_to_plot_color(prereq_IDs,self.PREREQ_COLORS)
+        import matplotlib.pyplot as plt
 
         # format plot
         plt.figure()
@@ -375,6 +375,7 @@ class TestSet(object):
         test_list = self.get_test_list()
         countDict = self.get_test_count()
         color_map = self.map_items_to_plot_color(test_list, self.TEST_COLORS)
+        import matplotlib.pyplot as plt
 
         plt.plot(countDict['all'][0], countDict['all'][1], 'k-,', linewidth=3.0)
         text_label_coords = []
@@ -455,22 +456,23 @@ class TestSet(object):
 
 
 
-some_test = TestSet("pamf-1472.txt", "v1.0")  # test class initiation
-safety_set = some_test.get_safety_set()
-# some_test.set_prereq_validity_data('pamf-1472_cdp_fl1.txt', 'ColdDuctPressure 3678')
-# some_test.set_prereq_validity_data('pamf-1472_cdp_fl2.txt', 'ColdDuctPressure 3674')
-#some_test.set_prereq_validity_data('pamf-1472_hwp.txt', 'HotWaterPressure 3676')
-#some_test.set_prereq_validity_data('pamf-1472_hwt.txt', 'HotWaterTemperature 3677')
-#some_test.set_prereq_validity_data('pamf-1472_cdt_fl1.txt', 'ColdDuctTemperature 3679')
-# some_test.set_prereq_validity_data('pamf-1472_cdt_fl2.txt', 'ColdDuctTemperature 3675')
-# some_test.plot_test_timeline()
-test_set = some_test.get_test_set()  # test test set parsing
-# print some_test.get_box_list(safety_set, test_set)
-# some_test.plot_test_count()
-some_test.set_test_result('pamf-1472_vav2-6_dpc.txt', '#pdc_vav_2_6_VAVR_site_97', 'VVR_DPC')
-some_test.set_test_result('pamf-1472_vav2-6_cool.txt', '#pdc_vav_2_6_VAVR_site_97', 'VVR_ZSA')
-some_test.set_test_result('pamf-1472_vav1-12_afs.txt', '#pdc_vav_1_12_VAVR_site_97', 'VVR_AFS')
-some_test.plot_test_timeline()
+if __name__ == '__main__':
+    some_test = TestSet("pamf-1472.txt", "v1.0")  # test class initiation
+    safety_set = some_test.get_safety_set()
+    # some_test.set_prereq_validity_data('pamf-1472_cdp_fl1.txt', 'ColdDuctPressure 3678')
+    # some_test.set_prereq_validity_data('pamf-1472_cdp_fl2.txt', 'ColdDuctPressure 3674')
+    #some_test.set_prereq_validity_data('pamf-1472_hwp.txt', 'HotWaterPressure 3676')
+    #some_test.set_prereq_validity_data('pamf-1472_hwt.txt', 'HotWaterTemperature 3677')
+    #some_test.set_prereq_validity_data('pamf-1472_cdt_fl1.txt', 'ColdDuctTemperature 3679')
+    # some_test.set_prereq_validity_data('pamf-1472_cdt_fl2.txt', 'ColdDuctTemperature 3675')
+    # some_test.plot_test_timeline()
+    test_set = some_test.get_test_set()  # test test set parsing
+    # print some_test.get_box_list(safety_set, test_set)
+    # some_test.plot_test_count()
+    some_test.set_test_result('pamf-1472_vav2-6_dpc.txt', '#pdc_vav_2_6_VAVR_site_97', 'VVR_DPC')
+    some_test.set_test_result('pamf-1472_vav2-6_cool.txt', '#pdc_vav_2_6_VAVR_site_97', 'VVR_ZSA')
+    some_test.set_test_result('pamf-1472_vav1-12_afs.txt', '#pdc_vav_1_12_VAVR_site_97', 'VVR_AFS')
+    some_test.plot_test_timeline()
 """
 print some_test.prereq_validity_data
 print some_test  # test pretty print
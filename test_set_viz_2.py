@@ -22,10 +22,19 @@ return None or [].
 
 User has to define the text file type so that the class can tell which methods apply.
 
+Importing this module does no work and does not import matplotlib; pyplot is imported by the plot methods, so
+parse-only users (fleet_summary, warehouse, worker processes) start quickly.
+
 """
+import bisect
 import datetime as dt
-import matplotlib.pyplot as plt
+import os
 import numpy as np
+import columnar
+import compressed
+import occupancy
+import prereq_validity
+import render_cache
 
 RESULT = 'result'
 TIME = 'time'
@@ -106,11 +115,11 @@ class TestSet(object):
         self.test_count_dict = {}
         self.test_set_dict = {}
         self.safety_set_dict = {}
+        self.occupancy_dict = {}  # grid step seconds: OccupancySet, built on demand by get_occupancy
         self.prereq_validity_data = {}
         self.test_result_dict = {}
 
-        with open(self.TEST_LOG_FILENAME,'r',0) as f:
-            self.test_log_list = f.read().splitlines()
+        self.test_log_list = compressed.read_lines(self.TEST_LOG_FILENAME)  # plain or gzip/bz2/xz/zstd
 
         # using built-in method partition instead of split lets us ignore any occurences of the log line separator that exist in the line message
         (start, sep, rest) = self.test_log_list[0].partition(self.LOG_LINE_SEPARATOR)[-1].partition(self.LOG_LINE_SEPARATOR)
@@ -149,7 +158,14 @@ class TestSet(object):
 
 
     def __str__(self):
-        return self.VERSION + " Test Set: " + self.TEST_LOG_FILENAME.rstrip('.txt')
+        return self.VERSION + " Test Set: " + self.get_log_name()
+
+    def get_log_name(self):
+        '''
+        :return: name of the log file without its folder, compression extension or .txt, e.g. valencia-153.txt.gz ->
+            valencia-153. used in figure names and titles
+        '''
+        return compressed.strip_log_extension(os.path.basename(self.TEST_LOG_FILENAME))
 
     def read_locked_zones(self, line_message):
         if line_message.lstrip(self.LOCKED) not in self.locked_zone_list:
@@ -285,9 +301,11 @@ class TestSet(object):
         color_map = dict(zip(items, color_list))
         return color_map
 
-    def plot_test_timeline(self):
+    def plot_test_timeline(self, show=True):
         '''
         plots a timeline of when each box was testing or serving as safety set member
+        :param show: show the figure. if False (batch mode), rendering is skipped when the saved figure is up to date
+            with the test set and its validity/result overlays (see render_cache.py)
         :return:
         color_map: a dict of prereq_id as keys and color as values
         '''
@@ -302,14 +320,22 @@ class TestSet(object):
                      for y in self.safety_set_dict[x].keys()]):
             self.map_yaxis(sorted_ref_names)
 
-        # format plot:
         color_map = self.map_items_to_plot_color(self.get_prereq_IDs(), COLORS_ANY)
+        figName = 'timeline_' + self.get_log_name() + '.png'
+        cache = render_cache.get_render_cache(os.path.dirname(os.path.abspath(figName)))
+        model = [self.TEST_LOG_FILENAME, self.TEST_START, self.TEST_END, self.test_set_dict, self.safety_set_dict]
+        key = render_cache.get_render_key('timeline', model, [color_map, self.RESULT_FORMAT])
+        if not show and cache.is_fresh(figName, key):
+            return color_map
+        import matplotlib.pyplot as plt
+
+        # format plot:
         plt.yticks(range(1, 1+ len(sorted_ref_names)), sorted_ref_names)
         plt.ylim(0, 2+ len(sorted_ref_names))
         plt.xlim(self.TEST_START, self.TEST_END + dt.timedelta(minutes=15.0))
         plt.xlabel('Timezone = UTC')
         plt.grid(b=True, which='major', axis='both', color='#CCCCCC', linestyle='-', zorder=0)
-        plt.title('Test Set Timeline: ' + self.TEST_LOG_FILENAME.rstrip('.txt'))
+        plt.title('Test Set Timeline: ' + self.get_log_name())
 
         for box in sorted_ref_names:
             # Plot all instances of this box acting as a safety set member:
@@ -358,8 +384,10 @@ class TestSet(object):
                                  color='#ffcf12', marker='^', markersize=5.0)
                         plt.text(self.TEST_END, self.test_set_dict[box][test][VALUE][0], test, fontsize=7)
 
-        plt.savefig('timeline_' + self.TEST_LOG_FILENAME.rstrip('.txt') + '.png')
-        plt.show()
+        plt.savefig(figName)
+        cache.record(figName, key)
+        if show:
+            plt.show()
         plt.clf()
         return color_map
 
@@ -401,12 +429,21 @@ class TestSet(object):
                     instance_counter += 1
                     self.safety_set_dict[box][prereq][VALUE] = [instance_counter * step + box_counter + Y_TICK_LO]
 
-    def plot_test_count(self):
+    def plot_test_count(self, show=True):
+        '''
+        :param show: show the figure. if False (batch mode), rendering is skipped when the saved figure is up to date
+        '''
         # tests_only = self.get_scheduled_test_list()
         # tests_only.remove('all')
         # color_map = self.map_items_to_plot_color(tests_only, COLORS)
         color_map = self.map_items_to_plot_color(self.get_scheduled_test_list(), COLORS_ANY)
-
+        figName = 'test count_' + self.get_log_name() + '.png'
+        cache = render_cache.get_render_cache(os.path.dirname(os.path.abspath(figName)))
+        key = render_cache.get_render_key('test count', [self.TEST_LOG_FILENAME, self.test_count_dict],
+                                          [color_map, MAX_SIMUL_TESTS])
+        if not show and cache.is_fresh(figName, key):
+            return
+        import matplotlib.pyplot as plt
 
         text_label_coords = []
 
@@ -436,9 +473,11 @@ class TestSet(object):
 
         # format + save plot:
         plt.ylim(0, MAX_SIMUL_TESTS + 2)
-        plt.title('Test Count: ' + self.TEST_LOG_FILENAME.rstrip('.txt'))
-        plt.savefig('test count_' + self.TEST_LOG_FILENAME.rstrip('.txt') + '.png')
-        plt.show()
+        plt.title('Test Count: ' + self.get_log_name())
+        plt.savefig(figName)
+        cache.record(figName, key)
+        if show:
+            plt.show()
         plt.clf()
 
     def set_prereq_validity_data(self, filename, prereq_ID):
@@ -451,30 +490,194 @@ class TestSet(object):
         :param prereq_ID:
         :return:
         """
-        prereq_IDs = self.get_prereq_IDs()
-        if prereq_ID not in prereq_IDs:
+        if prereq_ID not in self.get_prereq_IDs():
             raise ValueError('PrereqID not recognized')
 
-        with open(filename,'r',0) as f:
-            prereq_log_list = f.read().splitlines()
+        (COV_datetime, validity) = prereq_validity.to_validity_lists(*prereq_validity.parse_validity_file(filename))
+        self.set_prereq_validity(prereq_ID, COV_datetime, validity)
 
-        validity = [int(x) for x in prereq_log_list if x == '0' or x == '1']
-        COV_datetime = [dt.datetime.strptime(x.rstrip('"').lstrip('"')[:-5], self.PREREQ_TIME_FORMAT)
-                        for x in [x for x in prereq_log_list if 'Z' in x]]
+    def set_prereq_validity(self, prereq_ID, COV_datetime, validity):
+        """
+        Associates already parsed prereq validity to a prereq ID, e.g. as evaluated from point data by
+        prereq_validity.evaluate_prereqs.
+        :param prereq_ID:
+        :param COV_datetime: sorted list of datetimes at which validity changed
+        :param validity: list of 0 or 1, the validity from each COV_datetime on
+        :return:
+        """
+        if prereq_ID not in self.get_prereq_IDs():
+            raise ValueError('PrereqID not recognized')
 
+        # a safety set time is valid if it is strictly after a change to 1 and strictly before the next change
         for box in self.safety_set_dict.keys():
             if prereq_ID in self.safety_set_dict[box].keys():
-                self.safety_set_dict[box][prereq_ID][VALID_TIME] = []
-
-                for i in range(len(validity)):
-                    if validity[i] == 1 and i+1 < len(validity):
-                        self.safety_set_dict[box][prereq_ID][VALID_TIME].extend(
-                            [x for x in self.safety_set_dict[box][prereq_ID][TIME]
-                             if COV_datetime[i] < x < COV_datetime[i+1]])
-                    elif validity[i] == 1 and i+1 >= len(validity):
-                        self.safety_set_dict[box][prereq_ID][VALID_TIME].extend(
-                            [x for x in self.safety_set_dict[box][prereq_ID][TIME]
-                             if COV_datetime[i] < x])
+                valid_times = []
+                for x in self.safety_set_dict[box][prereq_ID][TIME]:
+                    i = bisect.bisect_left(COV_datetime, x)  # COV_datetime[i - 1] < x <= COV_datetime[i]
+                    if i > 0 and validity[i - 1] == 1 and (i == len(COV_datetime) or x < COV_datetime[i]):
+                        valid_times.append(x)
+                self.safety_set_dict[box][prereq_ID][VALID_TIME] = valid_times
+
+    def find_intervals(self, times, sample_times):
+        """
+        Turns the list of log times at which something was seen (e.g. a box running a test) into (start, end) intervals.
+        An interval ends at the next sample time where it was no longer seen, or at TEST_END if it was still seen at the
+        last sample.
+        :param times: list of datetimes at which the item was seen
+        :param sample_times: sorted list of unique datetimes of all log entries of the same kind
+        :return: list of (start, end) datetime tuples
+        """
+        seen = set(times)
+        intervals = []
+        start = None
+        for sample in sample_times:
+            if sample in seen and start is None:
+                start = sample
+            elif sample not in seen and start is not None:
+                intervals.append((start, sample))
+                start = None
+        if start is not None:
+            intervals.append((start, self.TEST_END))
+        return intervals
+
+    def get_running_intervals(self):
+        """
+        :return: sorted list of (box, test, start, end) tuples, one per interval during which a box was running a test
+        """
+        try:
+            running_times = sorted(set(self.test_count_dict['all'][TIME][1:]))
+        except KeyError:  # no tests were scheduled
+            running_times = []
+        running_rows = []
+        for box in sorted(self.test_set_dict.keys()):
+            for test in sorted(self.test_set_dict[box].keys()):
+                for (start, end) in self.find_intervals(self.test_set_dict[box][test][TIME], running_times):
+                    running_rows.append((box, test, start, end))
+        return running_rows
+
+    def get_safety_intervals(self):
+        """
+        :return: sorted list of (box, prereq, start, end) tuples, one per interval during which a box was a safety set
+            member for a prereq
+        """
+        safety_times = sorted({x for box in self.safety_set_dict.keys()
+                               for prereq in self.safety_set_dict[box].keys()
+                               for x in self.safety_set_dict[box][prereq][TIME]})
+        safety_rows = []
+        for box in sorted(self.safety_set_dict.keys()):
+            for prereq in sorted(self.safety_set_dict[box].keys()):
+                for (start, end) in self.find_intervals(self.safety_set_dict[box][prereq][TIME], safety_times):
+                    safety_rows.append((box, prereq, start, end))
+        return safety_rows
+
+    def get_occupancy(self, step_seconds=occupancy.STEP_SECONDS):
+        """
+        Packed box x time bitmaps of when each box was running each test type and was in each prereq's safety set, on
+        a grid of step_seconds (see occupancy.py). Built on the first call and kept for later calls.
+        :return: OccupancySet
+        """
+        if step_seconds not in self.occupancy_dict:
+            self.occupancy_dict[step_seconds] = occupancy.build_occupancy(self, step_seconds)
+        return self.occupancy_dict[step_seconds]
+
+    def export_columns(self, dirname):
+        """
+        Exports the parsed test set as typed columnar tables (see columnar.py) so downstream analysis can memory-map
+        them instead of re-parsing the log text. Box, test, prereq and result columns are dictionary encoded, times are
+        int64 ns since the epoch.
+        tables:
+            running: box, test, start, end -- intervals when a box was running a test
+            safety: box, prereq, start, end -- intervals when a box was a safety set member for a prereq
+            scheduled: box, test, time, ran -- tests from "to run = ", ran == 0 means could not run
+            zones: box, locked -- zones found by the locked zone avoider
+            validity: box, prereq, time -- safety set times when the prereq was valid (set_prereq_validity_data)
+            results: box, test, time, result -- final test results (set_test_result)
+            counts: test, time, count -- tests running at each log entry, 'all' and by test (test_count_dict)
+        :param dirname: folder to write the tables to
+        :return: path of the manifest
+        """
+        boxes = columnar.Dictionary(self.get_sorted_box_list())
+        tests = columnar.Dictionary()
+        prereqs = columnar.Dictionary(sorted(self.get_prereq_IDs()))
+        results = columnar.Dictionary()
+
+        running_rows = self.get_running_intervals()
+        scheduled_rows = []
+        result_rows = []
+        try:
+            scheduled_time = self.test_count_dict['all'][TIME][0]
+        except KeyError:  # no tests were scheduled
+            scheduled_time = self.TEST_START
+        for box in sorted(self.test_set_dict.keys()):
+            for test in sorted(self.test_set_dict[box].keys()):
+                test_data = self.test_set_dict[box][test]
+                scheduled_rows.append((box, test, scheduled_time, len(test_data[TIME]) > 0))
+                if RESULT_TIME in test_data:
+                    result_rows.append((box, test, test_data[RESULT_TIME], test_data[RESULT_VALUE]))
+
+        safety_rows = self.get_safety_intervals()
+        validity_rows = []
+        for box in sorted(self.safety_set_dict.keys()):
+            for prereq in sorted(self.safety_set_dict[box].keys()):
+                prereq_data = self.safety_set_dict[box][prereq]
+                for valid_time in prereq_data.get(VALID_TIME, []):
+                    validity_rows.append((box, prereq, valid_time))
+
+        zone_rows = [(x, False) for x in self.unlocked_zone_list] + [(x, True) for x in self.locked_zone_list]
+        count_rows = [(test, self.test_count_dict[test][TIME][i], self.test_count_dict[test][VALUE][i])
+                      for test in sorted(self.test_count_dict.keys())
+                      for i in range(len(self.test_count_dict[test][TIME]))]
+
+        def column(rows, i):
+            return [x[i] for x in rows]
+
+        tables = {
+            'running': [
+                ('box', boxes.encode_list(column(running_rows, 0))),
+                ('test', tests.encode_list(column(running_rows, 1))),
+                ('start', columnar.datetimes_to_ns(column(running_rows, 2))),
+                ('end', columnar.datetimes_to_ns(column(running_rows, 3)))
+            ],
+            'safety': [
+                ('box', boxes.encode_list(column(safety_rows, 0))),
+                ('prereq', prereqs.encode_list(column(safety_rows, 1))),
+                ('start', columnar.datetimes_to_ns(column(safety_rows, 2))),
+                ('end', columnar.datetimes_to_ns(column(safety_rows, 3)))
+            ],
+            'scheduled': [
+                ('box', boxes.encode_list(column(scheduled_rows, 0))),
+                ('test', tests.encode_list(column(scheduled_rows, 1))),
+                ('time', columnar.datetimes_to_ns(column(scheduled_rows, 2))),
+                ('ran', np.array(column(scheduled_rows, 3), dtype=np.bool_))
+            ],
+            'zones': [
+                ('box', boxes.encode_list(column(zone_rows, 0))),
+                ('locked', np.array(column(zone_rows, 1), dtype=np.bool_))
+            ],
+            'validity': [
+                ('box', boxes.encode_list(column(validity_rows, 0))),
+                ('prereq', prereqs.encode_list(column(validity_rows, 1))),
+                ('time', columnar.datetimes_to_ns(column(validity_rows, 2)))
+            ],
+            'results': [
+                ('box', boxes.encode_list(column(result_rows, 0))),
+                ('test', tests.encode_list(column(result_rows, 1))),
+                ('time', columnar.datetimes_to_ns(column(result_rows, 2))),
+                ('result', results.encode_list(column(result_rows, 3)))
+            ],
+            'counts': [
+                ('test', tests.encode_list(column(count_rows, 0))),
+                ('time', columnar.datetimes_to_ns(column(count_rows, 1))),
+                ('count', np.array(column(count_rows, 2), dtype=np.int32))
+            ]
+        }
+        dictionaries = {
+            'box': boxes.names,
+            'test': tests.names,
+            'prereq': prereqs.names,
+            'result': results.names
+        }
+        return columnar.write_columns(dirname, tables, dictionaries)
 
     def set_test_result(self, filename, box, test):
         """
@@ -488,14 +691,21 @@ class TestSet(object):
         :return:
         """
 
+        self.set_test_result_log(compressed.read_lines(filename), box, test)
+
+    def set_test_result_log(self, test_log, box, test):
+        """
+        set_test_result for a test result log that was already read, e.g. by site_bundle.load_site_bundle
+        :param test_log: list of the lines of the log
+        :param box:
+        :param test:
+        :return:
+        """
         if box not in self.get_scheduled_box_list():
             raise ValueError('Box ref name not recognized')
         elif test not in self.get_scheduled_test_list():
             raise ValueError('Test type not recognized')
 
-        with open(filename,'r',0) as f:
-            test_log = f.read().splitlines()
-
         result_entry = [x for x in test_log if self.TEST_MESSAGE[0] in x or self.TEST_MESSAGE[1] in x]
         result_segments = result_entry[0].split(' - ')
 
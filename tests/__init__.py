@@ -0,0 +1,5 @@
+try:
+    import matplotlib
+    matplotlib.use('Agg')  # headless, before any test imports pyplot
+except ImportError:
+    pass
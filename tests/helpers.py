@@ -0,0 +1,70 @@
+__author__ = 'christina'
+
+"""
+Small synthetic test set logs and folders for the unit tests.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+STATE_MACHINE = {
+    'v1.0': "2set CXTest state machine running ",
+    'v1.1': "2SCXTest running "
+}
+MODELED_EQ = {
+    'v1.0': "<ModeledEquipment: ",
+    'v1.1': "<Equipment: "
+}
+BOX_A = '#pdc_vav_2_6_VAVR_site_97'
+BOX_B = '#pdc_vav_2_7_VAVR_site_97'
+
+
+def make_log_lines(version='v1.0', tests=(('VVR_DPC', BOX_A), ('VVR_HWV', BOX_B)), prereq='ColdDuctPressure 137'):
+    '''
+    :return: list of lines of a short test set log: both tests are scheduled at 19:32, the first test runs from 19:33
+        to 19:40 while the second test's box is in prereq's safety set, the second test runs from 19:40 to 19:50
+    '''
+    machine = STATE_MACHINE[version]
+    equipment = MODELED_EQ[version]
+
+    def running(items):
+        return '[' + ', '.join(machine + test + ' on ' + box for (test, box) in items) + ']'
+
+    def safety(boxes):
+        return '{<PrereqMachine: ' + prereq + '>: [' + ', '.join(equipment + x + '>' for x in boxes) + ']}'
+
+    messages = [
+        ('19:31:05', 'Creating Prerequisite State Machines.'),
+        ('19:31:48', 'Found unlocked zone: ' + tests[0][1]),
+        ('19:32:00', 'to run = ' + running(tests)),
+        ('19:32:00', 'running = []'),
+        ('19:33:00', 'running = ' + running(tests[:1])),
+        ('19:33:00', safety([tests[1][1]])),
+        ('19:40:00', 'running = ' + running(tests[1:])),
+        ('19:40:00', safety([])),
+        ('19:50:00', 'running = []'),
+        ('19:55:00', 'Test set complete.'),
+        ('19:55:14', 'Sending Test Set Finished Email')
+    ]
+    return ['%d - 2015-11-13 %s+00:00 - %s' % (i, messages[i][0], messages[i][1]) for i in range(len(messages))]
+
+
+def write_log(filename, version='v1.0', **kwargs):
+    with open(filename, 'w') as f:
+        f.write('\n'.join(make_log_lines(version, **kwargs)) + '\n')
+    return filename
+
+
+class TempDirTestCase(unittest.TestCase):
+    '''
+    test case with a temporary folder in self.dirname, removed after each test
+    '''
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp(prefix='autocx_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+    def path(self, *names):
+        return os.path.join(self.dirname, *names)
@@ -0,0 +1,5 @@
+"""
+SQLite stand-in for the django apps export_csv reads (bbdata and auto_cx_I), with only the models, fields and
+relations the exporter uses. Point-path samples are stored in a table and returned by PointPath.get_series as a
+pandas series, like the real bbdata models return them.
+"""
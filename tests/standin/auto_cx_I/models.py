@@ -0,0 +1,39 @@
+from django.db import models
+
+from bbdata.models import DataCollectionRequest, Equipment, PointPath
+
+TEST_PASSED = 1
+TEST_FAILED = 2
+TEST_COULD_NOT_RUN = 3
+
+
+class CXTestSetRunner(models.Model):
+    run_at = models.DateTimeField()
+
+
+class CXEquipment(models.Model):
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE)
+
+
+class Prerequisite(models.Model):
+    name = models.CharField(max_length=200)
+    dcr = models.ForeignKey(DataCollectionRequest, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return self.name
+
+
+class CXTest(models.Model):
+    test_set = models.ForeignKey(CXTestSetRunner, related_name='tests', on_delete=models.CASCADE)
+    test_type = models.CharField(max_length=20)
+    result = models.IntegerField()
+    equipment = models.ForeignKey(CXEquipment, on_delete=models.CASCADE)
+    dcr = models.ForeignKey(DataCollectionRequest, on_delete=models.CASCADE)
+    prerequisites = models.ManyToManyField(Prerequisite)
+    run_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+
+
+class LockPSR(models.Model):
+    test = models.ForeignKey(CXTest, related_name='lock_psrs', on_delete=models.CASCADE)
+    point_path = models.ForeignKey(PointPath, on_delete=models.CASCADE)
@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class Equipment(models.Model):
+    reference_name = models.CharField(max_length=200)
+
+
+class PointPath(models.Model):
+    name = models.CharField(max_length=400)
+
+    def get_series(self, start, end):
+        '''
+        :return: pandas series of the samples from start through end (end None: no limit), indexed by UTC time
+        '''
+        import pandas as pd
+        samples = self.samples.filter(time__gte=start)
+        if end is not None:
+            samples = samples.filter(time__lte=end)
+        samples = list(samples.order_by('time'))
+        return pd.Series([x.value for x in samples],
+                         index=pd.to_datetime([x.time for x in samples], utc=True), dtype=float)
+
+
+class Sample(models.Model):
+    point_path = models.ForeignKey(PointPath, related_name='samples', on_delete=models.CASCADE)
+    time = models.DateTimeField()
+    value = models.FloatField()
+
+
+class DataCollectionRequest(models.Model):
+    point_paths = models.ManyToManyField(PointPath)
+    start = models.DateTimeField()
+    end = models.DateTimeField(null=True)
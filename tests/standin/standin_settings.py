@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+SECRET_KEY = 'stand-in'
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        # a file, not ':memory:', so export_csv's fetch threads see the same database
+        'NAME': os.environ.get('STANDIN_DB', os.path.join(tempfile.gettempdir(), 'autocx_standin.sqlite'))
+    }
+}
+INSTALLED_APPS = ['bbdata', 'auto_cx_I']
+USE_TZ = True
+TIME_ZONE = 'UTC'
@@ -0,0 +1,89 @@
+__author__ = 'christina'
+
+import os
+import re
+import unittest
+
+import batch_render
+import render_cache
+from tests.helpers import TempDirTestCase
+
+DAMPER = '1234__#pdc_vav_2_6_VAVR_site_97_measure_damper_opening_real.csv'
+AIRFLOW = '1235__#pdc_vav_2_7_VAVR_site_97_measure_mdot_real.csv'
+OLD_MTIME = 1000000000
+
+
+class ParseSpecTest(unittest.TestCase):
+    def test_parts(self):
+        self.assertEqual((['measure_mdot_real'], [], [], []), batch_render.parse_spec('measure_mdot_real'))
+        self.assertEqual((['measure_mdot_real'], ['#pdc_vav_2_6', '#pdc_vav_2_7'], [], []),
+                         batch_render.parse_spec('measure_mdot_real; #pdc_vav_2_6, #pdc_vav_2_7'))
+        self.assertEqual(([], ['measure_hv_real'], [], ['HotWaterTemperature']),
+                         batch_render.parse_spec(';measure_hv_real;;HotWaterTemperature'))
+
+    def test_bad_specs(self):
+        self.assertRaises(ValueError, batch_render.parse_spec, '#pdc_vav_2_6')
+        self.assertRaises(ValueError, batch_render.parse_spec, ';;measure_mdot_real')  # prereqs don't count
+        self.assertRaises(ValueError, batch_render.parse_spec, 'measure_mdot_real;;;;')
+
+
+class FigureNameTest(unittest.TestCase):
+    def test_deterministic(self):
+        name = batch_render.get_figure_name('C:/data/test_csv_data_851', 'measure_mdot_real;#pdc_vav_2_6')
+        self.assertTrue(re.match(r'^test_csv_data_851__measure_mdot_real_pdc_vav_2_6_[0-9a-f]{8}\.png$', name))
+        self.assertEqual(name, batch_render.get_figure_name('C:/data/test_csv_data_851/',
+                                                            'measure_mdot_real;#pdc_vav_2_6'))
+
+    def test_specs_with_same_keywords_differ(self):
+        # the hash keeps specs apart that only differ in separators
+        self.assertNotEqual(batch_render.get_figure_name('data', 'measure_mdot_real;#pdc_vav_2_6'),
+                            batch_render.get_figure_name('data', 'measure_mdot_real,#pdc_vav_2_6'))
+
+
+class RenderAllTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.folder = self.path('test_csv_data_851')
+        self.out_dir = self.path('figures')
+        os.mkdir(self.folder)
+        self.write(DAMPER, range(30, 45))
+        self.write(AIRFLOW, range(30, 45))
+        self.specs = ['measure_damper_opening_real', 'measure_mdot_real']
+
+    def tearDown(self):
+        render_cache.caches.clear()
+        TempDirTestCase.tearDown(self)
+
+    def write(self, name, minutes):
+        with open(os.path.join(self.folder, name), 'w') as f:
+            for minute in minutes:
+                f.write('2015-11-13 19:%02d:00,%d\n' % (minute, minute))
+
+    def render(self):
+        figures = batch_render.render_all(self.folder, self.specs, self.out_dir, processes=1)
+        for figName in figures.values():
+            os.utime(figName, (OLD_MTIME, OLD_MTIME))  # so a re-render shows up as a new mtime
+        return figures
+
+    def test_skip_if_fresh(self):
+        figures = self.render()
+        self.assertEqual(sorted(self.specs), sorted(figures.keys()))
+        for spec in self.specs:
+            self.assertEqual(os.path.join(self.out_dir, batch_render.get_figure_name(self.folder, spec)),
+                             figures[spec])
+        render_cache.caches.clear()  # read the saved cache, as a new run would
+        self.assertEqual(figures, batch_render.render_all(self.folder, self.specs, self.out_dir, processes=1))
+        for figName in figures.values():
+            self.assertEqual(OLD_MTIME, os.path.getmtime(figName))
+
+    def test_changed_file_rerendered(self):
+        figures = self.render()
+        self.write(AIRFLOW, range(30, 50))
+        batch_render.render_all(self.folder, self.specs, self.out_dir, processes=1)
+        self.assertEqual(OLD_MTIME, os.path.getmtime(figures['measure_damper_opening_real']))
+        self.assertNotEqual(OLD_MTIME, os.path.getmtime(figures['measure_mdot_real']))
+
+    def test_no_data(self):
+        figures = batch_render.render_all(self.folder, ['measure_hv_real'], self.out_dir, processes=1)
+        self.assertEqual({'measure_hv_real': None}, figures)
+        self.assertEqual([], [x for x in os.listdir(self.out_dir) if x.endswith('.png')])
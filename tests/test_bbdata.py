@@ -0,0 +1,129 @@
+__author__ = 'christina'
+
+import datetime as dt
+import os
+
+import bbdata
+import point_store
+from tests.helpers import TempDirTestCase
+
+NAME = '1234__#pdc_vav_2_6_VAVR_site_97_measure_damper_opening_real'
+
+
+class LoadFilesTest(TempDirTestCase):
+    def write(self, name, text):
+        with open(self.path(name), 'w') as f:
+            f.write(text)
+        return self.path(name)
+
+    def test_unparseable_files_are_skipped(self):
+        good = self.write(NAME + '.csv', '2015-11-13 19:30:00+00:00,1\n2015-11-13 19:31:00+00:00,2\n')
+        bad = [
+            self.write('blank.csv', '  \n\n'),
+            self.write('header.csv', 'time,value\n'),
+            self.write('timestamp.csv', 'yesterday,1\n'),
+            self.write('empty.csv', '')
+        ]
+        (data_list, data_names) = bbdata.get_all_files_info(bad + [good])
+        self.assertEqual([good], data_names)
+        self.assertEqual([1, 2], list(data_list[0][1]))
+
+    def test_sub_second_timestamps(self):
+        filename = self.write(NAME + '.csv', '2015-11-13 19:30:00+00:00,1\n2015-11-13 19:30:00.250000+00:00,2\n'
+                                             '2015-11-13 19:30:01.5+00:00,3\n')
+        (timestamps, values) = point_store.read_csv_series(filename)
+        start = bbdata.datetime_to_ns(dt.datetime(2015, 11, 13, 19, 30))
+        self.assertEqual([0, 250000000, 1500000000], [int(x - start) for x in timestamps])
+
+        frame = bbdata.get_file_info(filename)
+        self.assertAlmostEqual(0.25, (frame.index[1] - frame.index[0]) * 86400, places=3)  # day numbers to seconds
+
+
+class StartEndTest(TempDirTestCase):
+    def test_no_data_in_window(self):
+        filename = self.path(NAME + '.csv')
+        with open(filename, 'w') as f:
+            f.write('2015-11-13 19:30:00+00:00,1\n2015-11-13 19:31:00+00:00,2\n')
+        window = (dt.datetime(2016, 1, 1), dt.datetime(2016, 1, 2))
+        handle = bbdata.LazySeries(filename, window=window)
+        self.assertIsNone(bbdata.get_start_end([handle]))
+        self.assertIsNone(bbdata.get_start_end([]))
+
+    def test_span_of_all_handles(self):
+        filename = self.path(NAME + '.csv')
+        with open(filename, 'w') as f:
+            f.write('2015-11-13 19:30:00+00:00,1\n2015-11-13 19:31:00+00:00,2\n')
+        frame = bbdata.get_file_info(filename)
+        self.assertEqual((frame.index[0], frame.index[-1]), bbdata.get_start_end([bbdata.LazySeries(filename), frame]))
+
+
+class SourceInfoTest(TempDirTestCase):
+    def test_store_reads_like_csv_folder(self):
+        folder = self.path('csv')
+        os.makedirs(folder)
+        with open(os.path.join(folder, NAME + '.csv'), 'w') as f:
+            f.write('2015-11-13 19:30:00+00:00,1\n2015-11-13 19:31:00+00:00,2\n')
+        point_store.build_store_from_csv(folder, self.path('store'))
+
+        (store, names) = bbdata.get_source_info(folder)
+        self.assertIsNone(store)
+        (csv_data, csv_names) = bbdata.get_all_source_info(store, names)
+        (store, names) = bbdata.get_source_info(self.path('store'))
+        self.assertEqual([NAME + '.csv'], names)
+        (store_data, store_names) = bbdata.get_all_source_info(store, names)
+        self.assertEqual(list(csv_data[0].index), list(store_data[0].index))
+        self.assertEqual(list(csv_data[0].values[:, 0]), list(store_data[0].values[:, 0]))
+
+
+class LazySeriesTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.filename = self.path(NAME + '.csv')
+        with open(self.filename, 'w') as f:
+            for minute in range(60):
+                f.write('2015-11-13 19:%02d:00+00:00,%d\n' % (minute, minute))
+        self.window = (dt.datetime(2015, 11, 13, 19, 10), dt.datetime(2015, 11, 13, 19, 19))
+        self.opened = []
+
+        def counting_open(name, *args):
+            self.opened.append(name)
+            return open(name, *args)
+        bbdata.open = counting_open  # shadows the builtin inside bbdata only
+
+    def tearDown(self):
+        del bbdata.open
+        TempDirTestCase.tearDown(self)
+
+    def test_reads_nothing_until_accessed(self):
+        (handles, names) = bbdata.get_lazy_files_info([self.filename], self.window)
+        self.assertEqual([self.filename], names)
+        span = bbdata.get_start_end(handles)  # from the folder manifest
+        self.assertEqual([], self.opened)
+        self.assertIsNone(handles[0].frame)
+        self.assertAlmostEqual(600, (span[1] - span[0]) * 86400 + 60, places=3)
+
+        self.assertEqual(range(10, 20), [int(x) for x in handles[0].values[:, 0]])
+        self.assertEqual([self.filename], self.opened)
+
+    def test_store_handle_reads_window(self):
+        folder = os.path.dirname(self.filename)
+        store = point_store.build_store_from_csv(folder, self.path('store'))
+        (handles, names) = bbdata.get_lazy_source_info(store, [NAME + '.csv'], self.window)
+        self.assertIsNone(handles[0].frame)
+        self.assertEqual(range(10, 20), [int(x) for x in handles[0].values[:, 0]])
+
+    def test_window_outside_data(self):
+        window = (dt.datetime(2016, 1, 1), dt.datetime(2016, 1, 2))
+        self.assertEqual([], bbdata.get_lazy_files_info([self.filename], window)[0])
+
+    def test_parse_window(self):
+        self.assertIsNone(bbdata.parse_window('', ' '))
+        self.assertEqual((dt.datetime(2015, 11, 13, 19, 10), bbdata.WINDOW_END),
+                         bbdata.parse_window('2015-11-13 19:10:00', ''))
+
+    def test_unparseable_file_loads_empty(self):
+        with open(self.path('header.csv'), 'w') as f:
+            f.write('time,value\n')
+        handle = bbdata.LazySeries(self.path('header.csv'))
+        self.assertEqual(0, len(handle))
+        self.assertIsNone(bbdata.get_start_end([handle]))
@@ -0,0 +1,75 @@
+__author__ = 'christina'
+
+import numpy as np
+
+import columnar
+import test_set_viz_2 as tsv
+from tests.helpers import TempDirTestCase, make_log_lines, write_log
+
+
+def decode(tables, dictionaries, table, columns):
+    '''
+    :return: list of row tuples of a loaded table. string columns (named after their dictionary) are decoded, times are
+        left in ns
+    '''
+    table = tables[table]
+    return [tuple(dictionaries[x][table[x][i]] if x in dictionaries else table[x][i] for x in columns)
+            for i in range(len(table[columns[0]]))]
+
+
+def to_ns(rows, time_columns):
+    return [tuple(columnar.datetime_to_ns(x) if i in time_columns else x for (i, x) in enumerate(row))
+            for row in rows]
+
+
+class ExportColumnsTest(TempDirTestCase):
+    def export(self, test_set, mmap_mode='r'):
+        test_set.export_columns(self.path('columns'))
+        return columnar.load_columns(self.path('columns'), mmap_mode=mmap_mode)
+
+    def check_round_trip(self, test_set, tables, dictionaries):
+        self.assertEqual(to_ns(test_set.get_running_intervals(), (2, 3)),
+                         decode(tables, dictionaries, 'running', ['box', 'test', 'start', 'end']))
+        self.assertEqual(to_ns(test_set.get_safety_intervals(), (2, 3)),
+                         decode(tables, dictionaries, 'safety', ['box', 'prereq', 'start', 'end']))
+        counts = [(test, columnar.datetime_to_ns(test_set.test_count_dict[test][tsv.TIME][i]),
+                   test_set.test_count_dict[test][tsv.VALUE][i])
+                  for test in sorted(test_set.test_count_dict.keys())
+                  for i in range(len(test_set.test_count_dict[test][tsv.TIME]))]
+        self.assertEqual(counts, decode(tables, dictionaries, 'counts', ['test', 'time', 'count']))
+        self.assertEqual(sorted(test_set.get_prereq_IDs()), dictionaries['prereq'])
+        # every box of the test set, sorted, then any zone that only the zone avoider saw
+        self.assertEqual(test_set.get_sorted_box_list(), dictionaries['box'][:len(test_set.get_sorted_box_list())])
+        for (name, table) in tables.items():
+            for (column, array) in table.items():
+                if column in ('start', 'end', 'time'):
+                    self.assertEqual(np.int64, array.dtype, name + '.' + column)
+                elif column in dictionaries or column == 'count':
+                    self.assertEqual(np.int32, array.dtype, name + '.' + column)
+
+    def test_round_trip(self):
+        test_set = tsv.TestSet(write_log(self.path('site.txt')), 'v1.0')
+        (tables, dictionaries) = self.export(test_set)
+        self.check_round_trip(test_set, tables, dictionaries)
+        self.assertEqual(['VVR_DPC', 'VVR_HWV'], sorted(x for x in dictionaries['test'] if x != 'all'))
+        self.assertEqual(2, len(tables['running']['box']))
+        start = tables['running']['start'].view('datetime64[ns]')
+        self.assertEqual(np.datetime64('2015-11-13T19:33:00', 'ns'), start[0])
+
+    def test_round_trip_to_memory(self):
+        test_set = tsv.TestSet(write_log(self.path('site.txt')), 'v1.0')
+        (tables, dictionaries) = self.export(test_set, mmap_mode=None)
+        self.check_round_trip(test_set, tables, dictionaries)
+        self.assertFalse(isinstance(tables['running']['start'], np.memmap))
+
+    def test_no_scheduled_tests(self):
+        # a log without any "to run" or "running" entries: only the safety sets
+        with open(self.path('site.txt'), 'w') as f:
+            f.write('\n'.join(x for x in make_log_lines() if 'run' not in x) + '\n')
+        test_set = tsv.TestSet(self.path('site.txt'), 'v1.0')
+        (tables, dictionaries) = self.export(test_set)
+        self.check_round_trip(test_set, tables, dictionaries)
+        self.assertEqual([], dictionaries['test'])
+        for table in ('running', 'scheduled', 'counts', 'results'):
+            self.assertEqual(0, len(tables[table]['box' if table != 'counts' else 'test']), table)
+        self.assertEqual(2, len(tables['safety']['box']))
@@ -0,0 +1,54 @@
+__author__ = 'christina'
+
+import unittest
+
+import numpy as np
+
+import downsample
+
+
+class PyramidCacheTest(unittest.TestCase):
+    def setUp(self):
+        downsample.pyramids.clear()
+        self.x = np.arange(5000, dtype=float)
+
+    def tearDown(self):
+        downsample.pyramids.clear()
+
+    def test_same_data_reuses_pyramid(self):
+        y = np.sin(self.x)
+        first = downsample.get_pyramid('a', self.x, y)
+        self.assertIs(first, downsample.get_pyramid('a', self.x, y.copy()))
+
+    def test_other_values_on_same_grid_rebuild(self):
+        # e.g. the same box and trend of another test set with the same length and start and end times
+        downsample.reduce_series('a', self.x, np.zeros(5000), 0, 4999, 100)
+        (x, y) = downsample.reduce_series('a', self.x, np.ones(5000), 0, 4999, 100)
+        self.assertTrue((y == 1).all())
+
+    def test_least_recently_used_dropped(self):
+        y = np.zeros(5000)
+        for i in range(downsample.MAX_PYRAMIDS):
+            downsample.get_pyramid(i, self.x, y)
+        downsample.get_pyramid(0, self.x, y)  # 0 is now the most recently used
+        downsample.get_pyramid('new', self.x, y)
+        self.assertEqual(downsample.MAX_PYRAMIDS, len(downsample.pyramids))
+        self.assertNotIn(1, downsample.pyramids)
+        self.assertIn(0, downsample.pyramids)
+
+
+class ReduceSeriesTest(unittest.TestCase):
+    def test_keeps_peaks(self):
+        x = np.arange(10000, dtype=float)
+        y = np.zeros(10000)
+        y[1234] = 50
+        y[8765] = -50
+        (x_plot, y_plot) = downsample.reduce_series('peaks', x, y, 0, 9999, 100)
+        self.assertLessEqual(len(x_plot), 200)
+        self.assertEqual(50, y_plot.max())
+        self.assertEqual(-50, y_plot.min())
+        downsample.pyramids.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+__author__ = 'christina'
+
+"""
+End-to-end export against the SQLite stand-in of the bbdata / auto_cx_I django apps (tests/standin).
+"""
+import datetime as dt
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import point_store
+from tests.helpers import TempDirTestCase
+
+STANDIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'standin')
+BOX = '#pdc_vav_2_6_VAVR_site_97'
+export_csv = None
+database_folder = None
+
+
+def setUpModule():
+    '''
+    sets up django on the stand-in apps and imports export_csv. the stand-in bbdata package shadows bbdata.py only
+    while django and export_csv are imported
+    '''
+    global export_csv, database_folder
+    try:
+        import django
+    except ImportError:
+        raise unittest.SkipTest('needs django')
+    saved = sys.modules.pop('bbdata', None)
+    sys.path.insert(0, STANDIN)
+    try:
+        database_folder = tempfile.mkdtemp(prefix='autocx_standin_')
+        os.environ['STANDIN_DB'] = os.path.join(database_folder, 'standin.sqlite')
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'standin_settings'
+        django.setup()
+        from django.core.management import call_command
+        call_command('migrate', run_syncdb=True, verbosity=0)
+        import export_csv
+    finally:
+        sys.path.remove(STANDIN)
+        sys.modules.pop('bbdata', None)
+        if saved is not None:
+            sys.modules['bbdata'] = saved
+
+
+def tearDownModule():
+    if database_folder is not None:
+        from django.db import connections
+        connections.close_all()
+        shutil.rmtree(database_folder, ignore_errors=True)
+
+
+def utc(hour, minute):
+    from django.utils import timezone
+    return dt.datetime(2015, 11, 13, hour, minute, tzinfo=timezone.utc)
+
+
+class ExportTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        from bbdata.models import DataCollectionRequest, Equipment, PointPath, Sample
+        from auto_cx_I.models import CXEquipment, CXTest, CXTestSetRunner, LockPSR, Prerequisite
+        from auto_cx_I.models import TEST_PASSED, TEST_COULD_NOT_RUN
+
+        def point_path(name):
+            path = PointPath.objects.create(name=name)
+            Sample.objects.bulk_create([Sample(point_path=path, time=utc(19, x), value=x) for x in range(30, 51)])
+            return path
+
+        damper = point_path(BOX + '_measure_damper_opening_real')
+        lock = point_path(BOX + '_actuator_u_damper_opening_lock_real')
+        other_box = point_path('#pdc_vav_2_7_VAVR_site_97_measure_damper_opening_real')
+        pressure = point_path('#ahu_1_site_97_static_pressure')
+
+        test_dcr = DataCollectionRequest.objects.create(start=utc(19, 30), end=utc(19, 50))
+        test_dcr.point_paths.add(damper, other_box)
+        prereq_dcr = DataCollectionRequest.objects.create(start=utc(19, 30), end=utc(19, 45))
+        prereq_dcr.point_paths.add(pressure)
+        prereq = Prerequisite.objects.create(name='ColdDuctPressure 137', dcr=prereq_dcr)
+        equipment = CXEquipment.objects.create(equipment=Equipment.objects.create(reference_name=BOX))
+
+        self.test_set = CXTestSetRunner.objects.create(run_at=utc(19, 30))
+
+        def cx_test(test_type, result):
+            test = CXTest.objects.create(test_set=self.test_set, test_type=test_type, result=result,
+                                         equipment=equipment, dcr=test_dcr, run_at=utc(19, 33), ended_at=utc(19, 40))
+            test.prerequisites.add(prereq)
+            return test
+
+        self.test = cx_test('VVR_DPC', TEST_PASSED)
+        LockPSR.objects.create(test=self.test, point_path=lock)
+        cx_test('VVR_AFS', TEST_COULD_NOT_RUN)  # not exported: did not pass or fail
+        cx_test('VVR_HWV', TEST_PASSED)  # not exported: not an exported test type
+        self.damper_name = str(self.test.id) + '__' + damper.name
+        self.prereq_name = 'ColdDuctPressure 137__' + pressure.name
+        self.names = sorted([self.damper_name, str(self.test.id) + '__' + lock.name, self.prereq_name])
+
+    def tearDown(self):
+        from bbdata.models import DataCollectionRequest, Equipment, PointPath
+        from auto_cx_I.models import CXTestSetRunner, Prerequisite
+        for model in [CXTestSetRunner, Prerequisite, DataCollectionRequest, PointPath, Equipment]:
+            model.objects.all().delete()
+        TempDirTestCase.tearDown(self)
+
+    def read_csv(self, folder, name):
+        with open(os.path.join(folder, name), 'r') as f:
+            return f.read().splitlines()
+
+    def test_csv_export(self):
+        results = export_csv.export_test_sets([self.test_set.id], self.dirname, threads=2)
+        self.assertEqual((3, []), results[self.test_set.id])
+        folder = self.path('test_csv_data_' + str(self.test_set.id))
+        self.assertEqual(self.names, sorted(x for x in os.listdir(folder) if not x.startswith('.')))
+
+        rows = self.read_csv(folder, self.damper_name)  # the test's series, 19:33 through 19:40
+        self.assertEqual(8, len(rows))
+        self.assertEqual('2015-11-13 19:33:00+00:00,33.0', rows[0])
+        self.assertEqual(16, len(self.read_csv(folder, self.prereq_name)))  # the prereq's, 19:30 through 19:45
+
+        # a re-run starts at the watermarks and appends nothing
+        export_csv.export_test_sets([self.test_set.id], self.dirname, threads=2)
+        self.assertEqual(rows, self.read_csv(folder, self.damper_name))
+
+    def test_store_export(self):
+        export_csv.export_test_sets([self.test_set.id], self.dirname, store=True, threads=2)
+        store = point_store.PointStore(self.path('test_set_' + str(self.test_set.id) + '.store'))
+        self.assertEqual(self.names, sorted(store.names()))
+        (timestamps, values) = store.get_series(self.damper_name)
+        self.assertEqual(range(33, 41), [int(x) for x in values])
+
+    def test_export_plan_shares_series(self):
+        plan = export_csv.get_export_plan(export_csv.get_tests(self.test_set))
+        self.assertEqual(self.names, sorted(x[0] for x in plan))
+        self.assertEqual(3, len(export_csv.group_plan(plan)))
@@ -0,0 +1,89 @@
+__author__ = 'christina'
+
+import unittest
+
+import bbdata
+
+FOLDER = 'C:/data/test_csv_data_851/'
+NAMES = [FOLDER + x + '.csv' for x in [
+    '1234__#pdc_vav_2_1_VAVR_site_97_measure_damper_opening_real',
+    '1234__#pdc_vav_2_1_VAVR_site_97_actuator_u_damper_opening_real',
+    '1235__#pdc_vav_2_10_VAVR_site_97_measure_damper_opening_real',
+    '1235__#pdc_vav_2_10_VAVR_site_97_measure_mdot_real',
+    '1236__#pdc_vav_3_4_VAVR_site_97_actuator_u_damper_opening_lock_real',
+    '1236__#pdc_vav_3_4_VAVR_site_97_measure_hv_real',
+    'ColdDuctPressure 137__#ahu_1_site_97_static_pressure',
+    'ColdDuctPressure 1370__#ahu_2_site_97_static_pressure',
+    'HotWaterTemperature 140__#boiler_1_site_97_hw_temp'
+]]
+
+
+def filter_recur(filter_list, filenames):
+    # the original recursive filter: each filter narrows the names to those containing it
+    for keyword in filter_list:
+        filenames = [x for x in filenames if keyword in x]
+    return filenames
+
+
+def baseline_filter_data(filterListTuple, filenames):
+    '''
+    filter_data as it was before the name index, for names where each intersection set matches something
+    '''
+    (n_keywordList, u_keywordList, n_prereqList, u_prereqList) = filterListTuple
+    result = []
+    for (n_list, u_list) in [(n_keywordList, u_keywordList), (n_prereqList, u_prereqList)]:
+        n_names = filter_recur(n_list, filenames) if n_list else []
+        base = n_names if n_names else filenames
+        u_names = []
+        for u in u_list:
+            u_names += filter_recur([u], base)
+        result += u_names if u_list else n_names
+    return result
+
+
+class FilterDataTest(unittest.TestCase):
+    def check(self, filterListTuple):
+        result = bbdata.filter_data(filterListTuple, NAMES)
+        expected = baseline_filter_data(filterListTuple, NAMES)
+        self.assertEqual(sorted(set(expected)), sorted(result))
+        self.assertEqual(len(set(result)), len(result))
+        return result
+
+    def test_and(self):
+        self.check((['measure_damper_opening_real'], [], [], []))
+        self.check((['1235', 'measure'], [], [], []))
+        self.check((['damper_opening', '#pdc_vav_2_1'], [], [], []))
+        self.assertEqual([], self.check((['mdot', 'hv_real'], [], [], [])))
+
+    def test_substring_of_a_token(self):
+        # '#pdc_vav_2_1' is a prefix of '#pdc_vav_2_10'
+        result = self.check((['#pdc_vav_2_1'], [], [], []))
+        self.assertEqual(4, len(result))
+        # a partial path name matches the longer path names that contain it
+        self.assertEqual(4, len(self.check((['damper_opening'], [], [], []))))
+        self.assertEqual(2, len(self.check((['actuator_u_damper_opening'], [], [], []))))
+
+    def test_or(self):
+        self.check(([], ['#pdc_vav_2_1', '#pdc_vav_3_4'], [], []))
+        self.check((['measure'], ['#pdc_vav_2_10', '#pdc_vav_3_4'], [], []))
+        # a name matched by two union keywords is listed once
+        self.assertEqual(2, len(self.check(([], ['mdot', '#pdc_vav_2_10'], [], []))))
+
+    def test_prereqs(self):
+        # 'ColdDuctPressure 137' is a prereq token, and a prefix of 'ColdDuctPressure 1370'
+        self.assertEqual(2, len(self.check(([], [], ['ColdDuctPressure 137'], []))))
+        self.check(([], [], [], ['ColdDuctPressure', 'HotWaterTemperature']))
+        self.check((['measure_mdot_real'], [], ['ColdDuctPressure'], ['ahu_2']))
+        result = self.check((['#pdc_vav_3_4'], [], [], ['HotWaterTemperature 140']))
+        self.assertEqual(NAMES[-1], result[-1])  # prereq names follow the keyword names
+
+    def test_no_filters(self):
+        self.assertEqual([], self.check(([], [], [], [])))
+
+    def test_empty_intersection(self):
+        # the recursive filter fell back to the union filters over all names here
+        self.assertEqual([], bbdata.filter_data((['nothing'], ['measure'], [], []), NAMES))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+__author__ = 'christina'
+
+import json
+import os
+
+import fleet_summary
+from tests.helpers import TempDirTestCase, write_log
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FleetSummaryTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.logs = [write_log(self.path('site-1.txt')), write_log(self.path('site-2.txt'))]
+        self.out = self.path('fleet')
+
+    def write_result(self, name, result):
+        with open(self.path(name), 'w') as f:
+            f.write('0 - 2015-11-13 19:50:00+00:00 - Setting final result to : Result: ' + result + '\n')
+
+    def load_cache(self):
+        with open(os.path.join(self.out, fleet_summary.CACHE_FILENAME), 'r') as f:
+            return json.load(f)
+
+    def test_summary_counts(self):
+        (site_rows, test_rows) = fleet_summary.run_fleet(self.logs, self.out, processes=1)
+        self.assertEqual(['site-1', 'site-2'], [x['site'] for x in site_rows])
+        self.assertEqual([2, 2], [x['ran'] for x in site_rows])
+        self.assertEqual(['VVR_DPC', 'VVR_HWV'], [x['test'] for x in test_rows])
+
+    def test_interrupted_run_restarts(self):
+        save_cache = fleet_summary.save_cache
+
+        def save_then_stop(out_dir, cache):
+            save_cache(out_dir, cache)
+            raise Interrupted()
+
+        fleet_summary.save_cache = save_then_stop
+        try:
+            self.assertRaises(Interrupted, fleet_summary.run_fleet, self.logs, self.out, 1)
+        finally:
+            fleet_summary.save_cache = save_cache
+
+        # only the log that was mapped is in the cache, the other one is mapped on restart
+        self.assertEqual(1, len(self.load_cache()))
+        (site_rows, test_rows) = fleet_summary.run_fleet(self.logs, self.out, processes=1)
+        self.assertEqual(['site-1', 'site-2'], [x['site'] for x in site_rows])
+
+    def test_unmapped_entry_is_mapped_again(self):
+        # entry left by an interrupted run of a version that wrote entries before mapping them
+        stat = os.stat(self.logs[0])
+        os.makedirs(self.out)
+        fleet_summary.save_cache(self.out, {os.path.abspath(self.logs[0]): {
+            'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': fleet_summary.hash_file(self.logs[0]),
+            'summary': None}})
+        (site_rows, test_rows) = fleet_summary.run_fleet(self.logs, self.out, processes=1)
+        self.assertEqual(['site-1', 'site-2'], [x['site'] for x in site_rows])
+
+    def test_malformed_log_is_recorded(self):
+        bad = self.path('bad.txt')
+        with open(bad, 'w') as f:
+            f.write('not a log line\nto run = [2set CXTest state machine running VVR_DPC on #box]\n')
+        (site_rows, test_rows) = fleet_summary.run_fleet(self.logs + [bad], self.out, processes=1)
+        self.assertEqual(['site-1', 'site-2'], [x['site'] for x in site_rows])
+        entry = self.load_cache()[os.path.abspath(bad)]
+        self.assertIsNone(entry['summary'])
+        self.assertIn('ValueError', entry['error'])
+
+        # not retried while unchanged
+        self.assertEqual(({}, []), fleet_summary.find_changed([os.path.abspath(bad)], self.load_cache()))
+
+    def test_pass_fail_from_result_logs(self):
+        self.write_result('site-1_vav2-6_dpc.txt', 'passed')
+        self.write_result('site-2_vav2-6_dpc.txt', 'failed')
+        self.write_result('site-2_vav2-7_hwv.txt', 'passed')
+        (site_rows, test_rows) = fleet_summary.run_fleet(self.logs, self.out, processes=1)
+        rows = dict((x['test'], x) for x in test_rows)
+        self.assertEqual((1, 1, 0.5, 0.5), (rows['VVR_DPC']['passed'], rows['VVR_DPC']['failed'],
+                                            rows['VVR_DPC']['passed_rate'], rows['VVR_DPC']['failed_rate']))
+        self.assertEqual((1, 0), (rows['VVR_HWV']['passed'], rows['VVR_HWV']['failed']))
+
+    def test_new_result_log_remaps(self):
+        fleet_summary.run_fleet(self.logs, self.out, processes=1)
+        self.write_result('site-1_vav2-6_dpc.txt', 'passed')
+        (changed, refreshed) = fleet_summary.find_changed([os.path.abspath(x) for x in self.logs], self.load_cache())
+        self.assertEqual([os.path.abspath(self.logs[0])], changed.keys())
+        (site_rows, test_rows) = fleet_summary.run_fleet(self.logs, self.out, processes=1)
+        self.assertEqual(1, [x for x in test_rows if x['test'] == 'VVR_DPC'][0]['passed'])
+
+    def test_touched_log_refresh_is_saved(self):
+        fleet_summary.run_fleet(self.logs, self.out, processes=1)
+        os.utime(self.logs[0], (2000000000, 2000000000))
+        hash_file = fleet_summary.hash_file
+        hashed = []
+
+        def counting_hash(filename):
+            hashed.append(filename)
+            return hash_file(filename)
+
+        fleet_summary.hash_file = counting_hash
+        try:
+            fleet_summary.run_fleet(self.logs, self.out, processes=1)  # nothing to map, the mtime is refreshed
+            self.assertEqual(1, len(hashed))
+            self.assertEqual(2000000000, self.load_cache()[os.path.abspath(self.logs[0])]['mtime'])
+            fleet_summary.run_fleet(self.logs, self.out, processes=1)
+            self.assertEqual(1, len(hashed))  # not hashed again
+        finally:
+            fleet_summary.hash_file = hash_file
+
@@ -0,0 +1,76 @@
+__author__ = 'christina'
+
+import os
+
+import folder_manifest
+import point_store
+from tests.helpers import TempDirTestCase
+
+NAME = '1234__#pdc_vav_2_6_VAVR_site_97_measure_damper_opening_real.csv'
+
+
+def write_series(filename, minutes, mtime=None):
+    with open(filename, 'w') as f:
+        for minute in minutes:
+            f.write('2015-11-13 19:%02d:00,%d\n' % (minute, minute))
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
+
+
+class FolderManifestTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        write_series(self.path(NAME), range(30, 40), mtime=1000000000)
+
+    def test_first_scan(self):
+        manifest = folder_manifest.FolderManifest(self.dirname)
+        self.assertEqual(([NAME], []), manifest.rescan())
+        entry = manifest.get(NAME)
+        self.assertEqual(10, entry['rows'])
+        self.assertEqual(folder_manifest.parse_timestamp('2015-11-13 19:30:00'), entry['start'])
+        self.assertEqual(folder_manifest.parse_timestamp('2015-11-13 19:39:00'), entry['end'])
+        self.assertEqual('measure_damper_opening_real', entry['tokens']['path_name'])
+        self.assertEqual([NAME], manifest.names())  # the manifest file itself is not listed
+
+    def test_unchanged_files_are_not_reread(self):
+        folder_manifest.FolderManifest(self.dirname).rescan()
+        self.assertEqual(([], []), folder_manifest.FolderManifest(self.dirname).rescan())
+
+    def test_changed_and_removed_files(self):
+        folder_manifest.FolderManifest(self.dirname).rescan()
+        write_series(self.path(NAME), range(30, 50), mtime=1000000100)
+        manifest = folder_manifest.FolderManifest(self.dirname)
+        self.assertEqual(([NAME], []), manifest.rescan())
+        self.assertEqual(20, manifest.get(NAME)['rows'])
+
+        os.remove(self.path(NAME))
+        self.assertEqual(([], [NAME]), manifest.rescan())
+        self.assertEqual([], folder_manifest.FolderManifest(self.dirname).names())
+
+    def test_damaged_manifest_is_rebuilt(self):
+        with open(self.path(folder_manifest.MANIFEST_FILENAME), 'w') as f:
+            f.write('{not json')
+        self.assertEqual(([NAME], []), folder_manifest.FolderManifest(self.dirname).rescan())
+
+
+class BuildStoreTest(TempDirTestCase):
+    def test_scanned_folder_converts(self):
+        folder = self.path('csv')
+        os.makedirs(folder)
+        write_series(os.path.join(folder, NAME), range(30, 40))
+        folder_manifest.FolderManifest(folder).rescan()  # as bbdata does before a conversion
+        store = point_store.build_store_from_csv(folder, self.path('store'))
+        self.assertEqual([NAME], store.names())
+        (timestamps, values) = store.get_series(NAME)
+        self.assertEqual(range(30, 40), [int(x) for x in values])
+
+    def test_bad_files_are_skipped(self):
+        folder = self.path('csv')
+        os.makedirs(folder)
+        write_series(os.path.join(folder, NAME), range(30, 40))
+        with open(os.path.join(folder, 'header.csv'), 'w') as f:
+            f.write('time,value\n')
+        store = point_store.build_store_from_csv(folder, self.path('store'))
+        self.assertEqual([NAME], store.names())
+        self.assertTrue(point_store.is_store(self.path('store')))
+        self.assertFalse(point_store.is_store(folder))
@@ -0,0 +1,41 @@
+__author__ = 'christina'
+
+import datetime as dt
+
+import test_set_viz_2 as tsv
+from tests.helpers import TempDirTestCase, write_log, BOX_A, BOX_B
+
+PREREQ = 'ColdDuctPressure 137'
+
+
+def at(hh_mm):
+    (hour, minute) = [int(x) for x in hh_mm.split(':')]
+    return dt.datetime(2015, 11, 13, hour, minute)
+
+
+class FindIntervalsTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.test_set = tsv.TestSet(write_log(self.path('site.txt')), 'v1.0')
+
+    def test_gaps_split_intervals(self):
+        samples = [at('19:33'), at('19:34'), at('19:35'), at('19:36')]
+        self.assertEqual([(at('19:33'), at('19:34')), (at('19:35'), at('19:36'))],
+                         self.test_set.find_intervals([at('19:33'), at('19:35')], samples))
+
+    def test_seen_at_last_sample_runs_to_test_end(self):
+        samples = [at('19:33'), at('19:34')]
+        self.assertEqual([(at('19:34'), self.test_set.TEST_END)],
+                         self.test_set.find_intervals([at('19:34')], samples))
+
+    def test_never_seen(self):
+        self.assertEqual([], self.test_set.find_intervals([], [at('19:33')]))
+
+    def test_running_intervals(self):
+        self.assertEqual([(BOX_A, 'VVR_DPC', at('19:33'), at('19:40')),
+                          (BOX_B, 'VVR_HWV', at('19:40'), at('19:50'))],
+                         self.test_set.get_running_intervals())
+
+    def test_safety_intervals(self):
+        rows = [x for x in self.test_set.get_safety_intervals() if x[0] == BOX_B]
+        self.assertEqual([(BOX_B, PREREQ, at('19:33'), at('19:40'))], rows)
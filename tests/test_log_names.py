@@ -0,0 +1,48 @@
+__author__ = 'christina'
+
+import gzip
+import os
+import shutil
+import unittest
+
+import compressed
+import fleet_summary
+import render_cache
+import test_set_viz_2 as tsv
+from tests.helpers import TempDirTestCase, write_log
+
+
+class StripLogExtensionTest(unittest.TestCase):
+    def test_names(self):
+        self.assertEqual('valencia-153', compressed.strip_log_extension('valencia-153.txt.gz'))
+        self.assertEqual('logs/site', compressed.strip_log_extension('logs/site.txt.bz2'))
+        self.assertEqual('pamf-test', compressed.strip_log_extension('pamf-test.txt'))  # not pamf-tes
+        self.assertEqual('text', compressed.strip_log_extension('text'))
+        self.assertEqual('pamf-test', fleet_summary.get_site_name('logs/pamf-test.txt.gz'))
+
+
+class FigureNameTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.cwd = os.getcwd()
+        os.chdir(self.dirname)  # figures are saved in the working folder
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        render_cache.caches.clear()
+        TempDirTestCase.tearDown(self)
+
+    def test_compressed_log(self):
+        write_log(self.path('pamf-test.txt'))
+        with open(self.path('pamf-test.txt'), 'rb') as f_in:
+            f_out = gzip.open(self.path('pamf-test.txt.gz'), 'wb')
+            shutil.copyfileobj(f_in, f_out)
+            f_out.close()
+        test_set = tsv.TestSet(self.path('pamf-test.txt.gz'), 'v1.0')
+        self.assertEqual('pamf-test', test_set.get_log_name())
+        self.assertEqual('v1.0 Test Set: pamf-test', str(test_set))
+
+        test_set.plot_test_timeline(show=False)
+        test_set.plot_test_count(show=False)
+        self.assertTrue(os.path.isfile(self.path('timeline_pamf-test.png')))
+        self.assertTrue(os.path.isfile(self.path('test count_pamf-test.png')))
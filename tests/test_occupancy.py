@@ -0,0 +1,49 @@
+__author__ = 'christina'
+
+import unittest
+
+import numpy as np
+
+import occupancy
+import test_set_viz_2 as tsv
+from tests.helpers import TempDirTestCase, write_log, BOX_A, BOX_B
+
+PREREQ = 'ColdDuctPressure 137'
+STEP_NS = 60 * occupancy.NS_PER_SECOND
+
+
+class MarkIntervalsTest(unittest.TestCase):
+    def test_partial_steps_are_occupied(self):
+        matrix = np.zeros((1, 6), dtype=bool)
+        occupancy.mark_intervals(matrix, 0, [(STEP_NS + 1, 2 * STEP_NS + 1), (5 * STEP_NS, 5 * STEP_NS)], 0, STEP_NS)
+        self.assertEqual([False, True, True, False, False, True], list(matrix[0]))
+
+
+class BuildOccupancyTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.occ = tsv.TestSet(write_log(self.path('site.txt')), 'v1.0').get_occupancy()
+
+    def test_grid(self):
+        self.assertEqual(25, len(self.occ.times))  # 19:31 through 19:55
+        self.assertEqual(0, self.occ.times[0] % STEP_NS)
+
+    def test_seconds_per_test(self):
+        self.assertEqual(420, self.occ.tests['VVR_DPC'].count_seconds()[BOX_A])
+        self.assertEqual(0, self.occ.tests['VVR_DPC'].count_seconds()[BOX_B])
+        self.assertEqual(600, self.occ.tests['VVR_HWV'].count_seconds()[BOX_B])
+        self.assertEqual(420, self.occ.prereqs[PREREQ].count_seconds()[BOX_B])
+
+    def test_bitwise_combinations(self):
+        tests = self.occ.get_any_test()
+        prereqs = self.occ.get_any_prereq()
+        self.assertEqual(0, tests.both(prereqs).count_seconds()[BOX_B])  # B's test starts when its safety set ends
+        self.assertEqual(1020, tests.either(prereqs).count_seconds()[BOX_B])
+        self.assertEqual(600, tests.without(prereqs).count_seconds()[BOX_B])
+        self.assertEqual(sorted([BOX_A, BOX_B]), sorted(tests.get_occupied_boxes()))
+
+    def test_unpack_matches_get_box(self):
+        tests = self.occ.get_any_test()
+        matrix = tests.unpack()
+        self.assertEqual(list(matrix[tests.box_index[BOX_A]]), list(tests.get_box(BOX_A)))
+        self.assertEqual(list(matrix.sum(axis=0)), list(tests.count_boxes()))
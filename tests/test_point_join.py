@@ -0,0 +1,77 @@
+__author__ = 'christina'
+
+import unittest
+
+import numpy as np
+
+import point_join
+import test_set_viz_2 as tsv
+from tests.helpers import TempDirTestCase, write_log, BOX_A, BOX_B
+
+DAMPER = '1234__#pdc_vav_2_6_VAVR_site_97_measure_damper_opening_real'
+AIRFLOW = '1234__#pdc_vav_2_6_VAVR_site_97_measure_mdot_real'
+ZONE_TEMP = '1234__#pdc_vav_2_6_VAVR_site_97_measure_zone_temp'
+VALVE = '1234__#pdc_vav_2_7_VAVR_site_97_measure_hv_real'
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_ref_names(self):
+        self.assertEqual('#pdc_vav_2_6', point_join.normalize_ref_name('#pdc_vav_2_6_VAVR_site_97'))
+        self.assertEqual('#pdc_vav_2_6', point_join.normalize_ref_name('#pdc_vav_2_6'))
+        self.assertEqual('#pdc_vav_2_6', point_join.normalize_ref_name(' #PDC_VAV_2_6_VAVR '))
+
+    def test_test_types(self):
+        self.assertEqual('DPC', point_join.get_test_type('VVR_DPC'))
+        self.assertEqual('AFS', point_join.get_test_type('VVC_AFS'))
+        self.assertEqual('COOL', point_join.get_test_type('COOL'))
+        self.assertEqual('ELS-1', point_join.get_test_type('ELS-1'))
+
+
+class PointJoinIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = point_join.PointJoinIndex([DAMPER, AIRFLOW, ZONE_TEMP, VALVE])
+
+    def test_v10_test_name(self):
+        # the test type of a real log name picks only the trends of that test
+        self.assertEqual([DAMPER], self.index.match(BOX_A, 'VVR_DPC'))
+        self.assertEqual(sorted([DAMPER, AIRFLOW]), sorted(self.index.match(BOX_A, 'VVC_AFS')))
+        self.assertEqual([VALVE], self.index.match(BOX_B, 'VVR_HWV'))
+
+    def test_v11_test_name(self):
+        self.assertEqual([DAMPER], self.index.match('#pdc_vav_2_6', 'DPC'))
+        self.assertEqual([ZONE_TEMP], self.index.match(BOX_A, 'COOL'))
+        self.assertEqual([], self.index.match(BOX_A, 'NET'))
+
+    def test_unknown_test_gets_all_trends(self):
+        self.assertEqual(sorted([DAMPER, AIRFLOW, ZONE_TEMP]), sorted(self.index.match(BOX_A, 'VVR_NEW')))
+
+
+class JoinTestSetTest(TempDirTestCase):
+    def test_join_cuts_series_to_interval(self):
+        test_set = tsv.TestSet(write_log(self.path('site.txt')), 'v1.0')
+        damper = self.path(DAMPER + '.csv')
+        with open(damper, 'w') as f:
+            for minute in range(30, 45):
+                f.write('2015-11-13 19:%02d:00,%d\n' % (minute, minute))
+        joined = point_join.join_test_set(test_set, [damper])
+        dpc = [x for x in joined.keys() if x[1] == 'VVR_DPC'][0]
+        self.assertEqual(1, len(joined[dpc]))
+        (name, timestamps, values) = joined[dpc][0]
+        self.assertEqual(range(33, 41), [int(x) for x in values])
+        hwv = [x for x in joined.keys() if x[1] == 'VVR_HWV'][0]
+        self.assertEqual([], joined[hwv])
+        self.assertEqual(np.int64, timestamps.dtype)
+
+    def test_bad_file_skipped(self):
+        # a header-only csv among the matched series is left out instead of failing the whole join
+        test_set = tsv.TestSet(write_log(self.path('site.txt')), 'v1.0')
+        damper = self.path(DAMPER + '.csv')
+        with open(damper, 'w') as f:
+            for minute in range(30, 45):
+                f.write('2015-11-13 19:%02d:00,%d\n' % (minute, minute))
+        airflow = self.path(AIRFLOW + '.csv')
+        with open(airflow, 'w') as f:
+            f.write('time,value\n')
+        joined = point_join.join_test_set(test_set, [damper, airflow])
+        dpc = [x for x in joined.keys() if x[1] == 'VVR_DPC'][0]
+        self.assertEqual([damper], [x[0] for x in joined[dpc]])
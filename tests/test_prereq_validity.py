@@ -0,0 +1,95 @@
+__author__ = 'christina'
+
+import unittest
+
+import numpy as np
+
+import prereq_validity
+import test_set_viz_2 as tsv
+from tests.helpers import TempDirTestCase, make_log_lines
+
+NS = prereq_validity.NS_PER_SECOND
+FLOOR_1_BOX = '#pdc_vav_1_12_VAVR_site_97'
+FLOOR_2_BOX = '#pdc_vav_2_6_VAVR_site_97'
+
+
+def minutes(count):
+    return np.arange(count, dtype=np.int64) * 60 * NS
+
+
+class EvaluateThresholdTest(unittest.TestCase):
+    def evaluate(self, values, direction='above', **kwargs):
+        (times, validity) = prereq_validity.evaluate_threshold(minutes(len(values)), values, 0.25, direction, **kwargs)
+        return [int(x // (60 * NS)) for x in times], list(validity)
+
+    def test_without_hysteresis(self):
+        self.assertEqual(([0, 1, 2, 3], [0, 1, 0, 1]), self.evaluate([0.2, 0.3, 0.24, 0.26]))
+
+    def test_hysteresis_holds_validity_near_threshold(self):
+        # dips to 0.22 stay inside the 0.05 band, only 0.18 turns the prereq invalid
+        values = [0.2, 0.3, 0.22, 0.26, 0.22, 0.18, 0.22, 0.25]
+        self.assertEqual(([0, 1, 5, 7], [0, 1, 0, 1]), self.evaluate(values, hysteresis=0.05))
+
+    def test_starts_invalid_inside_band(self):
+        # no sample has turned it on yet, so a value inside the band is invalid
+        self.assertEqual(([0, 2], [0, 1]), self.evaluate([0.22, 0.22, 0.3], hysteresis=0.05))
+
+    def test_below_direction(self):
+        (times, validity) = prereq_validity.evaluate_threshold(minutes(4), [72, 69, 70.5, 73], 70, 'below',
+                                                               hysteresis=1)
+        self.assertEqual([0, 1, 0], list(validity))
+        self.assertEqual([0, 60 * NS, 3 * 60 * NS], list(times))
+
+    def test_nan_keeps_validity(self):
+        self.assertEqual(([0, 3], [1, 0]), self.evaluate([0.3, np.nan, np.nan, 0.1]))
+
+    def test_min_dwell_drops_short_runs(self):
+        # the 1 minute dip is dropped, the 3 minute dip counts
+        values = [0.3, 0.1, 0.3, 0.3, 0.1, 0.1, 0.1, 0.3]
+        self.assertEqual(([0, 4, 7], [1, 0, 1]), self.evaluate(values, min_dwell=120))
+
+    def test_unknown_direction(self):
+        self.assertRaises(ValueError, prereq_validity.evaluate_threshold, minutes(1), [1], 0, 'sideways')
+
+
+class CombineValidityTest(unittest.TestCase):
+    def test_all_series_must_be_valid(self):
+        a = (np.array([0, 10, 30], dtype=np.int64), np.array([1, 0, 1], dtype=np.int8))
+        b = (np.array([5, 20], dtype=np.int64), np.array([1, 0], dtype=np.int8))
+        (times, validity) = prereq_validity.combine_validity([a, b])
+        self.assertEqual([0, 5, 10], list(times))
+        self.assertEqual([0, 1, 0], list(validity))
+
+    def test_hysteresis_per_prereq_path(self):
+        hysteresis = {'ColdDuctPressure': 0.05}
+        self.assertEqual(0.05, prereq_validity.get_hysteresis(hysteresis, 'ColdDuctPressure'))
+        self.assertEqual(0.0, prereq_validity.get_hysteresis(hysteresis, 'HotWaterPressure'))
+        self.assertEqual(0.1, prereq_validity.get_hysteresis(0.1, 'HotWaterPressure'))
+
+
+class MapValidityFilesTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        # v1.0 box names carry the site suffix; ColdDuctPressure 137 serves floor 2, 138 floor 1
+        lines = make_log_lines(tests=(('VVR_DPC', FLOOR_1_BOX), ('VVR_HWV', FLOOR_2_BOX)))
+        lines[5] = lines[5].partition(' - 2015')[0] + ' - 2015-11-13 19:33:00+00:00 - ' + \
+            '{<PrereqMachine: ColdDuctPressure 137>: [<ModeledEquipment: ' + FLOOR_2_BOX + '>], ' + \
+            '<PrereqMachine: ColdDuctPressure 138>: [<ModeledEquipment: ' + FLOOR_1_BOX + '>]}'
+        with open(self.path('pamf-1472.txt'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.test_set = tsv.TestSet(self.path('pamf-1472.txt'), 'v1.0')
+
+    def test_box_floor(self):
+        self.assertEqual(2, prereq_validity.get_box_floor('#pdc_vav_2_6_VAVR_site_97'))
+        self.assertEqual(1, prereq_validity.get_box_floor('#pdc_vav_1_12_VAVR_site_97'))
+        self.assertEqual(2, prereq_validity.get_box_floor('#pdc_vav_2_6'))
+        self.assertEqual(3, prereq_validity.get_box_floor('#hq2_mix_3-12'))
+
+    def test_floor_match(self):
+        mapping = prereq_validity.map_validity_files(self.test_set, ['pamf-1472_cdp_fl2.txt', 'pamf-1472_cdp_fl1.txt'])
+        self.assertEqual([('pamf-1472_cdp_fl1.txt', 'ColdDuctPressure 138', 'floor'),
+                          ('pamf-1472_cdp_fl2.txt', 'ColdDuctPressure 137', 'floor')], sorted(mapping))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+__author__ = 'christina'
+
+import datetime as dt
+import os
+
+import render_cache
+from tests.helpers import TempDirTestCase
+
+
+class RenderKeyTest(TempDirTestCase):
+    def test_key_changes_with_inputs(self):
+        model = {'box': [dt.datetime(2015, 11, 13, 19, 33)]}
+        key = render_cache.get_render_key('timeline', model, ['k-'])
+        self.assertEqual(key, render_cache.get_render_key('timeline', {'box': [dt.datetime(2015, 11, 13, 19, 33)]},
+                                                          ['k-']))
+        self.assertNotEqual(key, render_cache.get_render_key('timeline', model, ['r-']))
+        self.assertNotEqual(key, render_cache.get_render_key('timeline', {'box': []}, ['k-']))
+        self.assertNotEqual(key, render_cache.get_render_key('test count', model, ['k-']))
+
+    def test_style_version_bump(self):
+        key = render_cache.get_render_key('trends', [1, 2])
+        versions = dict(render_cache.STYLE_VERSIONS)
+        render_cache.STYLE_VERSIONS['trends'] += 1
+        try:
+            self.assertNotEqual(key, render_cache.get_render_key('trends', [1, 2]))
+        finally:
+            render_cache.STYLE_VERSIONS.update(versions)
+
+
+class RenderCacheTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.figName = self.path('timeline.png')
+        with open(self.figName, 'w') as f:
+            f.write('png')
+
+    def tearDown(self):
+        render_cache.caches.clear()
+        TempDirTestCase.tearDown(self)
+
+    def test_fresh_after_record(self):
+        cache = render_cache.RenderCache(self.dirname)
+        self.assertFalse(cache.is_fresh(self.figName, 'a'))
+        cache.record(self.figName, 'a')
+        self.assertTrue(cache.is_fresh(self.figName, 'a'))
+        self.assertFalse(cache.is_fresh(self.figName, 'b'))
+
+    def test_persisted(self):
+        render_cache.RenderCache(self.dirname).record(self.figName, 'a')
+        self.assertTrue(render_cache.RenderCache(self.dirname).is_fresh(self.figName, 'a'))
+
+    def test_missing_figure_is_stale(self):
+        cache = render_cache.get_render_cache(self.dirname)
+        cache.record(self.figName, 'a')
+        os.remove(self.figName)
+        self.assertFalse(cache.is_fresh(self.figName, 'a'))
+
+    def test_corrupt_cache_file(self):
+        with open(self.path(render_cache.CACHE_FILENAME), 'w') as f:
+            f.write('{not json')
+        self.assertFalse(render_cache.RenderCache(self.dirname).is_fresh(self.figName, 'a'))
@@ -0,0 +1,46 @@
+__author__ = 'christina'
+
+import unittest
+
+import numpy as np
+
+import response_analysis
+from trend_matrix import TrendMatrix
+
+COMMAND = 'actuator_u_damper_opening_real'
+RESPONSE = 'measure_damper_opening_real'
+STEP_NS = 60 * 10 ** 9
+
+
+def make_matrix(lags):
+    '''
+    :param lags: dict of box: steps the damper position trails its command by
+    :return: TrendMatrix of a square wave command (0 / 50 % every 40 minutes) and each box's delayed response
+    '''
+    boxes = sorted(lags.keys())
+    n_times = 240
+    command = np.where((np.arange(n_times) // 40) % 2 == 0, 0.0, 50.0)
+    values = np.empty((len(boxes), 2, n_times))
+    for i in range(len(boxes)):
+        values[i, 0] = command
+        values[i, 1] = np.concatenate((np.zeros(lags[boxes[i]]), command[:n_times - lags[boxes[i]]]))
+    return TrendMatrix(boxes, [COMMAND, RESPONSE], np.arange(n_times) * STEP_NS, values)
+
+
+class AnalyzePairTest(unittest.TestCase):
+    def test_lag_and_settling(self):
+        rows = response_analysis.analyze_pair(make_matrix({'#vav_1': 2, '#vav_2': 5}), 'damper')
+        self.assertEqual(['#vav_1', '#vav_2'], [x['box'] for x in rows])
+        self.assertEqual([120, 300], [x['lag_seconds'] for x in rows])
+        self.assertEqual([120, 300], [x['settling_seconds_max'] for x in rows])
+        self.assertEqual([0, 0], [x['unsettled_steps'] for x in rows])
+        self.assertEqual([0, 0], [x['steady_state_error'] for x in rows])
+
+    def test_slow_box_ranked_first(self):
+        lags = {'#vav_1': 2, '#vav_2': 2, '#vav_3': 3, '#vav_4': 2, '#vav_5': 12}
+        ranked = response_analysis.rank_outliers(response_analysis.analyze_pair(make_matrix(lags), 'damper'))
+        self.assertEqual('#vav_5', ranked[0]['box'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+__author__ = 'christina'
+
+import unittest
+
+import scheduler_graph as sg
+from tests.helpers import BOX_A, BOX_B, make_log_lines
+
+# the module parses the development (v1.1) log format
+PREREQ_LINES = [
+    '11 - 2015-11-13 19:31:06+00:00 - updating prereq ColdDuctPressure 137',
+    '12 - 2015-11-13 19:31:07+00:00 - updating prereq HotWaterTemperature 140',
+    '13 - 2015-11-13 19:31:08+00:00 - updating prereq ColdDuctPressure 137'
+]
+
+
+# the original one-pass-per-view functions, kept here as the reference for the shared scan
+def baseline_prereq_ids(test_log_list):
+    prereqIDs = []
+    for entry in test_log_list:
+        if entry.find(sg.PREREQ_ID) >= 0:
+            prereq = entry[(entry.find(sg.PREREQ_ID) + len(sg.PREREQ_ID)):]
+            if prereq not in prereqIDs:
+                prereqIDs.append(prereq)
+    return prereqIDs
+
+
+def baseline_safety_set(test_log_list):
+    prereqDict = {}
+    for entry in test_log_list:
+        if entry.find(sg.PREREQ_MACH_LIST) >= 0:
+            segments = entry.lstrip('{').rstrip('}').split(sg.PREREQ_MACH)
+            this_datetime = sg.getDateTime(segments[0])
+            for seg in segments[1:]:
+                (prereqID, box_names) = sg.getRefNames(seg)
+                for box in box_names:
+                    prereqDict.setdefault(box, {}).setdefault(prereqID, []).append(this_datetime)
+    return prereqDict
+
+
+def baseline_test_set(test_log_list):
+    testsetDict = {}
+    for entry in test_log_list:
+        if entry.find(sg.CURRENT) >= 0:
+            segments = entry.lstrip('[').rstrip(']').replace(', ', '').split(sg.STATE_MACHINE)
+            this_datetime = sg.getDateTime(segments[0])
+            for seg in segments[1:]:
+                (test, sep, box) = seg.partition(' on ')
+                testsetDict.setdefault(box, {}).setdefault(test, []).append(this_datetime)
+    return testsetDict
+
+
+class ScanTestLogTest(unittest.TestCase):
+    def setUp(self):
+        sg.lastScan.clear()
+        self.lines = make_log_lines('v1.1') + PREREQ_LINES
+
+    def tearDown(self):
+        sg.lastScan.clear()
+
+    def test_views_match_baseline(self):
+        self.assertEqual(baseline_prereq_ids(self.lines), sg.getPrereqIDs(self.lines))
+        self.assertEqual(baseline_safety_set(self.lines), sg.getSafetySet(self.lines))
+        self.assertEqual(baseline_test_set(self.lines), sg.getTestSet(self.lines))
+        self.assertEqual(['ColdDuctPressure 137', 'HotWaterTemperature 140'], sg.getPrereqIDs(self.lines))
+        self.assertEqual([BOX_B, 'Manual'], sorted(sg.getSafetySet(self.lines).keys()))
+        self.assertEqual([BOX_A, BOX_B], sorted(sg.getTestSet(self.lines).keys()))
+
+    def test_instances_match_baseline_count(self):
+        pDict = baseline_safety_set(self.lines)
+        tDict = baseline_test_set(self.lines)
+        expected = sg.countBoxInstances(sg.getBoxList(pDict, tDict), pDict, tDict)
+        self.assertEqual(expected, sg.scanTestLog(self.lines)['instances'])
+
+    def test_same_lines_scanned_once(self):
+        scan = sg.scanTestLog(self.lines)
+        self.assertTrue(scan is sg.scanTestLog(list(self.lines)))
+
+    def test_changed_list_scanned_again(self):
+        # a list changed in place after its scan must not get the stale scan back
+        sg.getTestSet(self.lines)
+        self.lines[4] = self.lines[4].replace('VVR_DPC', 'VVR_AFS')
+        self.assertEqual(baseline_test_set(self.lines), sg.getTestSet(self.lines))
+        self.assertEqual(['VVR_AFS'], sg.getTestSet(self.lines)[BOX_A].keys())
+
+    def test_other_log_scanned_again(self):
+        sg.getSafetySet(self.lines)
+        other = make_log_lines('v1.1', prereq='HotWaterTemperature 140')
+        self.assertEqual(baseline_safety_set(other), sg.getSafetySet(other))
+        self.assertEqual(['HotWaterTemperature 140'], sg.getSafetySet(other)[BOX_B].keys())
+
+
+if __name__ == '__main__':
+    unittest.main()
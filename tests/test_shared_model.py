@@ -0,0 +1,75 @@
+__author__ = 'christina'
+
+import os
+
+import numpy as np
+
+import columnar
+import shared_model
+import test_set_viz_2 as tsv
+from tests.helpers import BOX_A, BOX_B, TempDirTestCase, write_log
+
+
+def box_running_intervals(shared, box):
+    # map_shared job: runs in a worker process, so it must be module level
+    return os.getpid(), isinstance(shared.tables['running']['box'], np.memmap), shared.get_intervals('running', box)
+
+
+def to_ns(rows):
+    return [(a, b, columnar.datetime_to_ns(start), columnar.datetime_to_ns(end)) for (a, b, start, end) in rows]
+
+
+class SharedModelTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.test_set = tsv.TestSet(write_log(self.path('site.txt')), 'v1.0')
+        self.shared_dir = shared_model.publish(self.test_set, root=self.dirname)
+
+    def tearDown(self):
+        shared_model.release(self.shared_dir)
+        TempDirTestCase.tearDown(self)
+
+    def test_attach(self):
+        shared = shared_model.attach(self.shared_dir)
+        self.assertTrue(shared is shared_model.attach(self.shared_dir))  # opened once per process
+        self.assertEqual(self.test_set.TEST_LOG_FILENAME, shared.TEST_LOG_FILENAME)
+        self.assertEqual(self.test_set.VERSION, shared.VERSION)
+        self.assertEqual(columnar.datetime_to_ns(self.test_set.TEST_START), shared.TEST_START)
+        self.assertEqual(columnar.datetime_to_ns(self.test_set.TEST_END), shared.TEST_END)
+
+    def test_intervals(self):
+        shared = shared_model.attach(self.shared_dir)
+        self.assertEqual(to_ns(self.test_set.get_running_intervals()), shared.get_intervals('running'))
+        self.assertEqual(to_ns(self.test_set.get_safety_intervals()), shared.get_intervals('safety'))
+        self.assertEqual(to_ns([x for x in self.test_set.get_safety_intervals() if x[0] == BOX_B]),
+                         shared.get_intervals('safety', BOX_B))
+        self.assertEqual([], shared.get_intervals('running', '#not_a_box'))
+
+    def test_test_count(self):
+        shared = shared_model.attach(self.shared_dir)
+        for test in self.test_set.test_count_dict.keys():
+            (times, counts) = shared.get_test_count(test)
+            self.assertEqual([columnar.datetime_to_ns(x) for x in self.test_set.test_count_dict[test][tsv.TIME]],
+                             times.tolist())
+            self.assertEqual(self.test_set.test_count_dict[test][tsv.VALUE], counts.tolist())
+        self.assertEqual(0, len(shared.get_test_count('VVR_NEW')[0]))
+
+    def test_release_removes_folder(self):
+        shared_model.attach(self.shared_dir)
+        shared_model.release(self.shared_dir)
+        self.assertFalse(os.path.exists(self.shared_dir))
+        self.assertFalse(self.shared_dir in shared_model.attached)
+
+    def test_published_context(self):
+        with shared_model.Published(self.test_set, root=self.dirname) as dirname:
+            self.assertTrue(os.path.isfile(os.path.join(dirname, shared_model.INFO_FILENAME)))
+        self.assertFalse(os.path.exists(dirname))
+
+    def test_map_shared(self):
+        boxes = [BOX_A, BOX_B, BOX_A, BOX_B]
+        results = shared_model.map_shared(box_running_intervals, self.shared_dir, boxes, processes=2)
+        running = self.test_set.get_running_intervals()
+        for (box, (pid, mapped, intervals)) in zip(boxes, results):
+            self.assertNotEqual(os.getpid(), pid)
+            self.assertTrue(mapped)
+            self.assertEqual(to_ns([x for x in running if x[0] == box]), intervals)
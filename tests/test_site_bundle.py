@@ -0,0 +1,48 @@
+__author__ = 'christina'
+
+import site_bundle
+import test_set_viz_2 as tsv
+from tests.helpers import TempDirTestCase, write_log, BOX_A, BOX_B
+
+RESULT_LOG = '0 - 2015-11-13 19:40:00+00:00 - Setting final result to : Result: passed\n'
+
+
+class SiteBundleTest(TempDirTestCase):
+    def write_result(self, name):
+        with open(self.path(name), 'w') as f:
+            f.write(RESULT_LOG)
+
+    def test_site_name_with_underscores(self):
+        log = write_log(self.path('vsp_hq2.txt'))
+        self.write_result('vsp_hq2_vav2-6_dpc.txt')
+        bundle = site_bundle.load_site_bundle(log)
+        self.assertEqual([(self.path('vsp_hq2_vav2-6_dpc.txt'), BOX_A, 'VVR_DPC')], bundle['results'])
+        self.assertEqual([], bundle['skipped'])
+        self.assertIn(tsv.RESULT_TIME, bundle['test_set'].test_set_dict[BOX_A]['VVR_DPC'])
+
+    def test_cool_alias_depends_on_version(self):
+        log = write_log(self.path('vsp_hq2.txt'), tests=(('VVR_DPC', BOX_A), ('VVR_ZSA', BOX_B)))
+        self.write_result('vsp_hq2_vav2-7_cool.txt')
+        bundle = site_bundle.load_site_bundle(log)
+        self.assertEqual([(self.path('vsp_hq2_vav2-7_cool.txt'), BOX_B, 'VVR_ZSA')], bundle['results'])
+
+        log = write_log(self.path('site-11.txt'), 'v1.1', tests=(('DPC', BOX_A), ('COOL', BOX_B)))
+        self.write_result('site-11_vav2-7_cool.txt')
+        bundle = site_bundle.load_site_bundle(log)
+        self.assertEqual([(self.path('site-11_vav2-7_cool.txt'), BOX_B, 'COOL')], bundle['results'])
+
+    def test_compressed_log_site_name(self):
+        import gzip
+        log = self.path('vsp_hq2.txt.gz')
+        with open(write_log(self.path('plain.txt')), 'rb') as f:
+            text = f.read()
+        with gzip.open(log, 'wb') as f:
+            f.write(text)
+        self.write_result('vsp_hq2_vav2-6_dpc.txt')
+        self.assertEqual([self.path('vsp_hq2_vav2-6_dpc.txt')], site_bundle.find_aux_files(log))
+        self.assertEqual(1, len(site_bundle.load_site_bundle(log)['results']))
+
+    def test_not_a_test_set_log(self):
+        with open(self.path('notes.txt'), 'w') as f:
+            f.write('0 - 2015-11-13 19:31:05+00:00 - nothing scheduled\n')
+        self.assertRaises(ValueError, site_bundle.load_site_bundle, self.path('notes.txt'))
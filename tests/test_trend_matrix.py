@@ -0,0 +1,42 @@
+__author__ = 'christina'
+
+import numpy as np
+
+import response_analysis
+from trend_matrix import build_trend_matrix
+from tests.helpers import TempDirTestCase
+
+DAMPER = '1234__#pdc_vav_2_6_VAVR_site_97_measure_damper_opening_real'
+COMMAND = '1234__#pdc_vav_2_6_VAVR_site_97_actuator_u_damper_opening_real'
+BAD = '1235__#pdc_vav_2_7_VAVR_site_97_measure_damper_opening_real'
+
+
+class BuildTrendMatrixTest(TempDirTestCase):
+    def write(self, name, text):
+        with open(self.path(name), 'w') as f:
+            f.write(text)
+        return self.path(name)
+
+    def write_series(self, name, values):
+        return self.write(name, ''.join('2015-11-13 19:%02d:00+00:00,%s\n' % (i, values[i])
+                                        for i in range(len(values))))
+
+    def test_grid_and_hold(self):
+        filename = self.write_series(DAMPER, [0, 10, 20])
+        matrix = build_trend_matrix([filename], step_seconds=60)
+        self.assertEqual(['#pdc_vav_2_6_VAVR'], matrix.boxes)
+        self.assertEqual([0, 10, 20], list(matrix.get('measure_damper_opening_real')[0]))
+
+    def test_bad_file_skipped(self):
+        good = self.write_series(DAMPER, [0, 10, 20])
+        bad = self.write(BAD, 'time,value\n')
+        matrix = build_trend_matrix([good, bad], step_seconds=60)
+        self.assertEqual(['#pdc_vav_2_6_VAVR'], matrix.get_boxes_with('measure_damper_opening_real'))
+        self.assertTrue(np.isnan(matrix.get('measure_damper_opening_real', ['#pdc_vav_2_7_VAVR'])).all())
+
+    def test_bad_file_in_analyzed_folder(self):
+        self.write_series(DAMPER, [0, 0, 50, 50, 50])
+        self.write_series(COMMAND, [0, 50, 50, 50, 50])
+        self.write(BAD, 'time,value\n')
+        rows = response_analysis.analyze_folder(self.dirname)
+        self.assertEqual(['#pdc_vav_2_6_VAVR'], [x['box'] for x in rows])
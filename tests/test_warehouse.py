@@ -0,0 +1,49 @@
+__author__ = 'christina'
+
+import gzip
+import shutil
+
+import warehouse
+from tests.helpers import TempDirTestCase, write_log, BOX_A, BOX_B
+
+
+class WarehouseTest(TempDirTestCase):
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.log = write_log(self.path('site-1.txt'))
+        self.connection = warehouse.connect(self.path('autocx.sqlite'))
+
+    def tearDown(self):
+        self.connection.close()
+        TempDirTestCase.tearDown(self)
+
+    def select(self, query):
+        return self.connection.execute(query).fetchall()
+
+    def test_ingest_rows(self):
+        self.assertTrue(warehouse.ingest_file(self.connection, self.log))
+        self.assertEqual([(BOX_A, 'VVR_DPC', 420), (BOX_B, 'VVR_HWV', 600)],
+                         self.select('select box, test, end - start from running order by box'))
+        self.assertEqual([(BOX_B, 420)], self.select('select box, end - start from safety where box = "%s"' % BOX_B))
+        self.assertEqual([('site-1',)], self.select('select site from files'))
+
+    def test_unchanged_file_skipped(self):
+        self.assertTrue(warehouse.ingest_file(self.connection, self.log))
+        self.assertFalse(warehouse.ingest_file(self.connection, self.log))
+        self.assertEqual(2, self.select('select count(*) from running')[0][0])
+
+    def test_changed_file_replaced(self):
+        warehouse.ingest_file(self.connection, self.log)
+        write_log(self.log, tests=(('VVR_AFS', BOX_A), ('VVR_HWV', BOX_B)))
+        self.assertTrue(warehouse.ingest_file(self.connection, self.log))
+        self.assertEqual([('VVR_AFS',), ('VVR_HWV',)], self.select('select test from running order by test'))
+        self.assertEqual(1, self.select('select count(*) from files')[0][0])
+
+    def test_compressed_site_name(self):
+        compressed = self.path('site-2.txt.gz')
+        with open(self.log, 'rb') as f_in:
+            f_out = gzip.open(compressed, 'wb')
+            shutil.copyfileobj(f_in, f_out)
+            f_out.close()
+        warehouse.ingest_file(self.connection, compressed)
+        self.assertEqual([('site-2',)], self.select('select site from files'))
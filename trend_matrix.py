@@ -0,0 +1,167 @@
+__author__ = 'christina'
+
+"""
+Aligned box x trend x time matrix of a test set's point-path trends.
+
+build_trend_matrix reads every matching csv once and resamples it onto one shared time grid, so all trends of all boxes
+line up by index instead of by position in separate file lists:
+    values[box, trend, time]: float array, NaN where a box has no data for a trend at that time
+    boxes: equipment ref names (e.g. '#pdc_vav_2_6'), trends: path names (see point_paths.PATHS)
+    times: int64 ns since the epoch (UTC) of each grid point
+
+Resampling is sample-and-hold: each grid point takes the last sample at or before it, for at most HOLD_STEPS grid steps,
+so a gap in the trend stays a gap. Cross-trend math is then array math on slices, e.g.
+    matrix.get('measure_damper_opening_real') - matrix.get('actuator_u_damper_opening_real')
+"""
+import os
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+import point_paths
+from folder_manifest import get_folder_manifest
+from point_store import read_csv_series_or_none
+
+STEP_SECONDS = 60  # grid spacing, the usual trend logging interval
+HOLD_STEPS = 5  # grid steps a sample is held for before the trend counts as missing
+LOAD_THREADS = 8
+NS_PER_SECOND = 10 ** 9
+
+
+class TrendMatrix(object):
+    def __init__(self, boxes, trends, times, values):
+        self.boxes = boxes
+        self.trends = trends
+        self.times = times
+        self.values = values
+        self.box_index = dict((boxes[i], i) for i in range(len(boxes)))
+        self.trend_index = dict((trends[i], i) for i in range(len(trends)))
+
+    @property
+    def mask(self):
+        '''
+        :return: bool array like values, True where there is data
+        '''
+        return ~np.isnan(self.values)
+
+    def get(self, trend, boxes=None):
+        '''
+        :param trend: path name
+        :param boxes: list of ref names, default all boxes
+        :return: box x time array of one trend
+        '''
+        if boxes is None:
+            return self.values[:, self.trend_index[trend], :]
+        return self.values[[self.box_index[b] for b in boxes], self.trend_index[trend], :]
+
+    def get_boxes_with(self, trend):
+        '''
+        :return: list of ref names that have any data for trend
+        '''
+        has_data = self.mask[:, self.trend_index[trend], :].any(axis=1)
+        return [self.boxes[i] for i in np.flatnonzero(has_data)]
+
+    def difference(self, trend_a, trend_b):
+        '''
+        :return: box x time array of trend_a - trend_b, NaN where either is missing
+        '''
+        return self.get(trend_a) - self.get(trend_b)
+
+
+def get_file_tokens(filename):
+    '''
+    :return: folder manifest entry of filename: size, rows, start, end, tokens (see folder_manifest.py)
+    '''
+    manifest = get_folder_manifest(os.path.dirname(filename), rescan=False)
+    name = os.path.basename(filename)
+    if name not in manifest.files:
+        manifest.rescan()
+    return manifest.get(name)
+
+
+def make_grid(start, end, step_seconds=STEP_SECONDS):
+    '''
+    :param start: int ns
+    :param end: int ns
+    :return: int64 array of grid times from start (rounded down to a whole step) through end
+    '''
+    step = step_seconds * NS_PER_SECOND
+    first = start - start % step
+    return np.arange(first, end + step, step, dtype=np.int64)
+
+
+def hold_on_grid(timestamps, values, times, max_hold):
+    '''
+    sample-and-hold resampling
+    :param timestamps: sorted int64 ns
+    :param values: values aligned with timestamps
+    :param times: int64 ns grid
+    :param max_hold: ns a sample is held for
+    :return: float array aligned with times, NaN before the first sample and in gaps longer than max_hold
+    '''
+    result = np.empty(len(times))
+    result.fill(np.nan)
+    if len(timestamps) == 0:
+        return result
+    previous = np.searchsorted(timestamps, times, 'right') - 1
+    valid = previous >= 0
+    previous = np.maximum(previous, 0)
+    valid &= (times - timestamps[previous]) <= max_hold
+    result[valid] = values[previous[valid]]
+    return result
+
+
+def build_trend_matrix(filenames, trends=None, step_seconds=STEP_SECONDS, hold_steps=HOLD_STEPS,
+                       threads=LOAD_THREADS):
+    '''
+    :param filenames: csv filenames, e.g. from bbdata.get_folder_info or bbdata.filter_data
+    :param trends: path names to include, default all that are found
+    :param step_seconds: grid spacing
+    :param hold_steps: grid steps a sample is held for
+    :param threads: number of files to read at once
+    :return: TrendMatrix, or None if no file has data. files that can't be parsed are skipped
+    '''
+    # group files by (box, trend) from the manifest, without opening them
+    groups = {}  # (ref_name, path_name): list of filenames
+    (start, end) = (None, None)
+    for filename in filenames:
+        entry = get_file_tokens(filename)
+        (ref_name, path_name) = (entry['tokens']['ref_name'], entry['tokens']['path_name'])
+        if entry['rows'] == 0 or path_name is None or (trends is not None and path_name not in trends):
+            continue
+        groups.setdefault((ref_name, path_name), []).append(filename)
+        if entry['start'] is not None:
+            start = entry['start'] if start is None else min(start, entry['start'])
+        if entry['end'] is not None:
+            end = entry['end'] if end is None else max(end, entry['end'])
+    if not groups or start is None:
+        return None
+
+    boxes = sorted(set(x[0] for x in groups))
+    if trends is None:
+        trends = [x for x in point_paths.PATHS if x in set(y[1] for y in groups)]
+    times = make_grid(start, end, step_seconds)
+    matrix = TrendMatrix(boxes, list(trends), times, np.empty((len(boxes), len(trends), len(times))))
+    matrix.values.fill(np.nan)
+
+    # one read per file
+    to_read = sorted(set(f for x in groups.values() for f in x))
+    pool = ThreadPool(max(1, min(threads, len(to_read))))
+    try:
+        all_data = dict(zip(to_read, pool.map(read_csv_series_or_none, to_read)))
+    finally:
+        pool.close()
+        pool.join()
+
+    max_hold = hold_steps * step_seconds * NS_PER_SECOND
+    for ((ref_name, path_name), group) in groups.items():
+        # several files for one box and trend (e.g. one per test): merge them in time order
+        group = [f for f in group if all_data[f] is not None]
+        if not group:
+            continue
+        timestamps = np.concatenate([all_data[f][0] for f in group])
+        values = np.concatenate([all_data[f][1] for f in group])
+        order = np.argsort(timestamps, kind='mergesort')
+        matrix.values[matrix.box_index[ref_name], matrix.trend_index[path_name], :] = \
+            hold_on_grid(timestamps[order], values[order], times, max_hold)
+    return matrix
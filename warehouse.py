@@ -0,0 +1,216 @@
+__author__ = 'christina'
+
+"""
+Local SQLite warehouse of parsed scheduler events, for ad-hoc questions across sites and runs without re-parsing logs.
+
+Ingest is incremental and idempotent per file: each log's sha1 is stored in the files table, unchanged files are
+skipped, and a changed file has its old rows replaced in the same transaction. Times are stored as integer seconds since
+the unix epoch (UTC), so sqlite's datetime(start, 'unixepoch') can format them.
+
+tables:
+    files: id, path, site, sha1, version, start, end
+    running: file_id, site, box, test, start, end -- intervals when a box was running a test
+    safety: file_id, site, box, prereq, start, end -- intervals when a box was a safety set member
+    scheduled: file_id, site, box, test, time, ran -- ran = 0 means the test could not run
+    zones: file_id, site, box, locked
+    hourly: file_id, site, hour, test, running_seconds, starts -- per-hour rollup of running
+
+usage:
+    python warehouse.py vsp_hq2.txt vsp_hq2_112.txt vsp_hq2_117.txt --db autocx.sqlite
+
+example query:
+    select site, test, sum(running_seconds) / 3600.0 from hourly group by site, test
+"""
+import argparse
+import calendar
+import glob
+import os
+import sqlite3
+
+import fleet_summary
+import test_set_viz_2 as tsv
+
+DEFAULT_DB = 'autocx.sqlite'
+SECONDS_PER_HOUR = 3600
+
+SCHEMA = """
+create table if not exists files (
+    id integer primary key,
+    path text unique not null,
+    site text not null,
+    sha1 text not null,
+    version text,
+    start integer,
+    end integer
+);
+create table if not exists running (
+    file_id integer not null references files(id),
+    site text not null,
+    box text not null,
+    test text not null,
+    start integer not null,
+    end integer not null
+);
+create table if not exists safety (
+    file_id integer not null references files(id),
+    site text not null,
+    box text not null,
+    prereq text not null,
+    start integer not null,
+    end integer not null
+);
+create table if not exists scheduled (
+    file_id integer not null references files(id),
+    site text not null,
+    box text not null,
+    test text not null,
+    time integer not null,
+    ran integer not null
+);
+create table if not exists zones (
+    file_id integer not null references files(id),
+    site text not null,
+    box text not null,
+    locked integer not null
+);
+create table if not exists hourly (
+    file_id integer not null references files(id),
+    site text not null,
+    hour integer not null,
+    test text not null,
+    running_seconds real not null,
+    starts integer not null
+);
+create index if not exists running_site_box on running (site, box);
+create index if not exists running_site_test on running (site, test);
+create index if not exists running_start on running (start);
+create index if not exists safety_site_box on safety (site, box);
+create index if not exists safety_site_prereq on safety (site, prereq);
+create index if not exists safety_start on safety (start);
+create index if not exists scheduled_site_box on scheduled (site, box);
+create index if not exists scheduled_site_test on scheduled (site, test);
+create index if not exists hourly_site_hour on hourly (site, hour);
+create index if not exists hourly_site_test on hourly (site, test);
+"""
+EVENT_TABLES = ['running', 'safety', 'scheduled', 'zones', 'hourly']
+
+
+def to_epoch(a_datetime):
+    return calendar.timegm(a_datetime.timetuple())
+
+
+def connect(db_path=DEFAULT_DB):
+    connection = sqlite3.connect(db_path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def get_hourly_rollup(running_rows):
+    '''
+    :param running_rows: list of (site, box, test, start, end) tuples, times in epoch seconds
+    :return: list of (site, hour, test, running_seconds, starts) tuples, hour is the epoch second the hour starts at
+    '''
+    buckets = {}
+    for (site, box, test, start, end) in running_rows:
+        hour = start - start % SECONDS_PER_HOUR
+        key = (site, hour, test)
+        buckets.setdefault(key, [0.0, 0])[1] += 1
+        while hour < end:
+            key = (site, hour, test)
+            seconds = min(end, hour + SECONDS_PER_HOUR) - max(start, hour)
+            buckets.setdefault(key, [0.0, 0])[0] += seconds
+            hour += SECONDS_PER_HOUR
+    return [key + tuple(buckets[key]) for key in sorted(buckets.keys())]
+
+
+def get_event_rows(test_set, site):
+    '''
+    flattens a TestSet into row tuples for the event tables (without file_id)
+    :return: dict of table name: list of row tuples
+    '''
+    rows = dict(zip(EVENT_TABLES, [[] for x in EVENT_TABLES]))
+
+    try:
+        scheduled_time = test_set.test_count_dict['all'][tsv.TIME][0]
+    except KeyError:  # no tests were scheduled
+        scheduled_time = test_set.TEST_START
+    for box in test_set.test_set_dict.keys():
+        for test in test_set.test_set_dict[box].keys():
+            test_times = test_set.test_set_dict[box][test][tsv.TIME]
+            rows['scheduled'].append((site, box, test, to_epoch(scheduled_time), int(len(test_times) > 0)))
+
+    rows['running'] = [(site, box, test, to_epoch(start), to_epoch(end))
+                       for (box, test, start, end) in test_set.get_running_intervals()]
+    rows['safety'] = [(site, box, prereq, to_epoch(start), to_epoch(end))
+                      for (box, prereq, start, end) in test_set.get_safety_intervals()]
+
+    rows['zones'] = [(site, x, 0) for x in test_set.unlocked_zone_list] + \
+                    [(site, x, 1) for x in test_set.locked_zone_list]
+    rows['hourly'] = get_hourly_rollup(rows['running'])
+    return rows
+
+
+def ingest_file(connection, filename, site=None):
+    '''
+    loads one test set log into the warehouse. skips the file if its contents are already loaded, replaces its rows if
+    the file changed since it was last loaded.
+    :param connection: sqlite3 connection from connect()
+    :param filename: test set log
+    :param site: site name, default is the file name without .txt or a compression extension
+    :return: True if the file was (re)loaded, False if it was skipped
+    '''
+    path = os.path.abspath(filename)
+    digest = fleet_summary.hash_file(path)
+    existing = connection.execute('select id, sha1 from files where path = ?', (path,)).fetchone()
+    if existing is not None and existing[1] == digest:
+        return False
+
+    version = fleet_summary.detect_version(path)
+    if version is None:
+        print 'skipping ' + filename + ': not a test set log'
+        return False
+    if site is None:
+        site = fleet_summary.get_site_name(filename)
+    test_set = tsv.TestSet(path, version)
+    rows = get_event_rows(test_set, site)
+
+    with connection:  # one transaction per file
+        if existing is not None:
+            for table in EVENT_TABLES:
+                connection.execute('delete from ' + table + ' where file_id = ?', (existing[0],))
+            connection.execute('delete from files where id = ?', (existing[0],))
+        cursor = connection.execute(
+            'insert into files (path, site, sha1, version, start, end) values (?, ?, ?, ?, ?, ?)',
+            (path, site, digest, version, to_epoch(test_set.TEST_START), to_epoch(test_set.TEST_END)))
+        file_id = cursor.lastrowid
+        for table in EVENT_TABLES:
+            if rows[table]:
+                placeholders = ', '.join(['?'] * (1 + len(rows[table][0])))
+                connection.executemany('insert into ' + table + ' values (' + placeholders + ')',
+                                       [(file_id,) + x for x in rows[table]])
+    return True
+
+
+def ingest(filenames, db_path=DEFAULT_DB):
+    '''
+    :return: number of files that were (re)loaded
+    '''
+    connection = connect(db_path)
+    try:
+        count = 0
+        for filename in filenames:
+            if ingest_file(connection, filename):
+                count += 1
+                print 'loaded ' + filename
+    finally:
+        connection.close()
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test set logs into a local SQLite warehouse.')
+    parser.add_argument('logs', nargs='+', help='log files or glob patterns')
+    parser.add_argument('--db', default=DEFAULT_DB, help='SQLite database file')
+    args = parser.parse_args()
+    log_files = [x for pattern in args.logs for x in (glob.glob(pattern) or [pattern])]
+    ingest(sorted(set(log_files)), args.db)